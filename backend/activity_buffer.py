@@ -0,0 +1,120 @@
+"""Fixed-capacity ring buffer for session activities"""
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Tuple
+import secrets
+
+class _TimestampView:
+    """Read-only oldest-first view over the buffer timestamps, for bisect"""
+    
+    def __init__(self, buffer: "ActivityRingBuffer"):
+        self._buffer = buffer
+    
+    def __len__(self) -> int:
+        return self._buffer._size
+    
+    def __getitem__(self, index: int) -> float:
+        return self._buffer._timestamps[self._buffer._slot(index)]
+
+class ActivityRingBuffer:
+    """
+    Stores the most recent activities of a session
+    
+    Appends are O(1) and overwrite the oldest entry once the buffer is full.
+    Timestamps are kept in a parallel array in insertion order (clamped to
+    be non-decreasing), so time range lookups are a binary search. Activity
+    IDs map to their append sequence number, so cursors resolve in O(1).
+    """
+    
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self._items: List[Optional[dict]] = [None] * capacity
+        self._timestamps: List[float] = [0.0] * capacity
+        self._start = 0  # Slot of the oldest entry
+        self._size = 0
+        self._positions: Dict[str, int] = {}  # Activity ID -> append sequence number
+        self.version = 0  # Number of activities ever appended
+        self.epoch = secrets.token_hex(4)  # Distinguishes versions across restarts
+        self.type_counts: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def __iter__(self) -> Iterator[dict]:
+        """Iterate newest first"""
+        return self._iter_newest(0)
+    
+    def _slot(self, index: int) -> int:
+        """Map an oldest-first logical index to a physical slot"""
+        return (self._start + index) % self.capacity
+    
+    def _iter_newest(self, stop: int) -> Iterator[dict]:
+        """Iterate newest first down to (and including) logical index stop"""
+        for index in range(self._size - 1, stop - 1, -1):
+            yield self._items[self._slot(index)]
+    
+    def append(self, activity: dict, timestamp: float):
+        """Add an activity, evicting the oldest one when full"""
+        if self._size:
+            last = self._timestamps[self._slot(self._size - 1)]
+            timestamp = max(timestamp, last)
+        
+        if self._size == self.capacity:
+            evicted = self._items[self._start]
+            self._count_type(evicted["type"], -1)
+            self._positions.pop(evicted["id"], None)
+            self._items[self._start] = activity
+            self._timestamps[self._start] = timestamp
+            self._start = (self._start + 1) % self.capacity
+        else:
+            slot = self._slot(self._size)
+            self._items[slot] = activity
+            self._timestamps[slot] = timestamp
+            self._size += 1
+        
+        self._count_type(activity["type"], 1)
+        self._positions[activity["id"]] = self.version
+        self.version += 1
+    
+    def _count_type(self, activity_type: str, delta: int):
+        """Maintain per-type counts incrementally"""
+        count = self.type_counts.get(activity_type, 0) + delta
+        if count:
+            self.type_counts[activity_type] = count
+        else:
+            self.type_counts.pop(activity_type, None)
+    
+    def since(self, timestamp: float) -> Iterator[dict]:
+        """Iterate newest first over activities strictly after timestamp"""
+        return self._iter_newest(bisect_right(_TimestampView(self), timestamp))
+    
+    def index_of(self, activity_id: str) -> Optional[int]:
+        """Get the oldest-first logical index of a retained activity"""
+        sequence = self._positions.get(activity_id)
+        if sequence is None:
+            return None
+        return sequence - (self.version - self._size)
+    
+    def page(
+        self,
+        limit: int,
+        since: Optional[int] = None,
+        before: Optional[int] = None,
+        activity_type: Optional[str] = None
+    ) -> Tuple[List[dict], bool]:
+        """
+        Get activities newest first between two logical indexes (both exclusive)
+        Returns: (activities, has_more)
+        """
+        stop = since + 1 if since is not None else 0
+        index = (before if before is not None else self._size) - 1
+        result = []
+        while index >= stop:
+            activity = self._items[self._slot(index)]
+            index -= 1
+            if activity_type is None or activity["type"] == activity_type:
+                if len(result) == limit:
+                    return result, True
+                result.append(activity)
+        return result, False
@@ -0,0 +1,66 @@
+"""Rolling per-type activity counters for charting"""
+from typing import Dict, List, Tuple
+
+class RollingCounter:
+    """
+    Counts events per type in fixed-width time buckets
+    
+    Buckets live in a circular array indexed by bucket number, so both
+    recording and reading a bucket are O(1) and memory is bounded by the
+    number of buckets, regardless of event volume.
+    """
+    
+    def __init__(self, width: int, buckets: int):
+        self.width = width
+        self.buckets = buckets
+        self._epochs: List[int] = [-1] * buckets
+        self._counts: List[Dict[str, int]] = [{} for _ in range(buckets)]
+    
+    def add(self, timestamp: float, activity_type: str, amount: int = 1):
+        """Record an event at a point in time"""
+        epoch = int(timestamp // self.width)
+        slot = epoch % self.buckets
+        if self._epochs[slot] != epoch:
+            # Bucket holds data from a previous lap, reset it
+            self._epochs[slot] = epoch
+            self._counts[slot] = {}
+        counts = self._counts[slot]
+        counts[activity_type] = counts.get(activity_type, 0) + amount
+    
+    def window(self, end: float, count: int) -> List[Tuple[float, Dict[str, int]]]:
+        """Get (bucket start, counts by type) for the last count buckets up to end, oldest first"""
+        last_epoch = int(end // self.width)
+        result = []
+        for epoch in range(last_epoch - count + 1, last_epoch + 1):
+            slot = epoch % self.buckets
+            counts = self._counts[slot] if self._epochs[slot] == epoch else {}
+            result.append((float(epoch * self.width), dict(counts)))
+        return result
+
+class ActivityHistogram:
+    """Per-minute and per-hour activity counters for a session"""
+    
+    RESOLUTIONS = {"minute": 60, "hour": 3600}
+    
+    def __init__(self, minute_buckets: int, hour_buckets: int):
+        self.counters = {
+            "minute": RollingCounter(self.RESOLUTIONS["minute"], minute_buckets),
+            "hour": RollingCounter(self.RESOLUTIONS["hour"], hour_buckets),
+        }
+    
+    def record(self, timestamp: float, activity_type: str):
+        """Record an activity in every resolution"""
+        for counter in self.counters.values():
+            counter.add(timestamp, activity_type)
+    
+    def add_bucket(self, resolution: str, timestamp: float, activity_type: str, amount: int):
+        """Add a precomputed count to one resolution, e.g. when reloading from the activity log"""
+        self.counters[resolution].add(timestamp, activity_type, amount)
+    
+    def max_window(self, resolution: str) -> int:
+        """Number of buckets retained for a resolution"""
+        return self.counters[resolution].buckets
+    
+    def window(self, resolution: str, end: float, count: int) -> List[Tuple[float, Dict[str, int]]]:
+        """Get the last count buckets at the given resolution"""
+        return self.counters[resolution].window(end, count)
@@ -0,0 +1,245 @@
+"""Persistent activity log in SQLite"""
+from typing import List, Optional, Tuple
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from config import settings
+from structured_log import get_logger
+
+log = get_logger(__name__)
+
+class ActivityLog:
+    """
+    Append-only on-disk log of session activities
+    
+    Activities are queued from the event loop without blocking and written
+    in batches by a dedicated thread, in WAL mode so range queries can run
+    concurrently. Rows older than the retention period are deleted
+    periodically by the same writer thread.
+    """
+    
+    def __init__(self):
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._read_conn: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+        self._retention_task: Optional[asyncio.Task] = None
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "dropped": 0,
+            "compacted": 0
+        }
+    
+    @property
+    def enabled(self) -> bool:
+        """True once the writer thread is running"""
+        return self._thread is not None
+    
+    @staticmethod
+    def _connect() -> sqlite3.Connection:
+        """Open a connection to the log database"""
+        conn = sqlite3.connect(settings.ACTIVITY_LOG_PATH, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def start(self):
+        """Create the schema and start the writer thread and retention task"""
+        if not settings.ACTIVITY_LOG_ENABLED or self._thread is not None:
+            return
+        
+        if not os.path.exists(settings.ACTIVITY_LOG_PATH):
+            # Activity content includes private messages, keep the file owner-only
+            os.close(os.open(settings.ACTIVITY_LOG_PATH, os.O_CREAT | os.O_WRONLY, 0o600))
+        
+        conn = self._connect()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS activities (
+                session TEXT NOT NULL,
+                timestamp REAL NOT NULL,
+                type TEXT NOT NULL,
+                id TEXT NOT NULL,
+                chat TEXT,
+                sender TEXT,
+                content TEXT,
+                created_at TEXT NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_activities_session_time_type "
+            "ON activities (session, timestamp, type)"
+        )
+        conn.commit()
+        conn.close()
+        
+        self._queue = queue.Queue(maxsize=settings.ACTIVITY_LOG_QUEUE_MAX)
+        self._read_conn = self._connect()
+        self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+        self._thread.start()
+        self._retention_task = asyncio.create_task(self._run_retention())
+    
+    async def stop(self):
+        """Flush pending activities and stop the writer thread"""
+        if self._thread is None:
+            return
+        if self._retention_task is not None:
+            self._retention_task.cancel()
+        await asyncio.to_thread(self._queue.put, ("stop", None))
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+        with self._read_lock:
+            self._read_conn.close()
+            self._read_conn = None
+    
+    def append(self, session_token: str, activity: dict, timestamp: float):
+        """Queue an activity for writing; dropped if the writer is too far behind"""
+        if self._queue is None:
+            return
+        row = (
+            session_token,
+            timestamp,
+            activity["type"],
+            activity["id"],
+            activity.get("chat"),
+            activity.get("sender"),
+            activity.get("content"),
+            activity["timestamp"]
+        )
+        try:
+            self._queue.put_nowait(("insert", row))
+            self.stats["queued"] += 1
+        except queue.Full:
+            self.stats["dropped"] += 1
+    
+    async def delete_session(self, session_token: str):
+        """Delete every logged activity of a session"""
+        if self._queue is not None:
+            await asyncio.to_thread(self._queue.put, ("delete_session", session_token))
+    
+    def _run(self):
+        """Writer thread: batch inserts and apply maintenance commands in order"""
+        conn = self._connect()
+        batch = []
+        deadline = None
+        
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                command, value = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                command, value = "flush", None
+            
+            if command == "insert":
+                batch.append(value)
+                if deadline is None:
+                    deadline = time.monotonic() + settings.ACTIVITY_LOG_FLUSH_INTERVAL
+                if len(batch) < settings.ACTIVITY_LOG_BATCH_SIZE:
+                    continue
+            
+            # Any other command flushes first so it applies after earlier inserts
+            if batch:
+                try:
+                    conn.executemany("INSERT INTO activities VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+                    conn.commit()
+                    self.stats["written"] += len(batch)
+                except sqlite3.Error as e:
+                    log.error("Activity log write error: %s", e)
+                    self.stats["dropped"] += len(batch)
+                batch = []
+            deadline = None
+            
+            try:
+                if command == "compact":
+                    cursor = conn.execute("DELETE FROM activities WHERE timestamp < ?", (value,))
+                    conn.commit()
+                    self.stats["compacted"] += cursor.rowcount
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                elif command == "delete_session":
+                    conn.execute("DELETE FROM activities WHERE session = ?", (value,))
+                    conn.commit()
+                elif command == "stop":
+                    conn.close()
+                    return
+            except sqlite3.Error as e:
+                log.error("Activity log maintenance error: %s", e)
+    
+    async def _run_retention(self):
+        """Periodically delete activities older than the retention period"""
+        while True:
+            await asyncio.sleep(settings.ACTIVITY_LOG_COMPACT_INTERVAL)
+            cutoff = time.time() - settings.ACTIVITY_LOG_RETENTION_DAYS * 86400
+            await asyncio.to_thread(self._queue.put, ("compact", cutoff))
+    
+    def _query(self, session_token: str, start: float, end: float, activity_type: Optional[str], limit: int) -> List[dict]:
+        """Run a range query on the read connection"""
+        sql = (
+            "SELECT id, type, chat, sender, content, created_at FROM activities "
+            "WHERE session = ? AND timestamp >= ? AND timestamp < ?"
+        )
+        params = [session_token, start, end]
+        if activity_type:
+            sql += " AND type = ?"
+            params.append(activity_type)
+        sql += " ORDER BY timestamp DESC LIMIT ?"
+        params.append(limit)
+        
+        with self._read_lock:
+            rows = self._read_conn.execute(sql, params).fetchall()
+        return [
+            {
+                "id": activity_id,
+                "type": activity_type,
+                "chat": chat,
+                "sender": sender,
+                "content": content,
+                "timestamp": created_at
+            }
+            for activity_id, activity_type, chat, sender, content, created_at in rows
+        ]
+    
+    async def query(
+        self,
+        session_token: str,
+        start: float,
+        end: float,
+        activity_type: Optional[str] = None,
+        limit: int = 1000
+    ) -> List[dict]:
+        """Get logged activities in [start, end), newest first"""
+        if self._read_conn is None:
+            return []
+        return await asyncio.to_thread(self._query, session_token, start, end, activity_type, limit)
+    
+    def _count(self, session_token: str, start: float, end: float, width: int) -> List[Tuple[float, str, int]]:
+        """Count activities per type in width-second buckets on the read connection"""
+        sql = (
+            "SELECT CAST(timestamp / ? AS INTEGER) AS bucket, type, COUNT(*) FROM activities "
+            "WHERE session = ? AND timestamp >= ? AND timestamp < ? "
+            "GROUP BY bucket, type ORDER BY bucket"
+        )
+        with self._read_lock:
+            rows = self._read_conn.execute(sql, (width, session_token, start, end)).fetchall()
+        return [(float(bucket * width), activity_type, count) for bucket, activity_type, count in rows]
+    
+    async def count(self, session_token: str, start: float, end: float, width: int) -> List[Tuple[float, str, int]]:
+        """Get (bucket start, type, count) for logged activities in [start, end), oldest first"""
+        if self._read_conn is None:
+            return []
+        return await asyncio.to_thread(self._count, session_token, start, end, width)
+    
+    def get_stats(self) -> dict:
+        """Get write, drop and compaction counters"""
+        return {
+            **self.stats,
+            "enabled": self.enabled,
+            "pending": self._queue.qsize() if self._queue is not None else 0
+        }
+
+activity_log = ActivityLog()
@@ -0,0 +1 @@
+"""Offline benchmarks with fake Telegram and Chatbase (see benchmarks/__main__.py)"""
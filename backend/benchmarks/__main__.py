@@ -0,0 +1,102 @@
+"""
+Offline load test of the backend
+
+    python -m benchmarks --sessions 20 --messages 50 --output results.json
+    python -m benchmarks --baseline results.json --tolerance 0.2
+
+Drives the real Telethon handlers with synthetic updates, answers Chatbase
+calls from a local fake server with a configurable latency/error profile,
+and load-tests /api/stats, /api/activities and /api/dashboard through
+uvicorn. No Telegram account or Chatbase key is needed. With --baseline the
+run fails when throughput drops, or latency or memory grows, by more than
+--tolerance.
+
+Backend settings still come from the environment, e.g. run with
+CHATBASE_COALESCE_WINDOW=1.5 to measure replies with burst coalescing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+# Compared against a baseline: (section, metric, higher is better)
+TRACKED = [
+    ("handlers", "msgsPerSec", True),
+    ("handlers", "handlerP99Ms", False),
+    ("handlers", "replyP99Ms", False),
+    ("http", "/api/stats.p99Ms", False),
+    ("http", "/api/activities.p99Ms", False),
+    ("http", "/api/dashboard.p99Ms", False),
+    ("memory", "bytesPerSession", False),
+]
+
+def _lookup(results: dict, section: str, metric: str):
+    value = results.get(section, {})
+    for part in metric.split(".") if section == "http" else [metric]:
+        value = value.get(part, {}) if isinstance(value, dict) else None
+    return value if isinstance(value, (int, float)) else None
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """List metrics that regressed by more than `tolerance` against the baseline"""
+    regressions = []
+    for section, metric, higher_is_better in TRACKED:
+        current = _lookup(results, section, metric)
+        previous = _lookup(baseline, section, metric)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{section}.{metric}: {previous} -> {current} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend with fake Telegram and Chatbase")
+    parser.add_argument("--sessions", type=int, default=20, help="Signed-in fake accounts")
+    parser.add_argument("--messages", type=int, default=50, help="Incoming updates per account")
+    parser.add_argument("--chats", type=int, default=10, help="Dialogs per account")
+    parser.add_argument("--group-action-every", type=int, default=10, help="Every Nth update in a group is a member join/leave (0 disables)")
+    parser.add_argument("--rate", type=float, default=0.0, help="Updates dispatched per second (0 sends them all at once)")
+    parser.add_argument("--tg-latency", type=float, default=0.02, help="Seconds per fake Telegram API call")
+    parser.add_argument("--cb-latency", type=float, default=0.2, help="Mean seconds per Chatbase reply")
+    parser.add_argument("--cb-jitter", type=float, default=0.05, help="Uniform jitter around --cb-latency")
+    parser.add_argument("--cb-error-rate", type=float, default=0.0, help="Fraction of Chatbase calls answered with HTTP 500")
+    parser.add_argument("--cb-slow-rate", type=float, default=0.0, help="Fraction of Chatbase calls taking --cb-slow-latency")
+    parser.add_argument("--cb-slow-latency", type=float, default=5.0, help="Seconds taken by slow Chatbase calls")
+    parser.add_argument("--http-requests", type=int, default=500, help="Requests per endpoint (0 skips the HTTP scenario)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent HTTP clients")
+    parser.add_argument("--memory-sessions", type=int, default=50, help="Accounts in the memory scenario (0 skips it)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the latency/error profile")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Fail when results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression against the baseline")
+    options = parser.parse_args()
+    
+    # The backend reads settings at import time; keep the run self-contained
+    os.environ.setdefault("TELEGRAM_API_ID", "1")
+    os.environ.setdefault("TELEGRAM_API_HASH", "benchmark")
+    os.environ.setdefault("CHATBASE_API_KEY", "benchmark")
+    os.environ.setdefault("CHATBASE_CHATBOT_ID", "benchmark")
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    os.environ.setdefault("ACTIVITY_LOG_ENABLED", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    
+    from benchmarks.runner import run_all
+    
+    results = asyncio.run(run_all(options))
+    print(json.dumps(results, indent=2))
+    
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2)
+    
+    if options.baseline:
+        with open(options.baseline) as f:
+            regressions = compare(results, json.load(f), options.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
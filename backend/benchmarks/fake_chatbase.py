@@ -0,0 +1,86 @@
+"""Local stand-in for the Chatbase chat API"""
+from aiohttp import web
+from typing import Optional
+import asyncio
+import random
+
+class FakeChatbase:
+    """
+    Serves POST /api/v1/chat with a configurable latency/error profile
+    
+    Each request waits `latency` ± `jitter` seconds; `error_rate` of them
+    fail with HTTP 500 and `slow_rate` take `slow_latency` seconds instead.
+    Streaming requests receive the reply in `stream_chunks` pieces spread
+    over the same latency.
+    """
+    
+    def __init__(
+        self,
+        latency: float = 0.2,
+        jitter: float = 0.05,
+        error_rate: float = 0.0,
+        slow_rate: float = 0.0,
+        slow_latency: float = 5.0,
+        stream_chunks: int = 5,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.stream_chunks = max(1, stream_chunks)
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url: Optional[str] = None
+    
+    def _delay(self) -> float:
+        if self.slow_rate and self.random.random() < self.slow_rate:
+            return self.slow_latency
+        return max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+    
+    async def _chat(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests += 1
+        delay = self._delay()
+        
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            await asyncio.sleep(delay)
+            return web.json_response({"message": "Synthetic failure"}, status=500)
+        
+        prompt = body["messages"][-1]["content"] if body.get("messages") else ""
+        text = f"Automatic reply to: {prompt}"
+        
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return web.json_response({"text": text})
+        
+        response = web.StreamResponse()
+        await response.prepare(request)
+        size = -(-len(text) // self.stream_chunks)
+        for start in range(0, len(text), size):
+            await asyncio.sleep(delay / self.stream_chunks)
+            await response.write(text[start:start + size].encode())
+        await response.write_eof()
+        return response
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving and return the API base URL"""
+        app = web.Application()
+        app.router.add_post("/api/v1/chat", self._chat)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}/api/v1"
+        return self.base_url
+    
+    async def stop(self):
+        """Stop serving"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,201 @@
+"""Synthetic Telethon client and events for offline benchmarks"""
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+import asyncio
+import itertools
+import time
+
+from telethon import events
+from telethon.tl.types import (
+    MessageActionChatAddUser,
+    MessageActionChatDeleteUser,
+    PeerUser
+)
+
+_ids = itertools.count(1)
+
+class FakeUser:
+    """Name fields of a Telegram user"""
+    
+    def __init__(self, user_id: int, first_name: str, last_name: Optional[str] = None, username: Optional[str] = None):
+        self.id = user_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.username = username
+        self.phone = None
+
+class FakeGroup:
+    """Name fields of a Telegram group"""
+    
+    def __init__(self, chat_id: int, title: str):
+        self.id = chat_id
+        self.title = title
+        self.megagroup = True
+        self.broadcast = False
+        self.username = None
+
+class FakeMessage:
+    """Message as returned by get_messages"""
+    
+    def __init__(self, text: Optional[str], out: bool = False, from_id: Optional[int] = None):
+        self.id = next(_ids)
+        self.text = text
+        self.date = datetime.now(timezone.utc)
+        self.out = out
+        self.from_id = PeerUser(from_id) if from_id else None
+
+class FakeDialog:
+    """Dialog as returned by get_dialogs"""
+    
+    def __init__(self, entity, unread_count: int = 0):
+        self.id = entity.id
+        self.entity = entity
+        self.name = getattr(entity, "title", None) or entity.first_name
+        self.unread_count = unread_count
+
+class FakeSentMessage:
+    """Message sent by the account, supporting streamed edits"""
+    
+    def __init__(self, text: str):
+        self.text = text
+    
+    async def edit(self, text: str):
+        self.text = text
+        return self
+
+class FakeNewMessage:
+    """Incoming message event with the attributes the handlers read"""
+    
+    def __init__(self, client: "FakeTelegramClient", chat, sender: FakeUser, text: Optional[str]):
+        self.client = client
+        self.id = next(_ids)
+        self.chat_id = chat.id
+        self.sender_id = sender.id
+        self.text = text
+        self.out = False
+        self._chat = chat
+        self._sender = sender
+        self.created_at = 0.0
+        self.replied_at: Optional[float] = None
+    
+    async def get_chat(self):
+        return self._chat
+    
+    async def get_sender(self):
+        return self._sender
+    
+    async def respond(self, text: str, **kwargs):
+        if self.replied_at is None:
+            self.replied_at = time.perf_counter()
+            self.client.on_reply(self)
+        return FakeSentMessage(text)
+
+class FakeChatAction:
+    """Member join/leave event with the attributes the handlers read"""
+    
+    def __init__(self, chat: FakeGroup, user: FakeUser, joined: bool):
+        self.id = next(_ids)
+        self.chat_id = chat.id
+        self.action = MessageActionChatAddUser(users=[user.id]) if joined else MessageActionChatDeleteUser(user_id=user.id)
+        self.action_message = FakeMessage(None, from_id=user.id)
+        self.new_title = None
+        self.created = False
+        self.user_joined = joined
+        self.user_added = False
+        self.user_left = not joined
+        self.user_kicked = False
+        self.user_ids = [user.id]
+        self.created_at = 0.0
+        self._chat = chat
+    
+    async def get_chat(self):
+        return self._chat
+
+class FakeTelegramClient:
+    """
+    Stand-in for TelegramClient covering what the backend calls
+    
+    Handlers registered with `on` are dispatched the way Telethon does:
+    every builder matching the event type, in registration order. API
+    calls sleep for `latency` seconds to mimic round trips to Telegram.
+    """
+    
+    def __init__(self, user_id: int, dialogs: List[FakeDialog], contacts: List[FakeUser], latency: float = 0.0):
+        self.me = FakeUser(user_id, "Bench", f"User{user_id}", f"bench{user_id}")
+        self.dialogs = dialogs
+        self.contacts = {user.id: user for user in contacts}
+        self.latency = latency
+        self.connected = True
+        self.handlers: List[Tuple[object, Callable]] = []
+        self.replies = 0
+    
+    def on(self, builder):
+        def decorator(callback):
+            self.handlers.append((builder, callback))
+            return callback
+        return decorator
+    
+    def on_reply(self, event: FakeNewMessage):
+        self.replies += 1
+    
+    async def dispatch(self, event):
+        """Run every handler registered for the event's type"""
+        event.created_at = time.perf_counter()
+        kind = events.NewMessage if isinstance(event, FakeNewMessage) else events.ChatAction
+        for builder, callback in self.handlers:
+            if builder is kind or isinstance(builder, kind):
+                await callback(event)
+    
+    async def _round_trip(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+    
+    def is_connected(self) -> bool:
+        return self.connected
+    
+    async def connect(self):
+        self.connected = True
+    
+    async def disconnect(self):
+        self.connected = False
+    
+    async def get_me(self):
+        await self._round_trip()
+        return self.me
+    
+    async def get_peer_id(self, peer):
+        return self.me.id
+    
+    async def get_entity(self, peer):
+        await self._round_trip()
+        return self.contacts[peer.user_id]
+    
+    async def get_dialogs(self, limit: int = 100):
+        await self._round_trip()
+        return self.dialogs[:limit]
+    
+    async def get_messages(self, entity, limit: int = 5):
+        await self._round_trip()
+        return [FakeMessage(f"Message {n} in {entity.id}", out=n % 2 == 0, from_id=entity.id) for n in range(limit)]
+
+def build_account(index: int, chats: int, latency: float = 0.0) -> FakeTelegramClient:
+    """Create a client with `chats` dialogs, alternating private chats and groups"""
+    base = (index + 1) * 1_000_000
+    contacts = [FakeUser(base + n, f"Contact{n}", "Bench", f"contact{base + n}") for n in range(chats)]
+    dialogs = []
+    for n in range(chats):
+        entity = FakeGroup(-(base + n), f"Group {n}") if n % 2 else contacts[n]
+        dialogs.append(FakeDialog(entity, unread_count=n % 3))
+    return FakeTelegramClient(base, dialogs, contacts, latency)
+
+def build_events(client: FakeTelegramClient, count: int, group_action_every: int = 0) -> list:
+    """Round-robin incoming messages over the client's chats, with optional member changes"""
+    generated = []
+    for n in range(count):
+        dialog = client.dialogs[n % len(client.dialogs)]
+        sender = client.contacts[abs(dialog.id)]
+        if group_action_every and n % group_action_every == group_action_every - 1 and dialog.id < 0:
+            generated.append(FakeChatAction(dialog.entity, sender, joined=n % 2 == 0))
+        else:
+            generated.append(FakeNewMessage(client, dialog.entity, sender, f"Benchmark message {n}"))
+    return generated
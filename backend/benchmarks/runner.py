@@ -0,0 +1,210 @@
+"""Benchmark scenarios run against the real handlers and FastAPI app"""
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import gc
+import random
+import time
+import tracemalloc
+
+import aiohttp
+import uvicorn
+
+from storage import storage
+from events import register_all_handlers
+from services.chatbase_service import ChatbaseService, chatbase_service
+from services.chatbase_scheduler import chatbase_scheduler
+from services.reply_coalescer import reply_coalescer
+from services.ingest_queue import ingest_queue
+from benchmarks.fake_chatbase import FakeChatbase
+from benchmarks.fake_telegram import FakeNewMessage, FakeTelegramClient, build_account, build_events
+
+HTTP_ENDPOINTS = ("/api/stats", "/api/activities?limit=50", "/api/dashboard")
+
+def percentile_ms(samples: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of durations in seconds, in milliseconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(fraction * len(ordered)))
+    return round(ordered[index] * 1000, 2)
+
+async def _open_sessions(count: int, chats: int, latency: float, prefix: str) -> Dict[str, FakeTelegramClient]:
+    """Store fake accounts as signed-in sessions with every handler registered"""
+    clients = {}
+    for index in range(count):
+        token = f"{prefix}-{index}"
+        client = build_account(index, chats, latency)
+        storage.store_session(token, f"+1555{index:07d}", client, "")
+        await register_all_handlers(client, token)
+        clients[token] = client
+    return clients
+
+async def _close_sessions(clients: Dict[str, FakeTelegramClient]):
+    for token in clients:
+        await storage.release_session(token)
+
+async def _drain():
+    """Wait for queued updates and Chatbase replies to finish"""
+    while True:
+        scheduler = chatbase_scheduler.get_stats()
+        if not (
+            ingest_queue.pending_count() or reply_coalescer.pending_count()
+            or scheduler["running"] or scheduler["waiting"]
+        ):
+            return
+        await asyncio.sleep(0.05)
+
+async def _drive(clients: Dict[str, FakeTelegramClient], messages: int, group_action_every: int, rate: float) -> Tuple[List[float], list]:
+    """Dispatch every session's events, returning handler durations and the events"""
+    batches = [build_events(client, messages, group_action_every) for client in clients.values()]
+    clients_list = list(clients.values())
+    # Interleave sessions so load is spread the way live traffic would be
+    schedule = [
+        (clients_list[session], batch[n])
+        for n in range(messages)
+        for session, batch in enumerate(batches)
+    ]
+    durations: List[float] = []
+    
+    async def run(client, event):
+        await client.dispatch(event)
+        durations.append(time.perf_counter() - event.created_at)
+    
+    tasks = []
+    interval = 1.0 / rate if rate > 0 else 0.0
+    for client, event in schedule:
+        tasks.append(asyncio.create_task(run(client, event)))
+        if interval:
+            await asyncio.sleep(interval)
+    await asyncio.gather(*tasks)
+    await _drain()
+    return durations, [event for _, event in schedule]
+
+async def bench_handlers(sessions: int, messages: int, chats: int, group_action_every: int, rate: float, tg_latency: float):
+    """
+    Push synthetic updates through the registered Telethon handlers
+    
+    Returns the open sessions, reused by the HTTP scenario, and results.
+    """
+    clients = await _open_sessions(sessions, chats, tg_latency, "bench")
+    
+    started = time.perf_counter()
+    durations, dispatched = await _drive(clients, messages, group_action_every, rate)
+    elapsed = time.perf_counter() - started
+    
+    incoming = [event for event in dispatched if isinstance(event, FakeNewMessage)]
+    replies = [event.replied_at - event.created_at for event in incoming if event.replied_at is not None]
+    return clients, {
+        "sessions": sessions,
+        "events": len(dispatched),
+        "messages": len(incoming),
+        "seconds": round(elapsed, 3),
+        "eventsPerSec": round(len(dispatched) / elapsed, 1),
+        "msgsPerSec": round(len(incoming) / elapsed, 1),
+        "handlerP50Ms": percentile_ms(durations, 0.5),
+        "handlerP99Ms": percentile_ms(durations, 0.99),
+        "replies": len(replies),
+        "replyP50Ms": percentile_ms(replies, 0.5),
+        "replyP99Ms": percentile_ms(replies, 0.99)
+    }
+
+async def bench_http(tokens: List[str], requests: int, concurrency: int) -> dict:
+    """Load-test read endpoints through uvicorn with concurrent clients"""
+    from main import app
+    
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=0, lifespan="off", log_level="warning", access_log=False
+    ))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    
+    results = {}
+    try:
+        async with aiohttp.ClientSession(f"http://127.0.0.1:{port}") as http:
+            for endpoint in HTTP_ENDPOINTS:
+                latencies: List[float] = []
+                errors = 0
+                remaining = iter(range(requests))
+                
+                async def worker():
+                    nonlocal errors
+                    for _ in remaining:
+                        headers = {"Authorization": f"Bearer {random.choice(tokens)}"}
+                        started = time.perf_counter()
+                        async with http.get(endpoint, headers=headers) as response:
+                            await response.read()
+                            if response.status != 200:
+                                errors += 1
+                        latencies.append(time.perf_counter() - started)
+                
+                started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+                elapsed = time.perf_counter() - started
+                results[endpoint.split("?")[0]] = {
+                    "requests": requests,
+                    "errors": errors,
+                    "reqPerSec": round(requests / elapsed, 1),
+                    "p50Ms": percentile_ms(latencies, 0.5),
+                    "p99Ms": percentile_ms(latencies, 0.99)
+                }
+    finally:
+        server.should_exit = True
+        await serving
+    return results
+
+async def bench_memory(sessions: int, messages: int, chats: int) -> dict:
+    """Measure memory retained per session after it has processed traffic"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        clients = await _open_sessions(sessions, chats, 0.0, "memory")
+        await _drive(clients, messages, 0, 0.0)
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    await _close_sessions(clients)
+    return {
+        "sessions": sessions,
+        "messagesPerSession": messages,
+        "bytesPerSession": retained // sessions
+    }
+
+async def run_all(options) -> dict:
+    """Run every scenario against a fake Chatbase server"""
+    fake_chatbase = FakeChatbase(
+        latency=options.cb_latency,
+        jitter=options.cb_jitter,
+        error_rate=options.cb_error_rate,
+        slow_rate=options.cb_slow_rate,
+        slow_latency=options.cb_slow_latency,
+        seed=options.seed
+    )
+    ChatbaseService.BASE_URL = await fake_chatbase.start()
+    random.seed(options.seed)
+    await chatbase_service.startup()
+    
+    results = {}
+    try:
+        clients, results["handlers"] = await bench_handlers(
+            options.sessions, options.messages, options.chats,
+            options.group_action_every, options.rate, options.tg_latency
+        )
+        results["handlers"]["chatbaseRequests"] = fake_chatbase.requests
+        results["handlers"]["chatbaseErrors"] = fake_chatbase.errors
+        
+        if options.http_requests:
+            results["http"] = await bench_http(list(clients), options.http_requests, options.concurrency)
+        await _close_sessions(clients)
+        
+        if options.memory_sessions:
+            results["memory"] = await bench_memory(options.memory_sessions, options.messages, options.chats)
+    finally:
+        await chatbase_service.shutdown()
+        await fake_chatbase.stop()
+    return results
@@ -12,6 +12,39 @@ class Settings:
     # Chatbase configuration
     CHATBASE_API_KEY: Optional[str] = None
     CHATBASE_CHATBOT_ID: Optional[str] = None
+    CHATBASE_POOL_LIMIT: int = 100  # Max open connections in the shared pool
+    CHATBASE_POOL_LIMIT_PER_HOST: int = 20  # Max open connections to the Chatbase host
+    CHATBASE_KEEPALIVE_TIMEOUT: float = 30.0  # Seconds an idle connection is kept alive
+    CHATBASE_STREAMING: bool = False  # Stream replies and edit the Telegram message progressively
+    CHATBASE_STREAM_EDIT_INTERVAL: float = 1.0  # Min seconds between edits of a streamed reply
+    CHATBASE_STREAM_READ_TIMEOUT: float = 30.0  # Max seconds without data while a reply streams in
+    CHATBASE_COALESCE_WINDOW: float = 0.0  # Quiet seconds before replying to a burst (0 disables; adds this much latency to every reply)
+    CHATBASE_COALESCE_MAX_WAIT: float = 5.0  # Max seconds a burst can delay its reply
+    CHATBASE_MAX_CONCURRENCY: int = 10  # Max Chatbase calls in flight across all sessions
+    CHATBASE_QUEUE_MAX: int = 200  # Max Chatbase calls waiting across all sessions
+    CHATBASE_QUEUE_MAX_PER_SESSION: int = 20  # Max Chatbase calls waiting per session
+    CHATBASE_SHED_POLICY: str = "drop_oldest"  # "drop_oldest" or "reject_newest" when a queue is full
+    CHATBASE_DEFAULT_WEIGHT: float = 1.0  # Share of Chatbase capacity per session
+    CHATBASE_WEIGHTS: dict = {}  # Per-phone overrides, from "phone:weight,phone:weight"
+    CHATBASE_CACHE_ENABLED: bool = False  # Reuse replies for repeated prompts
+    CHATBASE_CACHE_TTL: float = 3600.0  # Seconds a cached reply stays valid
+    CHATBASE_CACHE_MAX_BYTES: int = 5 * 1024 * 1024  # Max total size of cached replies
+    CHATBASE_CACHE_KEY_DEPTH: int = 2  # Number of trailing history turns in the cache key (previous reply + prompt)
+    CHATBASE_CACHE_SCOPE: str = "chat"  # Where replies are reused: "chat", "session" or "global" (across accounts)
+    CHATBASE_CACHE_MIN_PROMPT_CHARS: int = 20  # Shorter prompts ("ok", "thanks") are never cached
+    
+    # Update ingestion
+    INGEST_WORKERS: int = 4  # Chats of one session processed in parallel
+    INGEST_QUEUE_MAX: int = 500  # Replies waiting per session before the overflow policy applies
+    INGEST_OVERFLOW_POLICY: str = "drop_oldest"  # "drop_oldest" or "reject_newest" when a session's queue is full
+    
+    # Outbound reply pacing
+    SEND_RATE: float = 20.0  # Max messages sent per second per account
+    SEND_BURST: float = 20.0  # Messages an account may send at once before pacing applies
+    SEND_CHAT_RATE: float = 1.0  # Max messages sent per second per chat
+    SEND_CHAT_BURST: float = 3.0  # Messages a chat may receive at once before pacing applies
+    SEND_QUEUE_MAX: int = 1000  # Messages waiting per account before new replies are dropped
+    SEND_MAX_FLOOD_WAIT: float = 300.0  # Longest flood wait in seconds honoured before a reply is dropped
     
     # Server configuration
     PORT: int = 8080
@@ -20,6 +53,77 @@ class Settings:
     # CORS configuration
     CORS_ORIGINS: list = ["*"]  # Configure with your frontend URL in production
     
+    # Session persistence configuration
+    SESSION_BACKEND: str = "sqlite"  # "sqlite" or "memory" (sessions lost on restart)
+    SESSION_DB_PATH: str = "sessions.db"
+    SESSION_RESTORE_CONCURRENCY: int = 10  # Max sessions reconnecting at once on startup
+    SESSION_RESTORE_RATE: float = 5.0  # Max reconnections started per second
+    SESSION_RESTORE_JITTER: float = 2.0  # Max random delay in seconds before each reconnection
+    SESSION_HIBERNATE_AFTER: float = 0.0  # Idle seconds before a session is disconnected (0 disables)
+    AUTH_CLIENT_TTL: float = 600.0  # Seconds a client waiting for a sign-in code is kept
+    REAPER_INTERVAL: float = 60.0  # Seconds between idle session and pending client sweeps
+    
+    # Sharding configuration (see sharding/__main__.py)
+    SHARD_ID: Optional[str] = None  # Set to run this process as one shard of a fleet
+    SHARD_NODES: list = []  # IDs of every shard in the ring
+    SHARD_SECRET: Optional[str] = None  # Shared secret for router-to-shard calls
+    
+    # Dashboard configuration
+    DASHBOARD_FETCH_CONCURRENCY: int = 5  # Max parallel get_messages calls per request
+    DASHBOARD_FETCH_TIMEOUT: float = 5.0  # Seconds before a slow chat is skipped
+    
+    # Response snapshot configuration
+    RESPONSE_SNAPSHOTS_PER_SESSION: int = 32  # Encoded responses kept per session (one per endpoint and parameters)
+    
+    # Operator overview configuration
+    OPERATOR_TOKEN: Optional[str] = None  # Token for /api/operator/* (disabled when unset)
+    OVERVIEW_CONCURRENCY: int = 10  # Sessions whose stats are collected in parallel
+    OVERVIEW_SESSION_TIMEOUT: float = 5.0  # Seconds before a session is reported without stats
+    OVERVIEW_CACHE_TTL: float = 15.0  # Seconds an overview is served before being rebuilt
+    
+    # Activity storage configuration
+    ACTIVITY_BUFFER_SIZE: int = 5000  # Activities kept in memory per session
+    ACTIVITY_HISTOGRAM_MINUTES: int = 1440  # Per-minute chart buckets kept (24 hours)
+    ACTIVITY_HISTOGRAM_HOURS: int = 168  # Per-hour chart buckets kept (7 days)
+    
+    # Activity log configuration
+    ACTIVITY_LOG_ENABLED: bool = True  # Persist activities to disk
+    ACTIVITY_LOG_PATH: str = "activity_log.db"
+    ACTIVITY_LOG_BATCH_SIZE: int = 500  # Max activities per write transaction
+    ACTIVITY_LOG_FLUSH_INTERVAL: float = 1.0  # Max seconds an activity waits before being written
+    ACTIVITY_LOG_QUEUE_MAX: int = 100000  # Activities waiting to be written before new ones are dropped
+    ACTIVITY_LOG_RETENTION_DAYS: float = 14.0  # Days of activity kept on disk
+    ACTIVITY_LOG_COMPACT_INTERVAL: float = 3600.0  # Seconds between retention passes
+    
+    # Activity stream configuration
+    STREAM_SUBSCRIBER_BUFFER: int = 100  # Events buffered per subscriber before it is dropped
+    STREAM_REPLAY_SIZE: int = 500  # Events kept per session for Last-Event-ID resume
+    STREAM_HEARTBEAT: float = 15.0  # Seconds between keep-alive comments
+    
+    # Logging configuration
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" or "text"
+    LOG_QUEUE_MAX: int = 10000  # Records buffered for the log writer before new ones are dropped
+    LOG_RATE_LIMIT: int = 20  # Max records per message template and interval (0 disables)
+    LOG_RATE_INTERVAL: float = 10.0  # Seconds per rate-limit interval
+    
+    # Conversation history configuration
+    HISTORY_MAX_MESSAGES: int = 50  # Max turns kept per chat
+    HISTORY_MAX_TOKENS: int = 4000  # Approximate token budget per chat
+    HISTORY_IDLE_TTL: float = 86400.0  # Seconds before an idle chat's history is dropped
+    
+    # Entity name cache configuration
+    ENTITY_CACHE_SIZE: int = 5000  # Max users/chats with cached names per session
+    ENTITY_CACHE_TTL: float = 3600.0  # Seconds before a cached name is resolved again
+    
+    # Own profile cache configuration
+    PROFILE_CACHE_TTL: float = 3600.0  # Seconds before the signed-in user's profile is fetched again
+    
+    # Dialog cache configuration
+    DIALOG_CACHE_TTL: float = 300.0  # Seconds before cached dialogs are re-fetched
+    DIALOG_CACHE_MAX_DIALOGS: int = 100  # Dialogs fetched and kept per session
+    DIALOG_CACHE_MAX_SESSIONS: int = 1000  # Least recently used sessions are evicted
+    
     def __init__(self):
         """Initialize settings from environment variables"""
         api_id = os.getenv("TELEGRAM_API_ID")
@@ -34,6 +138,112 @@ class Settings:
         
         self.CHATBASE_API_KEY = os.getenv("CHATBASE_API_KEY")
         self.CHATBASE_CHATBOT_ID = os.getenv("CHATBASE_CHATBOT_ID")
+        self.CHATBASE_POOL_LIMIT = int(os.getenv("CHATBASE_POOL_LIMIT", 100))
+        self.CHATBASE_POOL_LIMIT_PER_HOST = int(os.getenv("CHATBASE_POOL_LIMIT_PER_HOST", 20))
+        self.CHATBASE_KEEPALIVE_TIMEOUT = float(os.getenv("CHATBASE_KEEPALIVE_TIMEOUT", 30.0))
+        self.CHATBASE_STREAMING = os.getenv("CHATBASE_STREAMING", "false").lower() in ("1", "true", "yes")
+        self.CHATBASE_STREAM_EDIT_INTERVAL = float(os.getenv("CHATBASE_STREAM_EDIT_INTERVAL", 1.0))
+        self.CHATBASE_STREAM_READ_TIMEOUT = max(1.0, float(os.getenv("CHATBASE_STREAM_READ_TIMEOUT", 30.0)))
+        self.CHATBASE_COALESCE_WINDOW = float(os.getenv("CHATBASE_COALESCE_WINDOW", 0.0))
+        self.CHATBASE_COALESCE_MAX_WAIT = float(os.getenv("CHATBASE_COALESCE_MAX_WAIT", 5.0))
+        self.CHATBASE_MAX_CONCURRENCY = max(1, int(os.getenv("CHATBASE_MAX_CONCURRENCY", 10)))
+        self.CHATBASE_QUEUE_MAX = max(1, int(os.getenv("CHATBASE_QUEUE_MAX", 200)))
+        self.CHATBASE_QUEUE_MAX_PER_SESSION = max(1, int(os.getenv("CHATBASE_QUEUE_MAX_PER_SESSION", 20)))
+        self.CHATBASE_SHED_POLICY = os.getenv("CHATBASE_SHED_POLICY", "drop_oldest")
+        if self.CHATBASE_SHED_POLICY not in ("drop_oldest", "reject_newest"):
+            raise ValueError("CHATBASE_SHED_POLICY must be 'drop_oldest' or 'reject_newest'")
+        self.CHATBASE_DEFAULT_WEIGHT = max(0.01, float(os.getenv("CHATBASE_DEFAULT_WEIGHT", 1.0)))
+        self.CHATBASE_WEIGHTS = {}
+        for entry in os.getenv("CHATBASE_WEIGHTS", "").split(","):
+            if not entry.strip():
+                continue
+            phone, _, weight = entry.rpartition(":")
+            if not phone.strip():
+                raise ValueError("CHATBASE_WEIGHTS entries must look like 'phone:weight'")
+            self.CHATBASE_WEIGHTS[phone.strip()] = max(0.01, float(weight))
+        self.CHATBASE_CACHE_ENABLED = os.getenv("CHATBASE_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.CHATBASE_CACHE_TTL = float(os.getenv("CHATBASE_CACHE_TTL", 3600.0))
+        self.CHATBASE_CACHE_MAX_BYTES = int(os.getenv("CHATBASE_CACHE_MAX_BYTES", 5 * 1024 * 1024))
+        self.CHATBASE_CACHE_KEY_DEPTH = max(1, int(os.getenv("CHATBASE_CACHE_KEY_DEPTH", 2)))
+        self.CHATBASE_CACHE_SCOPE = os.getenv("CHATBASE_CACHE_SCOPE", "chat")
+        if self.CHATBASE_CACHE_SCOPE not in ("chat", "session", "global"):
+            raise ValueError("CHATBASE_CACHE_SCOPE must be 'chat', 'session' or 'global'")
+        self.CHATBASE_CACHE_MIN_PROMPT_CHARS = max(0, int(os.getenv("CHATBASE_CACHE_MIN_PROMPT_CHARS", 20)))
+        
+        self.INGEST_WORKERS = max(1, int(os.getenv("INGEST_WORKERS", 4)))
+        self.INGEST_QUEUE_MAX = max(1, int(os.getenv("INGEST_QUEUE_MAX", 500)))
+        self.INGEST_OVERFLOW_POLICY = os.getenv("INGEST_OVERFLOW_POLICY", "drop_oldest")
+        if self.INGEST_OVERFLOW_POLICY not in ("drop_oldest", "reject_newest"):
+            raise ValueError("INGEST_OVERFLOW_POLICY must be 'drop_oldest' or 'reject_newest'")
+        
+        self.SEND_RATE = max(0.1, float(os.getenv("SEND_RATE", 20.0)))
+        self.SEND_BURST = max(1.0, float(os.getenv("SEND_BURST", 20.0)))
+        self.SEND_CHAT_RATE = max(0.01, float(os.getenv("SEND_CHAT_RATE", 1.0)))
+        self.SEND_CHAT_BURST = max(1.0, float(os.getenv("SEND_CHAT_BURST", 3.0)))
+        self.SEND_QUEUE_MAX = max(1, int(os.getenv("SEND_QUEUE_MAX", 1000)))
+        self.SEND_MAX_FLOOD_WAIT = float(os.getenv("SEND_MAX_FLOOD_WAIT", 300.0))
+        
+        self.SESSION_BACKEND = os.getenv("SESSION_BACKEND", "sqlite")
+        if self.SESSION_BACKEND not in ("sqlite", "memory"):
+            raise ValueError("SESSION_BACKEND must be 'sqlite' or 'memory'")
+        self.SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "sessions.db")
+        self.SESSION_RESTORE_CONCURRENCY = max(1, int(os.getenv("SESSION_RESTORE_CONCURRENCY", 10)))
+        self.SESSION_RESTORE_RATE = max(0.1, float(os.getenv("SESSION_RESTORE_RATE", 5.0)))
+        self.SESSION_RESTORE_JITTER = max(0.0, float(os.getenv("SESSION_RESTORE_JITTER", 2.0)))
+        self.SESSION_HIBERNATE_AFTER = max(0.0, float(os.getenv("SESSION_HIBERNATE_AFTER", 0.0)))
+        self.AUTH_CLIENT_TTL = max(1.0, float(os.getenv("AUTH_CLIENT_TTL", 600.0)))
+        self.REAPER_INTERVAL = max(1.0, float(os.getenv("REAPER_INTERVAL", 60.0)))
+        
+        self.SHARD_ID = os.getenv("SHARD_ID") or None
+        self.SHARD_NODES = [node for node in os.getenv("SHARD_NODES", "").split(",") if node]
+        self.SHARD_SECRET = os.getenv("SHARD_SECRET") or None
+        
+        self.DASHBOARD_FETCH_CONCURRENCY = max(1, int(os.getenv("DASHBOARD_FETCH_CONCURRENCY", 5)))
+        self.DASHBOARD_FETCH_TIMEOUT = float(os.getenv("DASHBOARD_FETCH_TIMEOUT", 5.0))
+        
+        self.RESPONSE_SNAPSHOTS_PER_SESSION = max(1, int(os.getenv("RESPONSE_SNAPSHOTS_PER_SESSION", 32)))
+        
+        self.OPERATOR_TOKEN = os.getenv("OPERATOR_TOKEN") or None
+        self.OVERVIEW_CONCURRENCY = max(1, int(os.getenv("OVERVIEW_CONCURRENCY", 10)))
+        self.OVERVIEW_SESSION_TIMEOUT = max(0.1, float(os.getenv("OVERVIEW_SESSION_TIMEOUT", 5.0)))
+        self.OVERVIEW_CACHE_TTL = max(0.0, float(os.getenv("OVERVIEW_CACHE_TTL", 15.0)))
+        
+        self.ACTIVITY_BUFFER_SIZE = max(1, int(os.getenv("ACTIVITY_BUFFER_SIZE", 5000)))
+        self.ACTIVITY_HISTOGRAM_MINUTES = max(1, int(os.getenv("ACTIVITY_HISTOGRAM_MINUTES", 1440)))
+        self.ACTIVITY_HISTOGRAM_HOURS = max(1, int(os.getenv("ACTIVITY_HISTOGRAM_HOURS", 168)))
+        
+        self.ACTIVITY_LOG_ENABLED = os.getenv("ACTIVITY_LOG_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.ACTIVITY_LOG_PATH = os.getenv("ACTIVITY_LOG_PATH", "activity_log.db")
+        self.ACTIVITY_LOG_BATCH_SIZE = max(1, int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", 500)))
+        self.ACTIVITY_LOG_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL", 1.0))
+        self.ACTIVITY_LOG_QUEUE_MAX = max(1, int(os.getenv("ACTIVITY_LOG_QUEUE_MAX", 100000)))
+        self.ACTIVITY_LOG_RETENTION_DAYS = float(os.getenv("ACTIVITY_LOG_RETENTION_DAYS", 14.0))
+        self.ACTIVITY_LOG_COMPACT_INTERVAL = float(os.getenv("ACTIVITY_LOG_COMPACT_INTERVAL", 3600.0))
+        
+        self.STREAM_SUBSCRIBER_BUFFER = max(1, int(os.getenv("STREAM_SUBSCRIBER_BUFFER", 100)))
+        self.STREAM_REPLAY_SIZE = max(1, int(os.getenv("STREAM_REPLAY_SIZE", 500)))
+        self.STREAM_HEARTBEAT = float(os.getenv("STREAM_HEARTBEAT", 15.0))
+        
+        self.LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+        self.LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+        if self.LOG_FORMAT not in ("json", "text"):
+            raise ValueError("LOG_FORMAT must be 'json' or 'text'")
+        self.LOG_QUEUE_MAX = max(1, int(os.getenv("LOG_QUEUE_MAX", 10000)))
+        self.LOG_RATE_LIMIT = max(0, int(os.getenv("LOG_RATE_LIMIT", 20)))
+        self.LOG_RATE_INTERVAL = max(0.1, float(os.getenv("LOG_RATE_INTERVAL", 10.0)))
+        
+        self.HISTORY_MAX_MESSAGES = max(1, int(os.getenv("HISTORY_MAX_MESSAGES", 50)))
+        self.HISTORY_MAX_TOKENS = max(1, int(os.getenv("HISTORY_MAX_TOKENS", 4000)))
+        self.HISTORY_IDLE_TTL = float(os.getenv("HISTORY_IDLE_TTL", 86400.0))
+        
+        self.ENTITY_CACHE_SIZE = max(1, int(os.getenv("ENTITY_CACHE_SIZE", 5000)))
+        self.ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", 3600.0))
+        
+        self.PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", 3600.0))
+        
+        self.DIALOG_CACHE_TTL = float(os.getenv("DIALOG_CACHE_TTL", 300.0))
+        self.DIALOG_CACHE_MAX_DIALOGS = max(1, int(os.getenv("DIALOG_CACHE_MAX_DIALOGS", 100)))
+        self.DIALOG_CACHE_MAX_SESSIONS = max(1, int(os.getenv("DIALOG_CACHE_MAX_SESSIONS", 1000)))
 
 # Global settings instance
 settings = Settings()
@@ -0,0 +1,87 @@
+"""Bounded per-chat conversation history"""
+from collections import OrderedDict, deque
+from typing import Deque, List
+import time
+
+def estimate_tokens(content: str) -> int:
+    """Approximate the token count of a message (about 4 characters per token)"""
+    return len(content) // 4 + 1
+
+class ChatHistory:
+    """
+    Conversation turns of a single chat
+    
+    Turns are kept in a deque and trimmed from the oldest end whenever the
+    message count or the approximate token total exceeds its limit. The
+    token total is maintained incrementally, so trimming is O(1) per turn.
+    """
+    
+    def __init__(self, max_messages: int, max_tokens: int):
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.turns: Deque[dict] = deque()
+        self.tokens = 0
+        self.last_used = time.monotonic()
+    
+    def append(self, role: str, content: str, merge: bool = False):
+        """Add a turn, optionally merging it into a previous turn by the same role"""
+        if merge and self.turns and self.turns[-1]["role"] == role:
+            previous = self.turns.pop()
+            self.tokens -= estimate_tokens(previous["content"])
+            content = f"{previous['content']}\n{content}"
+        
+        self.turns.append({
+            "role": role,
+            "content": content
+        })
+        self.tokens += estimate_tokens(content)
+        self.last_used = time.monotonic()
+        
+        # Always keep the newest turn, even if it alone exceeds the budget
+        while len(self.turns) > 1 and (len(self.turns) > self.max_messages or self.tokens > self.max_tokens):
+            evicted = self.turns.popleft()
+            self.tokens -= estimate_tokens(evicted["content"])
+    
+    def messages(self) -> List[dict]:
+        """Get a snapshot of the turns, oldest first"""
+        return list(self.turns)
+
+class ConversationStore:
+    """
+    Chat histories of a single session
+    
+    Chats are kept in least-recently-used order, so histories idle for longer
+    than the TTL are evicted from the front in amortized O(1) on each access.
+    """
+    
+    def __init__(self, max_messages: int, max_tokens: int, idle_ttl: float):
+        self.max_messages = max_messages
+        self.max_tokens = max_tokens
+        self.idle_ttl = idle_ttl
+        self.chats: "OrderedDict[str, ChatHistory]" = OrderedDict()
+    
+    def _evict_idle(self):
+        """Drop chats that have not been used within the TTL"""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self.chats:
+            chat_id, history = next(iter(self.chats.items()))
+            if history.last_used >= cutoff:
+                break
+            del self.chats[chat_id]
+    
+    def add(self, chat_id: str, role: str, content: str, merge: bool = False):
+        """Add a turn to a chat's history"""
+        self._evict_idle()
+        history = self.chats.get(chat_id)
+        if history is None:
+            history = ChatHistory(self.max_messages, self.max_tokens)
+            self.chats[chat_id] = history
+        else:
+            self.chats.move_to_end(chat_id)
+        history.append(role, content, merge=merge)
+    
+    def get(self, chat_id: str) -> List[dict]:
+        """Get a snapshot of a chat's history"""
+        self._evict_idle()
+        history = self.chats.get(chat_id)
+        return history.messages() if history is not None else []
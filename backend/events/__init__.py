@@ -1,11 +1,18 @@
 """Event handlers initialization"""
 from events.message_handler import MessageHandler
 from events.group_handler import GroupHandler
+from events.dialog_handler import DialogHandler
+from events.profile_handler import ProfileHandler
 from telethon import TelegramClient
+from structured_log import get_logger, log_context
 import asyncio
 
+log = get_logger(__name__)
+
 async def register_all_handlers(client: TelegramClient, session_token: str):
     """Register all event handlers for a client"""
     MessageHandler.register(client, session_token)
     GroupHandler.register(client, session_token)
-    print(f"[v0] Event handlers registered for session {session_token[:8]}...")
+    DialogHandler.register(client, session_token)
+    ProfileHandler.register(client, session_token)
+    log.info("Event handlers registered", extra=log_context(session_token))
@@ -0,0 +1,47 @@
+"""Event handler keeping the dialog cache in sync with Telegram updates"""
+from telethon import events
+from telethon import TelegramClient
+
+from services.dialog_cache import dialog_cache
+from services.event_bus import event_bus
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
+
+class DialogHandler:
+    """Applies message, read and chat action updates to the dialog cache"""
+    
+    @staticmethod
+    def register(client: TelegramClient, session_token: str):
+        """Register dialog cache event handlers"""
+        
+        @client.on(events.NewMessage())
+        async def handle_dialog_message(event):
+            """Bump unread counts and ordering for new messages"""
+            delta = dialog_cache.on_new_message(session_token, event.chat_id, event.out)
+            if delta:
+                event_bus.publish(session_token, "stats", {"unreadMessages": delta})
+        
+        @client.on(events.MessageRead(inbox=True))
+        async def handle_dialog_read(event):
+            """Reset unread counts when a chat is read"""
+            delta = dialog_cache.on_read(session_token, event.chat_id)
+            if delta:
+                event_bus.publish(session_token, "stats", {"unreadMessages": delta})
+        
+        @client.on(events.ChatAction)
+        async def handle_dialog_action(event):
+            """Track renames and membership changes affecting the dialog list"""
+            try:
+                if event.new_title:
+                    dialog_cache.on_chat_renamed(session_token, event.chat_id, event.new_title)
+                elif event.created:
+                    dialog_cache.invalidate(session_token)
+                elif event.user_joined or event.user_added or event.user_left or event.user_kicked:
+                    # Only our own membership changes alter the dialog list
+                    my_id = await client.get_peer_id('me')
+                    if my_id in event.user_ids:
+                        dialog_cache.invalidate(session_token)
+            except Exception as e:
+                log.exception("Error updating dialog cache: %s", e, extra=log_context(session_token))
+                dialog_cache.invalidate(session_token)
@@ -6,13 +6,34 @@ from telethon.tl.types import (
     MessageActionChatJoinedByLink,
     MessageActionChatDeleteUser
 )
+from telethon import utils
 from datetime import datetime
 
 from storage import storage
+from services.entity_cache import entity_cache, member_display_name
+from metrics import HANDLER_STAGE_SECONDS
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
 
 class GroupHandler:
     """Handles group member join/leave events"""
     
+    @staticmethod
+    async def _get_actor_name(client: TelegramClient, session_token: str, event) -> str:
+        """Get the name of the user behind a chat action"""
+        if not (event.action_message and event.action_message.from_id):
+            return "Someone"
+        
+        from_id = event.action_message.from_id
+        with HANDLER_STAGE_SECONDS.time("group", "get_entity"):
+            user = await entity_cache.resolve(
+                session_token,
+                utils.get_peer_id(from_id),
+                lambda: client.get_entity(from_id)
+            )
+        return member_display_name(user)
+    
     @staticmethod
     def register(client: TelegramClient, session_token: str):
         """Register group event handlers"""
@@ -21,17 +42,18 @@ class GroupHandler:
         async def handle_chat_action(event):
             """Handle chat actions (joins, leaves, etc.)"""
             try:
-                chat = await event.get_chat()
-                chat_name = getattr(chat, 'title', 'Unknown Group')
+                if event.new_title:
+                    # Renamed chat, drop the stale title before resolving it
+                    entity_cache.invalidate(session_token, event.chat_id)
+                
+                with HANDLER_STAGE_SECONDS.time("group", "get_chat"):
+                    chat = await entity_cache.resolve(session_token, event.chat_id, event.get_chat)
+                chat_name = chat["title"] or "Unknown Group"
                 
                 # Member joined
                 if isinstance(event.action, (MessageActionChatAddUser, MessageActionChatJoinedByLink)):
                     # Get user who joined
-                    if event.action_message and event.action_message.from_id:
-                        user = await client.get_entity(event.action_message.from_id)
-                        user_name = getattr(user, 'username', getattr(user, 'first_name', 'Unknown'))
-                    else:
-                        user_name = "Someone"
+                    user_name = await GroupHandler._get_actor_name(client, session_token, event)
                     
                     activity = {
                         "id": f"join_{event.id}_{datetime.now().timestamp()}",
@@ -43,16 +65,12 @@ class GroupHandler:
                     }
                     
                     storage.add_activity(session_token, activity)
-                    print(f"[v0] {user_name} joined {chat_name}")
+                    log.info("%s joined %s", user_name, chat_name, extra=log_context(session_token, event.chat_id))
                 
                 # Member left or was removed
                 elif isinstance(event.action, MessageActionChatDeleteUser):
                     # Get user who left
-                    if event.action_message and event.action_message.from_id:
-                        user = await client.get_entity(event.action_message.from_id)
-                        user_name = getattr(user, 'username', getattr(user, 'first_name', 'Unknown'))
-                    else:
-                        user_name = "Someone"
+                    user_name = await GroupHandler._get_actor_name(client, session_token, event)
                     
                     activity = {
                         "id": f"leave_{event.id}_{datetime.now().timestamp()}",
@@ -64,7 +82,7 @@ class GroupHandler:
                     }
                     
                     storage.add_activity(session_token, activity)
-                    print(f"[v0] {user_name} left {chat_name}")
+                    log.info("%s left %s", user_name, chat_name, extra=log_context(session_token, event.chat_id))
                     
             except Exception as e:
-                print(f"[v0] Error handling chat action: {e}")
+                log.exception("Error handling chat action: %s", e, extra=log_context(session_token, event.chat_id))
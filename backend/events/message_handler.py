@@ -1,53 +1,233 @@
 """Event handler for new messages"""
 from telethon import events
 from telethon import TelegramClient
+from telethon.errors import MessageNotModifiedError
 from datetime import datetime
+from contextlib import aclosing
+from typing import AsyncIterator, List, Optional
+import asyncio
+import time
 
+from config import settings
 from storage import storage
-from services.chatbase_service import chatbase_service
+from services.chatbase_service import chatbase_service, StreamInterrupted
+from services.entity_cache import entity_cache, chat_display_name, user_display_name
+from services.reply_coalescer import reply_coalescer
+from services.chatbase_scheduler import chatbase_scheduler, SchedulerOverloaded
+from services.outbound_sender import outbound_sender, MAX_MESSAGE_LENGTH
+from services.ingest_queue import ingest_queue
+from metrics import HANDLER_STAGE_SECONDS
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
 
 class MessageHandler:
     """Handles new message events from Telegram"""
     
+    @staticmethod
+    def _editor(reply):
+        """Send function editing `reply`, for paced edits through the outbound queue"""
+        async def edit(text: str):
+            try:
+                return await reply.edit(text)
+            except MessageNotModifiedError:
+                return reply
+        return edit
+    
+    @staticmethod
+    async def _discard(reply, session_token: str, chat_id: str):
+        """Delete a partially streamed reply, if one was sent"""
+        if reply is not None:
+            try:
+                await reply.delete()
+            except Exception as e:
+                log.warning("Error deleting partial reply: %s", e, extra=log_context(session_token, chat_id))
+    
+    @staticmethod
+    async def _read_stream(session_token: str, history: List[dict], chat_id: str) -> AsyncIterator[str]:
+        """
+        Read a Chatbase reply in a background task holding a scheduler slot
+        The slot is released as soon as Chatbase is done, however long the
+        caller spends on paced Telegram edits; text received in the meantime
+        is yielded in one piece. Stream errors are re-raised at the end.
+        """
+        channel: asyncio.Queue = asyncio.Queue()
+        
+        async def read():
+            try:
+                async with chatbase_scheduler.slot(session_token):
+                    with HANDLER_STAGE_SECONDS.time("message", "chatbase"):
+                        async for chunk in chatbase_service.stream_message(messages=history, conversation_id=chat_id):
+                            channel.put_nowait(chunk)
+            finally:
+                channel.put_nowait(None)
+        
+        reader = asyncio.create_task(read())
+        try:
+            finished = False
+            while not finished:
+                chunks = [await channel.get()]
+                while not channel.empty():
+                    chunks.append(channel.get_nowait())
+                if chunks[-1] is None:
+                    finished = True
+                    chunks.pop()
+                if chunks:
+                    yield "".join(chunks)
+            await reader
+        finally:
+            # Also releases the slot when the caller stops early or is cancelled
+            reader.cancel()
+            await asyncio.gather(reader, return_exceptions=True)
+    
+    @staticmethod
+    async def _stream_reply(event, session_token: str, history: List[dict], chat_id: str) -> Optional[str]:
+        """
+        Stream a Chatbase reply into Telegram
+        
+        The first chunk is sent through the outbound queue as a new message
+        which is then edited as more text arrives, at most once every
+        CHATBASE_STREAM_EDIT_INTERVAL seconds. Edits go through the same
+        queue, so they share the account's pacing and flood-wait handling,
+        and a scheduler slot is only held while Chatbase streams.
+        Returns the full response text, or None if nothing was received, the
+        stream broke off or the reply could not be sent. If the stream breaks
+        off or the reply is cancelled, the partial message is deleted.
+        """
+        text = ""
+        shown = ""
+        reply = None
+        next_edit = 0.0
+        
+        try:
+            async with aclosing(MessageHandler._read_stream(session_token, history, chat_id)) as stream:
+                async for chunk in stream:
+                    text += chunk
+                    visible = text[:MAX_MESSAGE_LENGTH]
+                    if not visible.strip() or visible == shown:
+                        continue
+                    
+                    now = time.monotonic()
+                    if reply is not None and now < next_edit:
+                        continue
+                    
+                    if reply is None:
+                        sent = await outbound_sender.send(session_token, chat_id, event.respond, visible)
+                        if sent is None:
+                            return None
+                        reply, shown = sent[0], visible
+                        edit = MessageHandler._editor(reply)
+                        next_edit = time.monotonic() + settings.CHATBASE_STREAM_EDIT_INTERVAL
+                        continue
+                    
+                    # A failed intermediate edit is not retried, the final edit below catches up
+                    if await outbound_sender.send(session_token, chat_id, edit, visible) is not None:
+                        shown = visible
+                    next_edit = time.monotonic() + settings.CHATBASE_STREAM_EDIT_INTERVAL
+            
+            if not text.strip():
+                return None
+            
+            if reply is None:
+                sent = await outbound_sender.send(session_token, chat_id, event.respond, text)
+                return text if sent is not None else None
+            
+            visible = text[:MAX_MESSAGE_LENGTH]
+            if visible != shown:
+                if await outbound_sender.send(session_token, chat_id, edit, visible) is None:
+                    return None
+            
+            # Send any overflow beyond Telegram's length limit as follow-up messages
+            overflow = text[MAX_MESSAGE_LENGTH:]
+            if overflow.strip():
+                if await outbound_sender.send(session_token, chat_id, event.respond, overflow) is None:
+                    return None
+            
+            return text
+        except StreamInterrupted as e:
+            # A truncated reply must not look complete, in the chat or in the history
+            log.warning("Streamed reply interrupted: %s", e, extra=log_context(session_token, chat_id))
+            await MessageHandler._discard(reply, session_token, chat_id)
+            return None
+        except asyncio.CancelledError:
+            # Superseded by a newer reply; remove the partial message so only that one remains
+            await MessageHandler._discard(reply, session_token, chat_id)
+            raise
+    
+    @staticmethod
+    async def _reply(event, session_token: str, chat_id: str, chat_name: str):
+        """Generate a Chatbase reply from the chat history and send it to Telegram"""
+        context = log_context(session_token, chat_id)
+        try:
+            # Get a snapshot of the conversation history
+            history = storage.get_conversation_history(session_token, chat_id)
+            
+            response_text = chatbase_service.get_cached_reply(session_token, chat_id, history)
+            streamed = False
+            
+            if response_text:
+                log.debug("Using cached Chatbase response", extra=context)
+            else:
+                log.debug("Calling Chatbase with %d messages in history", len(history), extra=context)
+                if settings.CHATBASE_STREAMING:
+                    # Response is sent to Telegram progressively while streaming
+                    response_text = await MessageHandler._stream_reply(event, session_token, history, chat_id)
+                    streamed = True
+                else:
+                    # Call Chatbase API once the scheduler admits this session
+                    async with chatbase_scheduler.slot(session_token):
+                        with HANDLER_STAGE_SECONDS.time("message", "chatbase"):
+                            response_text = await chatbase_service.send_message(
+                                messages=history,
+                                conversation_id=chat_id
+                            )
+                
+                if response_text:
+                    chatbase_service.cache_reply(session_token, chat_id, history, response_text)
+            
+            if response_text and not streamed:
+                # Send response back to Telegram, paced and split by the outbound queue
+                with HANDLER_STAGE_SECONDS.time("message", "respond"):
+                    if await outbound_sender.send(session_token, chat_id, event.respond, response_text) is None:
+                        response_text = None
+            
+            if response_text:
+                log.debug("Chatbase response: %s", response_text[:100], extra=context)
+                
+                # Add assistant response to history
+                storage.add_message_to_history(session_token, chat_id, "assistant", response_text)
+                log.info("Sent response to %s", chat_name, extra=context)
+            else:
+                log.warning("No response sent", extra=context)
+        
+        except asyncio.CancelledError:
+            log.debug("Reply to %s superseded by a newer message", chat_name, extra=context)
+            raise
+        except SchedulerOverloaded as e:
+            log.warning("Reply to %s shed: %s", chat_name, e, extra=context)
+        except Exception as e:
+            log.exception("Error replying to message: %s", e, extra=context)
+    
     @staticmethod
     def register(client: TelegramClient, session_token: str):
         """Register message event handler"""
         
         @client.on(events.NewMessage(incoming=True))
         async def handle_new_message(event):
-            """Handle incoming messages"""
+            """Record an incoming message as it arrives and queue the reply to it"""
             try:
-                sender = await event.get_sender()
-                chat = await event.get_chat()
+                # Resolve names from the per-session cache, fetching on a miss
+                with HANDLER_STAGE_SECONDS.time("message", "get_sender"):
+                    sender = await entity_cache.resolve(session_token, event.sender_id, event.get_sender)
+                with HANDLER_STAGE_SECONDS.time("message", "get_chat"):
+                    chat = await entity_cache.resolve(session_token, event.chat_id, event.get_chat)
                 
                 # Get chat ID for conversation tracking
                 chat_id = str(event.chat_id)
                 
-                # Determine chat name - for private chats, use sender's name
-                chat_name = "Unknown"
-                
-                # Try to get chat title first (for groups/channels)
-                if hasattr(chat, 'title') and chat.title:
-                    chat_name = chat.title
-                # For private chats, use the other person's name
-                elif hasattr(sender, 'first_name'):
-                    chat_name = sender.first_name
-                    if hasattr(sender, 'last_name') and sender.last_name:
-                        chat_name += f" {sender.last_name}"
-                # Fallback to username
-                elif hasattr(sender, 'username') and sender.username:
-                    chat_name = f"@{sender.username}"
-                elif hasattr(chat, 'username') and chat.username:
-                    chat_name = f"@{chat.username}"
-                
-                # Determine sender name
-                sender_name = "Unknown"
-                if hasattr(sender, 'first_name') and sender.first_name:
-                    sender_name = sender.first_name
-                    if hasattr(sender, 'last_name') and sender.last_name:
-                        sender_name += f" {sender.last_name}"
-                elif hasattr(sender, 'username') and sender.username:
-                    sender_name = f"@{sender.username}"
+                # Groups and channels use their title, private chats the other person's name
+                chat_name = chat_display_name(chat, sender)
+                sender_name = user_display_name(sender)
                 
                 message_text = event.text if event.text else "📎 Media message"
                 
@@ -61,36 +241,23 @@ class MessageHandler:
                     "timestamp": datetime.now().isoformat()
                 }
                 
-                storage.add_activity(session_token, activity)
-                print(f"[v0] New message from {sender_name} in {chat_name}: {message_text[:50]}")
+                with HANDLER_STAGE_SECONDS.time("message", "store_activity"):
+                    storage.add_activity(session_token, activity)
+                log.info("New message from %s in %s: %s", sender_name, chat_name, message_text[:50], extra=log_context(session_token, chat_id))
                 
                 if event.text:  # Only process text messages
-                    # Add user message to history
-                    storage.add_message_to_history(session_token, chat_id, "user", event.text)
-                    
-                    # Get conversation history
-                    history = storage.get_conversation_history(session_token, chat_id)
-                    
-                    # Call Chatbase API
-                    print(f"[v0] Calling Chatbase with {len(history)} messages in history...")
-                    response_text = await chatbase_service.send_message(
-                        messages=history,
-                        conversation_id=chat_id
+                    # Add user message to history, merging bursts into a single turn
+                    storage.add_message_to_history(
+                        session_token, chat_id, "user", event.text,
+                        merge=reply_coalescer.enabled
                     )
                     
-                    if response_text:
-                        print(f"[v0] Chatbase response: {response_text[:100]}")
-                        
-                        # Add assistant response to history
-                        storage.add_message_to_history(session_token, chat_id, "assistant", response_text)
-                        
-                        # Send response back to Telegram
-                        await event.respond(response_text)
-                        print(f"[v0] Sent response to {chat_name}")
+                    reply = lambda: MessageHandler._reply(event, session_token, chat_id, chat_name)
+                    if reply_coalescer.enabled:
+                        reply_coalescer.submit(session_token, chat_id, reply)
                     else:
-                        print("[v0] No response from Chatbase")
+                        # Only the reply waits behind the chat's earlier replies, never the recording above
+                        ingest_queue.submit(session_token, chat_id, reply)
                 
             except Exception as e:
-                print(f"[v0] Error handling message: {e}")
-                import traceback
-                traceback.print_exc()
+                log.exception("Error handling message: %s", e, extra=log_context(session_token, event.chat_id))
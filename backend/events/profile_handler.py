@@ -0,0 +1,36 @@
+"""Event handler for user profile updates"""
+from telethon import events
+from telethon import TelegramClient
+from telethon.tl.types import UpdateUser, UpdateUserName, UpdateUserPhone
+
+from services.entity_cache import entity_cache
+from services.profile_cache import profile_cache
+
+class ProfileHandler:
+    """Keeps cached names and the account's own profile in sync with profile updates"""
+    
+    @staticmethod
+    def register(client: TelegramClient, session_token: str):
+        """Register profile event handlers"""
+        
+        @client.on(events.Raw)
+        async def handle_any_update(update):
+            """Record that the connection is delivering updates"""
+            profile_cache.mark_update(session_token)
+        
+        @client.on(events.Raw(UpdateUserName))
+        async def handle_user_name(update):
+            """Forget a user's cached name when it changes"""
+            entity_cache.invalidate(session_token, update.user_id)
+            profile_cache.on_user_name(session_token, update)
+        
+        @client.on(events.Raw(UpdateUserPhone))
+        async def handle_user_phone(update):
+            """Keep the account's own phone number current"""
+            profile_cache.on_user_phone(session_token, update)
+        
+        @client.on(events.Raw(UpdateUser))
+        async def handle_user(update):
+            """Refetch names and the own profile after other profile changes"""
+            entity_cache.invalidate(session_token, update.user_id)
+            profile_cache.on_user(session_token, update)
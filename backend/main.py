@@ -1,9 +1,28 @@
 """Main FastAPI application entry point"""
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from config import settings
 from routes import register_routes
+from storage import storage
+from services.chatbase_service import chatbase_service
+from services.chatbase_scheduler import chatbase_scheduler
+from services.session_restorer import session_restorer
+from services.session_reaper import session_reaper
+from services.event_bus import event_bus
+from services.entity_cache import entity_cache
+from services.profile_cache import profile_cache
+from services.response_snapshots import response_snapshots
+from services.reply_coalescer import reply_coalescer
+from services.outbound_sender import outbound_sender
+from services.ingest_queue import ingest_queue
+from session_store import session_store
+from activity_log import activity_log
+from sharding.membership import shard_membership
+from routes.dependencies import extract_session_token
+from metrics import registry, RequestMetricsMiddleware
+from structured_log import log_pipeline
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -21,9 +40,107 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency by route template, outermost so CORS preflights are timed too
+app.add_middleware(RequestMetricsMiddleware)
+
 # Register all routes
 register_routes(app)
 
+# Point-in-time gauges, read from the owning services at scrape time
+registry.gauge("active_sessions", "Signed-in sessions held by this process", lambda: len(storage.active_sessions))
+registry.gauge("pending_auth_clients", "Clients waiting for a sign-in code", lambda: len(storage.active_clients))
+registry.gauge("hibernated_sessions", "Signed-in sessions disconnected while idle", lambda: len(storage.hibernated_sessions))
+registry.gauge(
+    "chatbase_scheduler_requests", "Chatbase requests by scheduler state",
+    lambda: {(state,): count for state, count in chatbase_scheduler.get_stats().items() if state in ("running", "waiting")},
+    ("state",)
+)
+registry.gauge(
+    "chatbase_pool_connections_total", "Chatbase connections opened or reused",
+    lambda: {
+        ("created",): chatbase_service.pool_stats["connectionsCreated"],
+        ("reused",): chatbase_service.pool_stats["connectionsReused"]
+    },
+    ("outcome",),
+    kind="counter"
+)
+registry.gauge(
+    "cache_lookups_total", "Cache lookups by cache and outcome",
+    lambda: {
+        ("reply", "hit"): chatbase_service.reply_cache.stats["hits"],
+        ("reply", "miss"): chatbase_service.reply_cache.stats["misses"],
+        ("entity", "hit"): entity_cache.stats["hits"],
+        ("entity", "miss"): entity_cache.stats["misses"],
+        ("profile", "hit"): profile_cache.stats["hits"],
+        ("profile", "miss"): profile_cache.stats["misses"],
+        ("response", "hit"): response_snapshots.stats["hits"],
+        ("response", "miss"): response_snapshots.stats["misses"]
+    },
+    ("cache", "outcome"),
+    kind="counter"
+)
+registry.gauge("reply_coalescer_pending", "Chats with a coalesced reply pending or in flight", reply_coalescer.pending_count)
+registry.gauge("ingest_queue_pending", "Replies waiting or being generated", ingest_queue.pending_count)
+registry.gauge("telegram_send_queue", "Outbound messages waiting to be sent", outbound_sender.queued_count)
+registry.gauge("stream_subscribers", "Open server-sent event streams", event_bus.subscriber_count)
+registry.gauge("activity_log_pending", "Activities queued for the SQLite writer", lambda: activity_log.get_stats()["pending"])
+registry.gauge(
+    "log_records_discarded_total", "Log records not written, by reason",
+    lambda: {
+        ("queue_full",): log_pipeline.get_stats()["dropped"],
+        ("rate_limited",): log_pipeline.get_stats()["suppressed"]
+    },
+    ("reason",),
+    kind="counter"
+)
+
+if shard_membership.enabled:
+    from sharding.routes import router as sharding_router
+    app.include_router(sharding_router)
+    
+    @app.middleware("http")
+    async def load_owned_session(request: Request, call_next):
+        """Reconnect sessions that moved to this shard on first use"""
+        token = extract_session_token(
+            request.headers.get("authorization"),
+            request.headers.get("x-session-token")
+        )
+        if token and request.url.path.startswith("/api/") and not storage.get_session(token):
+            if not shard_membership.owns(token):
+                return JSONResponse(status_code=421, content={"detail": "Session belongs to another shard"})
+            await session_restorer.restore_token(token)
+        return await call_next(request)
+
+if session_reaper.hibernation_enabled:
+    @app.middleware("http")
+    async def wake_hibernated_session(request: Request, call_next):
+        """Keep sessions awake while used and reconnect hibernated ones"""
+        token = extract_session_token(
+            request.headers.get("authorization"),
+            request.headers.get("x-session-token")
+        )
+        if token and request.url.path.startswith("/api/") and storage.get_session(token):
+            await session_reaper.wake(token)
+        return await call_next(request)
+
+@app.on_event("startup")
+async def startup():
+    """Open shared resources and reconnect persisted sessions"""
+    await chatbase_service.startup()
+    activity_log.start()
+    session_reaper.start()
+    session_restorer.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close shared resources"""
+    await session_restorer.stop()
+    await session_reaper.stop()
+    await chatbase_service.shutdown()
+    await activity_log.stop()
+    session_store.close()
+    log_pipeline.stop()
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -36,13 +153,30 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Railway"""
-    from storage import storage
     return {
         "status": "healthy",
+        "ready": session_restorer.ready,
         "api_configured": bool(settings.TELEGRAM_API_ID and settings.TELEGRAM_API_HASH),
-        "active_sessions": len(storage.active_sessions)
+        "active_sessions": len(storage.active_sessions),
+        "session_restore": session_restorer.progress,
+        "session_reaper": session_reaper.get_stats(),
+        "chatbase_pool": chatbase_service.get_pool_stats(),
+        "chatbase_scheduler": chatbase_scheduler.get_stats(),
+        "chatbase_cache": chatbase_service.reply_cache.get_stats(),
+        "response_snapshots": response_snapshots.get_stats(),
+        "ingest": ingest_queue.get_stats(),
+        "outbound": outbound_sender.get_stats(),
+        "stream_subscribers": event_bus.subscriber_count(),
+        "activity_log": activity_log.get_stats(),
+        "log": log_pipeline.get_stats(),
+        "shard": shard_membership.shard_id
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,200 @@
+"""Minimal Prometheus metrics registry"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple, Union
+import time
+
+from structured_log import get_logger
+
+log = get_logger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Render a Prometheus label set"""
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    """Monotonically increasing value per label set"""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, *labels: str, amount: float = 1.0):
+        """Increment the counter for a label set"""
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+    
+    def samples(self) -> Iterator[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+class Histogram:
+    """
+    Distribution of observed values per label set
+    
+    Observations increment a single bucket (found by binary search); the
+    cumulative counts Prometheus expects are computed only when scraped.
+    """
+    
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., +Inf count, sum
+    
+    def observe(self, value: float, *labels: str):
+        """Record an observation for a label set"""
+        series = self._series.get(labels)
+        if series is None:
+            series = [0.0] * (len(self.buckets) + 2)
+            self._series[labels] = series
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    @contextmanager
+    def time(self, *labels: str):
+        """Observe the duration of a block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+    
+    def samples(self) -> Iterator[str]:
+        bounds = [f'le="{bound}"' for bound in self.buckets] + ['le="+Inf"']
+        for labels, series in self._series.items():
+            cumulative = 0.0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, bound)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+class GaugeFunc:
+    """Gauge whose value is read from a callback at scrape time
+    
+    With kind="counter" it exposes a monotonic total kept by another service.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[LabelValues, float]]],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge"
+    ):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+    
+    def samples(self) -> Iterator[str]:
+        value = self.callback()
+        if isinstance(value, dict):
+            for labels, sample in value.items():
+                yield f"{self.name}{_format_labels(self.labelnames, labels)} {sample}"
+        else:
+            yield f"{self.name} {value}"
+
+class Registry:
+    """Collection of metrics rendered in the Prometheus text format"""
+    
+    def __init__(self):
+        self._metrics: List[object] = []
+    
+    def register(self, metric):
+        """Add a metric to the registry"""
+        self._metrics.append(metric)
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+    
+    def gauge(self, name: str, documentation: str, callback, labelnames: Sequence[str] = (), kind: str = "gauge") -> GaugeFunc:
+        return self.register(GaugeFunc(name, documentation, callback, labelnames, kind))
+    
+    def render(self) -> str:
+        """Render every metric; a failing gauge callback is skipped"""
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                log.warning("Error collecting metric %s: %s", metric.name, e)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+# Hot-path metrics shared across modules
+HANDLER_STAGE_SECONDS = registry.histogram(
+    "telegram_handler_stage_seconds",
+    "Time spent in each stage of the Telegram event handlers",
+    ("handler", "stage")
+)
+CHATBASE_RESPONSES = registry.counter(
+    "chatbase_responses_total",
+    "Chatbase API responses by HTTP status, or timeout/error",
+    ("status",)
+)
+CHATBASE_REQUEST_SECONDS = registry.histogram(
+    "chatbase_request_seconds",
+    "Chatbase API request latency",
+    ("mode",)
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "API request latency until the response starts, by route template",
+    ("method", "route", "status")
+)
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording per-route latency with negligible overhead"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started,
+                    scope["method"],
+                    getattr(route, "path", "unmatched"),
+                    str(message["status"])
+                )
+            await send(message)
+        
+        await self.app(scope, receive, send_wrapper)
@@ -1,6 +1,6 @@
 """Pydantic models for request/response validation"""
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import datetime
 
 class PhoneRequest(BaseModel):
@@ -17,6 +17,14 @@ class PasswordRequest(BaseModel):
     """Request model for 2FA password authentication"""
     password: str
 
+class ReplyCacheSettings(BaseModel):
+    """Request model for opting a session in or out of the reply cache"""
+    enabled: bool
+
+class ShardRingUpdate(BaseModel):
+    """Request model for replacing the shard ring membership"""
+    nodes: List[str]
+
 class Activity(BaseModel):
     """Activity model for tracking Telegram events"""
     id: str
@@ -38,3 +46,4 @@ class ChartDataPoint(BaseModel):
     """Data point for activity chart"""
     time: str
     messages: int
+    byType: Dict[str, int] = {}
@@ -1,8 +1,14 @@
 """Routes initialization"""
 from routes.auth import router as auth_router
 from routes.stats import router as stats_router
+from routes.settings import router as settings_router
+from routes.stream import router as stream_router
+from routes.operator import router as operator_router
 
 def register_routes(app):
     """Register all routes to the FastAPI app"""
     app.include_router(auth_router)
     app.include_router(stats_router)
+    app.include_router(settings_router)
+    app.include_router(stream_router)
+    app.include_router(operator_router)
@@ -4,13 +4,17 @@ from typing import Optional
 
 from models import PhoneRequest, SignInRequest, PasswordRequest
 from services.telegram_service import telegram_service
+from services.profile_cache import profile_cache
 from events import register_all_handlers
 from storage import storage
 from routes.dependencies import get_session_token
+from structured_log import get_logger, log_context
 import asyncio
 
 router = APIRouter(prefix="/api", tags=["auth"])
 
+log = get_logger(__name__)
+
 @router.post("/send-code")
 async def send_code(request: PhoneRequest):
     """Send verification code to phone number"""
@@ -21,7 +25,7 @@ async def send_code(request: PhoneRequest):
             "success": True
         }
     except Exception as e:
-        print(f"[v0] Error sending code: {e}")
+        log.exception("Error sending code: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/sign-in")
@@ -52,7 +56,7 @@ async def sign_in(request: SignInRequest):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"[v0] Error signing in: {e}")
+        log.exception("Error signing in: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/sign-in-password")
@@ -87,23 +91,20 @@ async def get_status(session_token: str = Depends(get_session_token)):
             raise HTTPException(status_code=401, detail="Session not found")
         
         client = session["client"]
-        if not client.is_connected():
+        hibernated = session_token in storage.hibernated_sessions
+        if not client.is_connected() and not hibernated:
+            # Dropped outside of hibernation, reconnect once
             await client.connect()
         
-        me = await client.get_me()
+        # Served from memory; get_me only runs on a cold or expired profile
+        user = await profile_cache.get(session_token, client)
         
         return {
-            "connected": True,
-            "user": {
-                "id": me.id,
-                "firstName": me.first_name,
-                "lastName": me.last_name,
-                "username": me.username,
-                "phone": me.phone
-            }
+            **profile_cache.connection_state(session_token, client, hibernated),
+            "user": user
         }
     except Exception as e:
-        print(f"[v0] Status check error: {e}")
+        log.warning("Status check error: %s", e, extra=log_context(session_token))
         raise HTTPException(status_code=401, detail="Session invalid")
 
 @router.post("/logout")
@@ -1,16 +1,35 @@
 """Shared dependencies for routes"""
 from fastapi import HTTPException, Header
 from typing import Optional
+import secrets
 
-def get_session_token(
-    authorization: Optional[str] = Header(None),
-    x_session_token: Optional[str] = Header(None, alias="X-Session-Token")
-) -> str:
-    """Extract and validate session token from Authorization or X-Session-Token header"""
+from config import settings
+
+def extract_session_token(authorization: Optional[str], x_session_token: Optional[str]) -> Optional[str]:
+    """Extract session token from Authorization or X-Session-Token header values"""
     if x_session_token:
         return x_session_token
     
     if authorization and authorization.startswith("Bearer "):
         return authorization.replace("Bearer ", "")
     
+    return None
+
+def get_session_token(
+    authorization: Optional[str] = Header(None),
+    x_session_token: Optional[str] = Header(None, alias="X-Session-Token")
+) -> str:
+    """Extract and validate session token from Authorization or X-Session-Token header"""
+    token = extract_session_token(authorization, x_session_token)
+    if token:
+        return token
+    
     raise HTTPException(status_code=401, detail="Unauthorized: No session token provided")
+
+def require_operator_token(x_operator_token: Optional[str] = Header(None, alias="X-Operator-Token")):
+    """Reject requests that do not carry OPERATOR_TOKEN"""
+    if (
+        not settings.OPERATOR_TOKEN or not x_operator_token
+        or not secrets.compare_digest(x_operator_token, settings.OPERATOR_TOKEN)
+    ):
+        raise HTTPException(status_code=403, detail="Forbidden")
@@ -0,0 +1,25 @@
+"""Operator routes spanning every session"""
+from fastapi import APIRouter, HTTPException, Depends
+
+from services.fleet_overview import fleet_overview
+from routes.dependencies import require_operator_token
+from structured_log import get_logger
+
+router = APIRouter(prefix="/api/operator", tags=["operator"], dependencies=[Depends(require_operator_token)])
+
+log = get_logger(__name__)
+
+@router.get("/overview")
+async def get_overview(refresh: bool = False):
+    """
+    Get stats, activity rates and health of every active session
+    
+    Served from a snapshot up to OVERVIEW_CACHE_TTL seconds old (pass
+    refresh=true to rebuild it). Sessions that time out or fail are listed
+    without stats and the overview is flagged as partial.
+    """
+    try:
+        return await fleet_overview.get(refresh=refresh)
+    except Exception as e:
+        log.exception("Operator overview error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,27 @@
+"""Per-session settings routes"""
+from fastapi import APIRouter, HTTPException, Depends
+
+from models import ReplyCacheSettings
+from services.chatbase_service import chatbase_service
+from storage import storage
+from routes.dependencies import get_session_token
+
+router = APIRouter(prefix="/api", tags=["settings"])
+
+@router.get("/settings/reply-cache")
+async def get_reply_cache_setting(session_token: str = Depends(get_session_token)):
+    """Check whether Chatbase replies are cached for this session"""
+    if not storage.get_session(session_token):
+        raise HTTPException(status_code=401, detail="Session not found")
+    return {"enabled": chatbase_service.is_cache_enabled(session_token)}
+
+@router.put("/settings/reply-cache")
+async def set_reply_cache_setting(
+    request: ReplyCacheSettings,
+    session_token: str = Depends(get_session_token)
+):
+    """Opt this session in or out of the Chatbase reply cache"""
+    if not storage.get_session(session_token):
+        raise HTTPException(status_code=401, detail="Session not found")
+    chatbase_service.set_cache_enabled(session_token, request.enabled)
+    return {"enabled": chatbase_service.is_cache_enabled(session_token)}
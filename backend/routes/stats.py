@@ -1,125 +1,169 @@
 """Statistics and activity routes"""
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime, timedelta
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from datetime import datetime
+from typing import Optional
 
 from services.telegram_service import telegram_service
+from services.response_snapshots import response_snapshots, encode_json, json_response
 from storage import storage
+from activity_log import activity_log
 from routes.dependencies import get_session_token
+from structured_log import get_logger, log_context
 
 router = APIRouter(prefix="/api", tags=["stats"])
 
+log = get_logger(__name__)
+
 @router.get("/stats")
-async def get_stats(session_token: str = Depends(get_session_token)):
-    """Get account statistics"""
+async def get_stats(refresh: bool = False, session_token: str = Depends(get_session_token)):
+    """Get account statistics (pass refresh=true to bypass the dialog cache)"""
     try:
-        stats = await telegram_service.get_account_stats(session_token)
-        return stats
+        # Read before fetching: a change during the fetch then forces the next rebuild
+        version = None if refresh else telegram_service.account_stats_version(session_token)
+        snapshot = response_snapshots.get(session_token, ("stats",), version) if version else None
+        if snapshot is None:
+            stats = await telegram_service.get_account_stats(session_token, refresh=refresh)
+            if version is None:
+                return json_response(encode_json(stats))
+            snapshot = response_snapshots.put(session_token, ("stats",), version, stats)
+        return json_response(snapshot[0])
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/activities")
-async def get_activities(session_token: str = Depends(get_session_token)):
-    """Get recent activities"""
+async def get_activities(
+    request: Request,
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    type: Optional[str] = None,
+    session_token: str = Depends(get_session_token)
+):
+    """
+    Get recent activities, newest first
+    
+    Pass `since` (an activity ID) to get only newer activities, or `before`
+    to page back through older ones; X-Next-Cursor holds the `before` value
+    for the next page. Responses carry an ETag and return 304 when the
+    session has no new activity since the client's If-None-Match. Pages are
+    encoded once per buffer version and shared by every poller.
+    """
     try:
-        activities = storage.get_activities(session_token)
-        return activities
+        buffer = storage.get_activity_buffer(session_token)
+        if buffer is None:
+            return []
+        
+        etag = f'W/"{buffer.epoch}-{buffer.version}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        key = ("activities", since, before, limit, type)
+        version = (buffer.epoch, buffer.version)
+        snapshot = response_snapshots.get(session_token, key, version)
+        if snapshot is None:
+            before_index = buffer.index_of(before) if before else None
+            if before and before_index is None:
+                raise HTTPException(status_code=400, detail="Unknown or expired 'before' cursor")
+            # A 'since' cursor that was evicted is older than everything retained
+            since_index = buffer.index_of(since) if since else None
+            
+            activities, has_more = buffer.page(limit, since=since_index, before=before_index, activity_type=type)
+            
+            headers = {"X-Next-Cursor": activities[-1]["id"]} if has_more and activities else {}
+            snapshot = response_snapshots.put(session_token, key, version, activities, headers)
+        
+        body, headers = snapshot
+        return json_response(body, {"ETag": etag, **headers})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/activities/history")
+async def get_activity_history(
+    start: datetime,
+    end: Optional[datetime] = None,
+    type: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    session_token: str = Depends(get_session_token)
+):
+    """Get persisted activities between start and end (default now), newest first"""
+    try:
+        if not storage.get_session(session_token):
+            raise HTTPException(status_code=401, detail="Session not found")
+        
+        end = end or datetime.now()
+        return await activity_log.query(
+            session_token,
+            start.timestamp(),
+            end.timestamp(),
+            activity_type=type,
+            limit=limit
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/activity-chart")
-async def get_activity_chart(session_token: str = Depends(get_session_token)):
-    """Get activity chart data for last 12 hours"""
+async def get_activity_chart(
+    window: int = Query(12, ge=1),
+    resolution: str = Query("hour", pattern="^(minute|hour)$"),
+    session_token: str = Depends(get_session_token)
+):
+    """Get activity chart data for the last `window` minutes or hours"""
     try:
-        # Generate chart data for last 12 hours
-        now = datetime.now()
-        chart_data = []
-        activities = storage.get_activities(session_token)
+        histogram = storage.get_activity_histogram(session_token)
+        if histogram is None:
+            return []
         
-        for i in range(12, 0, -1):
-            time = now - timedelta(hours=i)
-            hour_activities = [
-                a for a in activities 
-                if datetime.fromisoformat(a["timestamp"]) > time - timedelta(hours=1)
-                and datetime.fromisoformat(a["timestamp"]) <= time
-            ]
-            
+        if window > histogram.max_window(resolution):
+            raise HTTPException(
+                status_code=400,
+                detail=f"window must be at most {histogram.max_window(resolution)} for {resolution} resolution"
+            )
+        
+        chart_data = []
+        for bucket_start, counts in histogram.window(resolution, datetime.now().timestamp(), window):
             chart_data.append({
-                "time": time.strftime("%H:%M"),
-                "messages": len(hour_activities)
+                "time": datetime.fromtimestamp(bucket_start).strftime("%H:%M"),
+                "messages": sum(counts.values()),
+                "byType": counts
             })
         
         return chart_data
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/dashboard")
-async def get_dashboard_data(session_token: str = Depends(get_session_token)):
-    """Get dashboard data with user info and recent activity"""
+async def get_dashboard_data(refresh: bool = False, session_token: str = Depends(get_session_token)):
+    """
+    Get dashboard data with user info and recent activity (pass refresh=true to bypass the dialog cache)
+    Responses served from the snapshot have "cached": true and empty fetchTimings.
+    """
     try:
-        session = storage.get_session(session_token)
-        if not session:
-            raise HTTPException(status_code=401, detail="Session not found")
-        
-        client = session["client"]
-        
-        # Get current user info
-        me = await client.get_me()
-        user_info = {
-            "id": str(me.id),
-            "firstName": me.first_name,
-            "lastName": me.last_name,
-            "username": me.username,
-            "phone": me.phone
-        }
-        
-        # Get recent dialogs (chats)
-        dialogs = await client.get_dialogs(limit=20)
-        
-        activity = []
-        for dialog in dialogs:
-            # Get recent messages from this chat
-            messages = await client.get_messages(dialog.entity, limit=5)
-            
-            # Determine chat type
-            chat_type = "user"
-            if hasattr(dialog.entity, 'broadcast'):
-                chat_type = "channel" if dialog.entity.broadcast else "group"
-            elif hasattr(dialog.entity, 'megagroup'):
-                chat_type = "group"
-            
-            # Get chat name
-            chat_name = dialog.name or "Unknown"
-            
-            # Format messages
-            formatted_messages = []
-            for msg in messages:
-                if msg.text:  # Only include text messages
-                    formatted_messages.append({
-                        "id": msg.id,
-                        "text": msg.text,
-                        "date": int(msg.date.timestamp()),
-                        "out": msg.out,
-                        "fromId": str(msg.from_id) if msg.from_id else None
-                    })
-            
-            if formatted_messages:  # Only include chats with messages
-                activity.append({
-                    "chatId": str(dialog.id),
-                    "chatName": chat_name,
-                    "chatType": chat_type,
-                    "unreadCount": dialog.unread_count,
-                    "messages": formatted_messages
+        # Read before fetching: a change during the fetch then forces the next rebuild
+        version = None if refresh else telegram_service.dashboard_version(session_token)
+        snapshot = response_snapshots.get(session_token, ("dashboard",), version) if version else None
+        if snapshot is None:
+            dashboard = await telegram_service.get_dashboard_data(session_token, refresh=refresh)
+            if version is not None and not dashboard["partial"]:
+                # Later hits did not fetch anything, so the snapshot carries no timings
+                # and is flagged as cached; partial results are not kept at all
+                response_snapshots.put(session_token, ("dashboard",), version, {
+                    **dashboard,
+                    "fetchTimings": [],
+                    "cached": True
                 })
-        
-        return {
-            "user": user_info,
-            "activity": activity
-        }
+            return json_response(encode_json({**dashboard, "cached": False}))
+        return json_response(snapshot[0])
         
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
-        print(f"[v0] Dashboard error: {e}")
+        log.exception("Dashboard error: %s", e, extra=log_context(session_token))
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,63 @@
+"""Server-sent events stream of activities and stats deltas"""
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+
+from config import settings
+from services.event_bus import event_bus
+from storage import storage
+from routes.dependencies import get_session_token
+
+router = APIRouter(prefix="/api", tags=["stream"])
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    session_token: str = Depends(get_session_token),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Push new activities and stats deltas as server-sent events
+    
+    Events are "activity" (a new activity object) and "stats" (changes to
+    add to the /api/stats counters, zero or negative once the activity
+    buffer is full and evicts older entries). Reconnect with Last-Event-ID to resume;
+    a "reset" event means the gap is no longer available, e.g. the ID is
+    from before a restart, and the client should refetch /api/activities
+    and /api/stats. A "dropped" event means
+    the client fell too far behind and should reconnect.
+    """
+    if not storage.get_session(session_token):
+        raise HTTPException(status_code=401, detail="Session not found")
+    
+    subscriber, needs_reset = event_bus.subscribe(session_token, last_event_id or None)
+    
+    async def event_source():
+        try:
+            yield "retry: 3000\n\n"
+            if needs_reset:
+                yield f"id: {subscriber.format_id(event_bus.last_event_id(session_token))}\nevent: reset\ndata: {{}}\n\n"
+            
+            while not await request.is_disconnected():
+                events = await subscriber.wait(settings.STREAM_HEARTBEAT)
+                if subscriber.dropped:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                if not events:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "".join(
+                    f"id: {subscriber.format_id(event_id)}\nevent: {event_type}\ndata: {data}\n\n"
+                    for event_id, event_type, data in events
+                )
+        finally:
+            event_bus.unsubscribe(session_token, subscriber)
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -0,0 +1,176 @@
+"""Global admission control for Chatbase requests"""
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional
+import asyncio
+import heapq
+import itertools
+import time
+
+from config import settings
+from metrics import registry
+
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "chatbase_queue_wait_seconds",
+    "Time Chatbase requests wait for admission"
+)
+
+class SchedulerOverloaded(Exception):
+    """Raised when a request is shed because the queue is full"""
+
+class _Job:
+    """A request waiting for a Chatbase slot"""
+    
+    def __init__(self, session_token: str, tag: float):
+        self.session_token = session_token
+        self.tag = tag
+        self.enqueued_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.dropped = False
+
+class ChatbaseScheduler:
+    """
+    Limits concurrent Chatbase calls and shares them fairly across sessions
+    
+    At most CHATBASE_MAX_CONCURRENCY calls run at once. Waiting requests are
+    ordered by start-time fair queuing: each session's requests are tagged
+    with a virtual finish time advancing by 1/weight, so a busy session
+    cannot starve the others. Weights come from CHATBASE_DEFAULT_WEIGHT and
+    the per-phone CHATBASE_WEIGHTS when a session is stored. Queues are bounded per session and globally;
+    when full, CHATBASE_SHED_POLICY either drops the oldest waiting request
+    ("drop_oldest") or rejects the new one ("reject_newest").
+    """
+    
+    def __init__(self):
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._queues: Dict[str, Deque[_Job]] = {}
+        self._last_tag: Dict[str, float] = {}
+        self._weights: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._running = 0
+        self._queued = 0
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "shed": 0,
+            "rejected": 0
+        }
+    
+    def set_weight(self, session_token: str, weight: float):
+        """Set the share of Chatbase capacity a session gets relative to others"""
+        self._weights[session_token] = max(weight, 0.01)
+    
+    @asynccontextmanager
+    async def slot(self, session_token: str):
+        """Wait for a Chatbase slot and hold it for the duration of the block"""
+        await self._acquire(session_token)
+        try:
+            yield
+        finally:
+            self._release()
+    
+    async def _acquire(self, session_token: str):
+        """Admit immediately if capacity allows, otherwise queue and wait"""
+        if self._running < settings.CHATBASE_MAX_CONCURRENCY and not self._queued:
+            self._running += 1
+            self.stats["admitted"] += 1
+            self._waits.append(0.0)
+            QUEUE_WAIT_SECONDS.observe(0.0)
+            return
+        
+        job = self._enqueue(session_token)
+        try:
+            await job.future
+        except asyncio.CancelledError:
+            if job.future.done() and not job.future.cancelled() and job.future.exception() is None:
+                # Admitted just as the waiter was cancelled, give the slot back
+                self._release()
+            elif not job.dropped:
+                self._drop(job)
+            raise
+    
+    def _enqueue(self, session_token: str) -> _Job:
+        """Add a request to the fair queue, shedding load if it is full"""
+        queue = self._queues.setdefault(session_token, deque())
+        
+        if len(queue) >= settings.CHATBASE_QUEUE_MAX_PER_SESSION:
+            self._shed(queue)
+        elif self._queued >= settings.CHATBASE_QUEUE_MAX:
+            self._shed(max(self._queues.values(), key=len))
+        
+        weight = self._weights.get(session_token, 1.0)
+        start = max(self._virtual_time, self._last_tag.get(session_token, 0.0))
+        job = _Job(session_token, start + 1.0 / weight)
+        self._last_tag[session_token] = job.tag
+        
+        queue.append(job)
+        heapq.heappush(self._heap, (job.tag, next(self._sequence), job))
+        self._queued += 1
+        self.stats["queued"] += 1
+        return job
+    
+    def _shed(self, queue: Deque[_Job]):
+        """Apply the shedding policy to a full queue"""
+        if settings.CHATBASE_SHED_POLICY == "reject_newest" or not queue:
+            self.stats["rejected"] += 1
+            raise SchedulerOverloaded("Chatbase queue is full")
+        
+        oldest = queue[0]
+        self._drop(oldest)
+        self.stats["shed"] += 1
+        oldest.future.set_exception(SchedulerOverloaded("Dropped from full Chatbase queue"))
+    
+    def _drop(self, job: _Job):
+        """Remove a waiting job; its heap entry is skipped lazily"""
+        job.dropped = True
+        self._queues[job.session_token].remove(job)
+        self._queued -= 1
+    
+    def _release(self):
+        """Free a slot and admit the next waiting request with the smallest tag"""
+        self._running -= 1
+        while self._heap and self._running < settings.CHATBASE_MAX_CONCURRENCY:
+            tag, _, job = heapq.heappop(self._heap)
+            if job.dropped:
+                continue
+            
+            self._queues[job.session_token].popleft()
+            self._queued -= 1
+            self._virtual_time = tag
+            self._running += 1
+            self.stats["admitted"] += 1
+            self._waits.append(time.monotonic() - job.enqueued_at)
+            QUEUE_WAIT_SECONDS.observe(self._waits[-1])
+            job.future.set_result(None)
+    
+    def drop_session(self, session_token: str):
+        """Forget a session, failing any of its waiting requests"""
+        for job in list(self._queues.get(session_token, ())):
+            self._drop(job)
+            job.future.cancel()
+        self._queues.pop(session_token, None)
+        self._last_tag.pop(session_token, None)
+        self._weights.pop(session_token, None)
+    
+    def _wait_percentile(self, waits: List[float], percentile: float) -> Optional[float]:
+        """Get a queue wait percentile in milliseconds"""
+        if not waits:
+            return None
+        return round(waits[min(len(waits) - 1, int(len(waits) * percentile))] * 1000, 1)
+    
+    def get_stats(self) -> dict:
+        """Get admission and queue-wait statistics"""
+        waits = sorted(self._waits)
+        return {
+            **self.stats,
+            "running": self._running,
+            "waiting": self._queued,
+            "maxConcurrency": settings.CHATBASE_MAX_CONCURRENCY,
+            "waitMsP50": self._wait_percentile(waits, 0.5),
+            "waitMsP99": self._wait_percentile(waits, 0.99),
+            "waitMsMax": round(waits[-1] * 1000, 1) if waits else None
+        }
+
+chatbase_scheduler = ChatbaseScheduler()
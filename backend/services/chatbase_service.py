@@ -1,15 +1,243 @@
 """Chatbase API integration service"""
 import aiohttp
-from typing import List, Dict, Optional
+import codecs
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, List, Dict, Optional, Set, Tuple
+import asyncio
 from config import settings
+from metrics import CHATBASE_RESPONSES, CHATBASE_REQUEST_SECONDS
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
+
+class StreamInterrupted(Exception):
+    """Raised when a streamed reply fails after part of it was received"""
+
+class ReplyCache:
+    """
+    LRU cache of Chatbase replies with a TTL and a total size budget
+    
+    Keys are a hash of the normalized trailing turns of a conversation and
+    its scope (see CHATBASE_CACHE_SCOPE), so by default a reply is only
+    reused within the chat it was written for.
+    """
+    
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[float, str, int]]" = OrderedDict()
+        self.size_bytes = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0
+        }
+    
+    @staticmethod
+    def normalize(content: str) -> str:
+        """Lowercase and collapse whitespace"""
+        return " ".join(content.lower().split())
+    
+    @staticmethod
+    def is_cacheable(messages: List[Dict[str, str]]) -> bool:
+        """Skip short prompts like "ok" or "thanks", whose right reply depends on context"""
+        return len(ReplyCache.normalize(messages[-1]["content"])) >= settings.CHATBASE_CACHE_MIN_PROMPT_CHARS
+    
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], session_token: str, chat_id: str) -> str:
+        """Hash the last CHATBASE_CACHE_KEY_DEPTH turns, ignoring case and whitespace, within the cache scope"""
+        scope = {
+            "chat": [session_token, chat_id],
+            "session": [session_token],
+            "global": []
+        }[settings.CHATBASE_CACHE_SCOPE]
+        turns = [
+            [message["role"], ReplyCache.normalize(message["content"])]
+            for message in messages[-settings.CHATBASE_CACHE_KEY_DEPTH:]
+        ]
+        raw = json.dumps([settings.CHATBASE_CHATBOT_ID, scope, turns], ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        """Get a cached reply, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        
+        expires_at, text, size = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.stats["misses"] += 1
+            return None
+        
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return text
+    
+    def put(self, key: str, text: str):
+        """Cache a reply, evicting least recently used entries over the size budget"""
+        size = len(text.encode("utf-8"))
+        if size > settings.CHATBASE_CACHE_MAX_BYTES:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + settings.CHATBASE_CACHE_TTL, text, size)
+        self.size_bytes += size
+        
+        while self.size_bytes > settings.CHATBASE_CACHE_MAX_BYTES:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.stats["evictions"] += 1
+    
+    def _remove(self, key: str):
+        """Remove an entry and release its size"""
+        _, _, size = self._entries.pop(key)
+        self.size_bytes -= size
+    
+    def get_stats(self) -> dict:
+        """Get hit/miss counters and current size"""
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "sizeBytes": self.size_bytes,
+            "maxBytes": settings.CHATBASE_CACHE_MAX_BYTES
+        }
 
 class ChatbaseService:
     """Service for interacting with Chatbase API"""
     
     BASE_URL = "https://www.chatbase.co/api/v1"
     
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.reply_cache = ReplyCache()
+        self._cache_opt_out: Set[str] = set()
+        self.pool_stats = {
+            "requests": 0,
+            "connectionsCreated": 0,
+            "connectionsReused": 0
+        }
+    
+    def _build_trace_config(self) -> aiohttp.TraceConfig:
+        """Build a trace config that counts new and reused connections"""
+        trace_config = aiohttp.TraceConfig()
+        
+        async def on_request_start(session, context, params):
+            self.pool_stats["requests"] += 1
+        
+        async def on_connection_create_end(session, context, params):
+            self.pool_stats["connectionsCreated"] += 1
+        
+        async def on_connection_reuseconn(session, context, params):
+            self.pool_stats["connectionsReused"] += 1
+        
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+    
+    async def startup(self):
+        """Create the shared HTTP connection pool"""
+        if self._session is not None and not self._session.closed:
+            return
+        
+        connector = aiohttp.TCPConnector(
+            limit=settings.CHATBASE_POOL_LIMIT,
+            limit_per_host=settings.CHATBASE_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=settings.CHATBASE_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            headers={"Content-Type": "application/json"},
+            trace_configs=[self._build_trace_config()]
+        )
+    
+    async def shutdown(self):
+        """Close the shared HTTP connection pool"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it if startup has not run"""
+        if self._session is None or self._session.closed:
+            await self.startup()
+        return self._session
+    
+    def get_pool_stats(self) -> dict:
+        """Get connection reuse statistics for the shared pool"""
+        stats = dict(self.pool_stats)
+        connector = self._session.connector if self._session is not None and not self._session.closed else None
+        stats["open"] = connector is not None
+        stats["limit"] = settings.CHATBASE_POOL_LIMIT
+        stats["limitPerHost"] = settings.CHATBASE_POOL_LIMIT_PER_HOST
+        return stats
+    
+    def is_cache_enabled(self, session_token: str) -> bool:
+        """Check whether the reply cache applies to a session"""
+        return settings.CHATBASE_CACHE_ENABLED and session_token not in self._cache_opt_out
+    
+    def set_cache_enabled(self, session_token: str, enabled: bool):
+        """Opt a session in or out of the reply cache"""
+        if enabled:
+            self._cache_opt_out.discard(session_token)
+        else:
+            self._cache_opt_out.add(session_token)
+    
+    def _uses_cache(self, session_token: str, messages: List[Dict[str, str]]) -> bool:
+        return bool(messages) and self.is_cache_enabled(session_token) and ReplyCache.is_cacheable(messages)
+    
+    def get_cached_reply(self, session_token: str, chat_id: str, messages: List[Dict[str, str]]) -> Optional[str]:
+        """Get a cached reply for the conversation, if the session uses the cache"""
+        if not self._uses_cache(session_token, messages):
+            return None
+        return self.reply_cache.get(ReplyCache.make_key(messages, session_token, chat_id))
+    
+    def cache_reply(self, session_token: str, chat_id: str, messages: List[Dict[str, str]], text: str):
+        """Cache a reply for the conversation, if the session uses the cache"""
+        if self._uses_cache(session_token, messages):
+            self.reply_cache.put(ReplyCache.make_key(messages, session_token, chat_id), text)
+    
+    def forget_session(self, session_token: str):
+        """Drop per-session settings"""
+        self._cache_opt_out.discard(session_token)
+    
+    @staticmethod
+    def _is_configured() -> bool:
+        """Check that Chatbase credentials are set"""
+        if not settings.CHATBASE_API_KEY or not settings.CHATBASE_CHATBOT_ID:
+            log.warning("Chatbase not configured. Set CHATBASE_API_KEY and CHATBASE_CHATBOT_ID")
+            return False
+        return True
+    
+    @staticmethod
+    def _build_payload(messages: List[Dict[str, str]], conversation_id: Optional[str], stream: bool) -> dict:
+        """Build the chat request body"""
+        payload = {
+            "messages": messages,
+            "chatbotId": settings.CHATBASE_CHATBOT_ID,
+            "stream": stream,
+            "temperature": 0.7
+        }
+        
+        if conversation_id:
+            payload["conversationId"] = conversation_id
+        
+        return payload
+    
     @staticmethod
+    def _build_headers() -> dict:
+        """Build the chat request headers"""
+        return {
+            "Authorization": f"Bearer {settings.CHATBASE_API_KEY}"
+        }
+    
     async def send_message(
+        self,
         messages: List[Dict[str, str]],
         conversation_id: Optional[str] = None
     ) -> Optional[str]:
@@ -23,43 +251,102 @@ class ChatbaseService:
         Returns:
             Response text from Chatbase or None if error
         """
-        if not settings.CHATBASE_API_KEY or not settings.CHATBASE_CHATBOT_ID:
-            print("[v0] Chatbase not configured. Set CHATBASE_API_KEY and CHATBASE_CHATBOT_ID")
+        if not self._is_configured():
             return None
         
+        started = time.perf_counter()
         try:
-            payload = {
-                "messages": messages,
-                "chatbotId": settings.CHATBASE_CHATBOT_ID,
-                "stream": False,
-                "temperature": 0.7
-            }
-            
-            if conversation_id:
-                payload["conversationId"] = conversation_id
+            session = await self._get_session()
+            async with session.post(
+                f"{ChatbaseService.BASE_URL}/chat",
+                json=self._build_payload(messages, conversation_id, stream=False),
+                headers=self._build_headers(),
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                CHATBASE_RESPONSES.inc(str(response.status))
+                if response.status == 200:
+                    data = await response.json()
+                    return data.get("text")
+                else:
+                    error_text = await response.text()
+                    log.error("Chatbase API error (%d): %s", response.status, error_text, extra=log_context(chat_id=conversation_id))
+                    return None
+                        
+        except asyncio.TimeoutError:
+            CHATBASE_RESPONSES.inc("timeout")
+            log.warning("Chatbase API request timed out", extra=log_context(chat_id=conversation_id))
+            return None
+        except Exception as e:
+            CHATBASE_RESPONSES.inc("error")
+            log.error("Error calling Chatbase API: %s", e, extra=log_context(chat_id=conversation_id))
+            return None
+        finally:
+            CHATBASE_REQUEST_SECONDS.observe(time.perf_counter() - started, "sync")
+    
+    async def stream_message(
+        self,
+        messages: List[Dict[str, str]],
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Send message to Chatbase and yield the response text as it streams in
+        
+        Args:
+            messages: List of message objects with 'role' and 'content'
+            conversation_id: Optional conversation ID to track conversation
             
-            headers = {
-                "Authorization": f"Bearer {settings.CHATBASE_API_KEY}",
-                "Content-Type": "application/json"
-            }
+        Yields:
+            Chunks of response text; nothing if error
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{ChatbaseService.BASE_URL}/chat",
-                    json=payload,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get("text")
-                    else:
-                        error_text = await response.text()
-                        print(f"[v0] Chatbase API error ({response.status}): {error_text}")
-                        return None
+        Raises:
+            StreamInterrupted: if the stream fails after text was yielded,
+                so a truncated reply is never mistaken for a complete one
+        """
+        if not self._is_configured():
+            return
+        
+        started = time.perf_counter()
+        yielded = False
+        try:
+            session = await self._get_session()
+            # No total timeout, long replies may take a while; only a stalled stream is cut
+            async with session.post(
+                f"{ChatbaseService.BASE_URL}/chat",
+                json=self._build_payload(messages, conversation_id, stream=True),
+                headers=self._build_headers(),
+                timeout=aiohttp.ClientTimeout(
+                    total=None,
+                    sock_connect=10,
+                    sock_read=settings.CHATBASE_STREAM_READ_TIMEOUT
+                )
+            ) as response:
+                CHATBASE_RESPONSES.inc(str(response.status))
+                if response.status != 200:
+                    error_text = await response.text()
+                    log.error("Chatbase API error (%d): %s", response.status, error_text, extra=log_context(chat_id=conversation_id))
+                    return
+                
+                decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+                async for chunk in response.content.iter_any():
+                    text = decoder.decode(chunk)
+                    if text:
+                        yielded = True
+                        yield text
+                text = decoder.decode(b"", final=True)
+                if text:
+                    yield text
                         
+        except asyncio.TimeoutError:
+            CHATBASE_RESPONSES.inc("timeout")
+            log.warning("Chatbase API stream timed out", extra=log_context(chat_id=conversation_id))
+            if yielded:
+                raise StreamInterrupted("Chatbase stream timed out")
         except Exception as e:
-            print(f"[v0] Error calling Chatbase API: {e}")
-            return None
+            CHATBASE_RESPONSES.inc("error")
+            log.error("Error streaming from Chatbase API: %s", e, extra=log_context(chat_id=conversation_id))
+            if yielded:
+                raise StreamInterrupted(str(e)) from e
+        finally:
+            CHATBASE_REQUEST_SECONDS.observe(time.perf_counter() - started, "stream")
 
 chatbase_service = ChatbaseService()
@@ -0,0 +1,145 @@
+"""Per-session dialog cache kept fresh by Telegram update events"""
+from telethon import TelegramClient
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import asyncio
+import time
+
+from config import settings
+
+class CachedDialogs:
+    """Dialog list cached for a single session"""
+    
+    def __init__(self):
+        self.dialogs: List = []
+        self.by_id: Dict[int, object] = {}
+        self.fetched_at: float = 0.0
+        self.stale: bool = True
+        self.version: int = 0  # Bumped on every change, for response snapshots
+        self.lock = asyncio.Lock()
+    
+    def is_fresh(self) -> bool:
+        """Check whether the cached dialogs can be served without a refetch"""
+        return not self.stale and time.monotonic() - self.fetched_at < settings.DIALOG_CACHE_TTL
+    
+    def replace(self, dialogs: List):
+        """Replace the cached dialogs with a freshly fetched list"""
+        self.dialogs = list(dialogs)
+        self.by_id = {dialog.id: dialog for dialog in self.dialogs}
+        self.fetched_at = time.monotonic()
+        self.stale = False
+        self.version += 1
+    
+    def move_to_top(self, dialog):
+        """Move a dialog to the most recent position, below pinned dialogs"""
+        if getattr(dialog, 'pinned', False):
+            return
+        self.dialogs.remove(dialog)
+        index = 0
+        while index < len(self.dialogs) and getattr(self.dialogs[index], 'pinned', False):
+            index += 1
+        self.dialogs.insert(index, dialog)
+
+class DialogCache:
+    """
+    Caches get_dialogs results per session
+    
+    Entries are refreshed from the Telegram API on cold cache, after
+    DIALOG_CACHE_TTL, when an update cannot be applied locally, or when
+    an explicit refresh is requested. Otherwise NewMessage, MessageRead and
+    ChatAction events keep unread counts, ordering and names current.
+    """
+    
+    def __init__(self):
+        self._entries: "OrderedDict[str, CachedDialogs]" = OrderedDict()
+    
+    def _get_entry(self, session_token: str) -> CachedDialogs:
+        """Get or create the cache entry for a session, evicting the least recently used"""
+        entry = self._entries.get(session_token)
+        if entry is None:
+            entry = CachedDialogs()
+            self._entries[session_token] = entry
+            while len(self._entries) > settings.DIALOG_CACHE_MAX_SESSIONS:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(session_token)
+        return entry
+    
+    async def get_dialogs(self, session_token: str, client: TelegramClient, limit: int, refresh: bool = False) -> List:
+        """Get the most recent dialogs for a session, from memory when possible"""
+        if limit > settings.DIALOG_CACHE_MAX_DIALOGS:
+            return await client.get_dialogs(limit=limit)
+        
+        entry = self._get_entry(session_token)
+        if refresh:
+            entry.stale = True
+        
+        if not entry.is_fresh():
+            # Concurrent requests for the same session share a single fetch
+            async with entry.lock:
+                if not entry.is_fresh():
+                    dialogs = await client.get_dialogs(limit=settings.DIALOG_CACHE_MAX_DIALOGS)
+                    entry.replace(dialogs)
+        
+        return entry.dialogs[:limit]
+    
+    def _get_dialog(self, session_token: str, chat_id: Optional[int]):
+        """Look up a cached dialog, marking the session stale if the chat is unknown"""
+        entry = self._entries.get(session_token)
+        if entry is None or entry.stale:
+            return None, None
+        dialog = entry.by_id.get(chat_id)
+        if dialog is None:
+            entry.stale = True
+        return entry, dialog
+    
+    def on_new_message(self, session_token: str, chat_id: Optional[int], outgoing: bool) -> int:
+        """Apply a new message to the cached dialogs, returning the change in unread messages"""
+        entry, dialog = self._get_dialog(session_token, chat_id)
+        if dialog is None:
+            return 0
+        previous = dialog.unread_count
+        if outgoing:
+            # Sending a message marks the chat as read
+            dialog.unread_count = 0
+        else:
+            dialog.unread_count += 1
+        entry.move_to_top(dialog)
+        entry.version += 1
+        return dialog.unread_count - previous
+    
+    def on_read(self, session_token: str, chat_id: Optional[int]) -> int:
+        """Reset the unread count of a chat that was read, returning the change in unread messages"""
+        entry, dialog = self._get_dialog(session_token, chat_id)
+        if dialog is None:
+            return 0
+        previous = dialog.unread_count
+        dialog.unread_count = 0
+        entry.version += 1
+        return -previous
+    
+    def on_chat_renamed(self, session_token: str, chat_id: Optional[int], title: str):
+        """Update the name of a renamed chat"""
+        entry, dialog = self._get_dialog(session_token, chat_id)
+        if dialog is not None:
+            dialog.name = title
+            entry.version += 1
+    
+    def version(self, session_token: str, limit: int) -> Optional[int]:
+        """Version of a session's cached dialogs, or None if a read of `limit` dialogs would not come from them"""
+        if limit > settings.DIALOG_CACHE_MAX_DIALOGS:
+            return None
+        entry = self._entries.get(session_token)
+        return entry.version if entry is not None and entry.is_fresh() else None
+    
+    def invalidate(self, session_token: str):
+        """Mark a session's dialogs as stale so the next read refetches them"""
+        entry = self._entries.get(session_token)
+        if entry is not None:
+            entry.stale = True
+    
+    def remove(self, session_token: str):
+        """Drop all cached dialogs for a session"""
+        self._entries.pop(session_token, None)
+
+dialog_cache = DialogCache()
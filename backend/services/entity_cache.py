@@ -0,0 +1,88 @@
+"""Per-session LRU cache of resolved user and chat display names"""
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import time
+
+from config import settings
+
+def _profile_of(entity) -> dict:
+    """Extract the name fields of a Telegram user, chat or channel"""
+    return {
+        "title": getattr(entity, 'title', None),
+        "first_name": getattr(entity, 'first_name', None),
+        "last_name": getattr(entity, 'last_name', None),
+        "username": getattr(entity, 'username', None)
+    }
+
+def user_display_name(profile: dict, default: str = "Unknown") -> str:
+    """Full name of a user, falling back to @username"""
+    if profile["first_name"]:
+        if profile["last_name"]:
+            return f"{profile['first_name']} {profile['last_name']}"
+        return profile["first_name"]
+    if profile["username"]:
+        return f"@{profile['username']}"
+    return default
+
+def chat_display_name(chat: dict, sender: dict) -> str:
+    """Title of a group or channel; for private chats, the other person's name"""
+    if chat["title"]:
+        return chat["title"]
+    name = user_display_name(sender, default="")
+    if name:
+        return name
+    if chat["username"]:
+        return f"@{chat['username']}"
+    return "Unknown"
+
+def member_display_name(profile: dict) -> str:
+    """Short name of a group member, preferring the username"""
+    return profile["username"] or profile["first_name"] or "Unknown"
+
+class EntityNameCache:
+    """
+    Caches name fields of Telegram entities by peer ID, per session
+    
+    Each session holds at most ENTITY_CACHE_SIZE entries in LRU order, and
+    entries expire after ENTITY_CACHE_TTL seconds. Name-change updates
+    invalidate entries explicitly so renamed users and chats are picked up
+    before the TTL runs out.
+    """
+    
+    def __init__(self):
+        self._sessions: Dict[str, "OrderedDict[int, Tuple[float, dict]]"] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0
+        }
+    
+    async def resolve(self, session_token: str, peer_id: Optional[int], fetch: Callable[[], Awaitable[object]]) -> dict:
+        """Get the name fields of a peer, calling fetch on a cache miss"""
+        entries = self._sessions.setdefault(session_token, OrderedDict())
+        entry = entries.get(peer_id) if peer_id is not None else None
+        if entry is not None and entry[0] > time.monotonic():
+            entries.move_to_end(peer_id)
+            self.stats["hits"] += 1
+            return entry[1]
+        
+        self.stats["misses"] += 1
+        entity = await fetch()
+        profile = _profile_of(entity)
+        if peer_id is not None and entity is not None:
+            entries[peer_id] = (time.monotonic() + settings.ENTITY_CACHE_TTL, profile)
+            entries.move_to_end(peer_id)
+            while len(entries) > settings.ENTITY_CACHE_SIZE:
+                entries.popitem(last=False)
+        return profile
+    
+    def invalidate(self, session_token: str, peer_id: Optional[int]):
+        """Forget a peer whose name changed"""
+        entries = self._sessions.get(session_token)
+        if entries is not None:
+            entries.pop(peer_id, None)
+    
+    def remove_session(self, session_token: str):
+        """Drop all cached names of a session"""
+        self._sessions.pop(session_token, None)
+
+entity_cache = EntityNameCache()
@@ -0,0 +1,141 @@
+"""Per-session publish/subscribe of activity and stats events"""
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+import asyncio
+import json
+import secrets
+
+from config import settings
+
+# (event id, event type, JSON payload)
+StreamEvent = Tuple[int, str, str]
+
+class Subscriber:
+    """
+    A single stream consumer with a bounded buffer
+    
+    Publishing never blocks: if the buffer is full the subscriber is marked
+    dropped and its stream ends, and the client resumes with Last-Event-ID.
+    """
+    
+    def __init__(self, capacity: int, epoch: str):
+        self.capacity = capacity
+        self.epoch = epoch
+        self.buffer: Deque[StreamEvent] = deque()
+        self.dropped = False
+        self._wakeup = asyncio.Event()
+    
+    def push(self, event: StreamEvent):
+        """Queue an event, dropping the subscriber if it is too far behind"""
+        if self.dropped:
+            return
+        if len(self.buffer) >= self.capacity:
+            self.dropped = True
+            self.buffer.clear()
+        else:
+            self.buffer.append(event)
+        self._wakeup.set()
+    
+    def format_id(self, event_id: int) -> str:
+        """Event ID as sent to the client, prefixed with the channel's epoch"""
+        return f"{self.epoch}-{event_id}"
+    
+    async def wait(self, timeout: float) -> List[StreamEvent]:
+        """Wait for buffered events, returning an empty list on timeout"""
+        if not self.buffer and not self.dropped:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._wakeup.clear()
+        events = list(self.buffer)
+        self.buffer.clear()
+        return events
+
+class _SessionChannel:
+    """Event history and subscribers of a single session"""
+    
+    def __init__(self):
+        # IDs restart with each channel, e.g. after a restart or a shard move, so
+        # clients get them prefixed with an epoch that tells the sequences apart
+        self.epoch = secrets.token_hex(4)
+        self.last_id = 0
+        self.replay: Deque[StreamEvent] = deque(maxlen=settings.STREAM_REPLAY_SIZE)
+        self.subscribers: Set[Subscriber] = set()
+
+class EventBus:
+    """Fans activity events out to stream subscribers"""
+    
+    def __init__(self):
+        self._channels: Dict[str, _SessionChannel] = {}
+        self.stats = {
+            "published": 0,
+            "droppedSubscribers": 0
+        }
+    
+    def publish(self, session_token: str, event_type: str, data: dict):
+        """Publish an event to every subscriber of a session"""
+        channel = self._channels.setdefault(session_token, _SessionChannel())
+        channel.last_id += 1
+        event = (channel.last_id, event_type, json.dumps(data))
+        channel.replay.append(event)
+        self.stats["published"] += 1
+        
+        for subscriber in list(channel.subscribers):
+            subscriber.push(event)
+            if subscriber.dropped:
+                channel.subscribers.discard(subscriber)
+                self.stats["droppedSubscribers"] += 1
+    
+    def subscribe(self, session_token: str, last_event_id: Optional[str] = None) -> Tuple[Subscriber, bool]:
+        """
+        Subscribe to a session's events
+        Returns: (subscriber, needs_reset) where needs_reset means events after
+        last_event_id are no longer available and the client should refetch
+        """
+        channel = self._channels.setdefault(session_token, _SessionChannel())
+        subscriber = Subscriber(settings.STREAM_SUBSCRIBER_BUFFER, channel.epoch)
+        needs_reset = False
+        
+        if last_event_id is not None:
+            epoch, _, number = last_event_id.rpartition("-")
+            resume_from = int(number) if epoch == channel.epoch and number.isdigit() else None
+            oldest = channel.replay[0][0] if channel.replay else channel.last_id + 1
+            if resume_from is None or resume_from > channel.last_id or resume_from < oldest - 1:
+                # IDs from another epoch, or the gap was evicted from the replay buffer
+                needs_reset = True
+            else:
+                for event in channel.replay:
+                    if event[0] > resume_from:
+                        subscriber.buffer.append(event)
+        
+        channel.subscribers.add(subscriber)
+        return subscriber, needs_reset
+    
+    def unsubscribe(self, session_token: str, subscriber: Subscriber):
+        """Remove a subscriber"""
+        channel = self._channels.get(session_token)
+        if channel is not None:
+            channel.subscribers.discard(subscriber)
+    
+    def last_event_id(self, session_token: str) -> int:
+        """Get the ID of the most recent event of a session"""
+        channel = self._channels.get(session_token)
+        return channel.last_id if channel is not None else 0
+    
+    def subscriber_count(self, session_token: Optional[str] = None) -> int:
+        """Number of connected subscribers, across sessions or for one session"""
+        if session_token is not None:
+            channel = self._channels.get(session_token)
+            return len(channel.subscribers) if channel is not None else 0
+        return sum(len(channel.subscribers) for channel in self._channels.values())
+    
+    def remove_session(self, session_token: str):
+        """Drop a session's history and disconnect its subscribers"""
+        channel = self._channels.pop(session_token, None)
+        if channel is not None:
+            for subscriber in channel.subscribers:
+                subscriber.dropped = True
+                subscriber._wakeup.set()
+
+event_bus = EventBus()
@@ -0,0 +1,135 @@
+"""Aggregated view of every session on this process, for operators"""
+from datetime import datetime
+from typing import Optional
+import asyncio
+import time
+
+from config import settings
+from storage import storage
+from services.telegram_service import telegram_service
+from services.profile_cache import profile_cache
+from services.ingest_queue import ingest_queue
+from sharding.membership import shard_membership
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
+
+class FleetOverview:
+    """
+    Builds one overview of all active sessions instead of a /api/stats call per token
+    
+    Account stats are collected concurrently, at most OVERVIEW_CONCURRENCY
+    sessions at a time, and a session taking longer than
+    OVERVIEW_SESSION_TIMEOUT is reported without them, flagging the
+    overview as partial. Hibernated sessions are not woken. The result is
+    kept for OVERVIEW_CACHE_TTL seconds, and scrapes arriving while it is
+    being built share that build, so repeated scrapes do not multiply
+    Telegram traffic.
+    """
+    
+    def __init__(self):
+        self._snapshot: Optional[dict] = None
+        self._built_at = 0.0
+        self._building: Optional[asyncio.Task] = None
+        self.stats = {
+            "builds": 0,
+            "served": 0
+        }
+    
+    async def get(self, refresh: bool = False) -> dict:
+        """Get the current overview, rebuilding it once it is older than OVERVIEW_CACHE_TTL"""
+        self.stats["served"] += 1
+        age = time.monotonic() - self._built_at
+        if self._snapshot is not None and not refresh and age < settings.OVERVIEW_CACHE_TTL:
+            return {**self._snapshot, "ageSeconds": round(age, 1)}
+        
+        if self._building is None:
+            self._building = asyncio.create_task(self._build())
+            self._building.add_done_callback(self._on_built)
+        return {**await asyncio.shield(self._building), "ageSeconds": 0.0}
+    
+    def _on_built(self, task: asyncio.Task):
+        self._building = None
+        if not task.cancelled() and task.exception() is None:
+            self._snapshot = task.result()
+            self._built_at = time.monotonic()
+    
+    @staticmethod
+    def _activity_rates(token: str) -> dict:
+        """Activity counts over the last 5 and 60 minutes"""
+        histogram = storage.get_activity_histogram(token)
+        if histogram is None:
+            return {"last5Minutes": 0, "lastHour": 0, "messagesPerMinute": 0.0}
+        
+        minutes = histogram.window("minute", time.time(), min(60, histogram.max_window("minute")))
+        totals = [sum(counts.values()) for _, counts in minutes]
+        recent_messages = sum(counts.get("message", 0) for _, counts in minutes[-5:])
+        return {
+            "last5Minutes": sum(totals[-5:]),
+            "lastHour": sum(totals),
+            "messagesPerMinute": round(recent_messages / 5, 2)
+        }
+    
+    async def _session_overview(self, token: str, session: dict, semaphore: asyncio.Semaphore) -> dict:
+        """Stats, activity rates and health of one session"""
+        hibernated = token in storage.hibernated_sessions
+        overview = {
+            "session": token[:8],
+            "phone": session["phone"],
+            "health": {
+                **profile_cache.connection_state(token, session["client"], hibernated),
+                "ingestPending": ingest_queue.pending_count(token)
+            },
+            "activity": self._activity_rates(token),
+            "stats": None
+        }
+        if hibernated:
+            overview["status"] = "hibernated"
+            return overview
+        
+        async with semaphore:
+            try:
+                overview["stats"] = await asyncio.wait_for(
+                    telegram_service.get_account_stats(token),
+                    timeout=settings.OVERVIEW_SESSION_TIMEOUT
+                )
+                overview["status"] = "ok"
+            except asyncio.TimeoutError:
+                overview["status"] = "timeout"
+            except Exception as e:
+                log.warning("Overview stats error: %s", e, extra=log_context(token))
+                overview["status"] = "error"
+        return overview
+    
+    async def _build(self) -> dict:
+        """Collect every active session's overview"""
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(settings.OVERVIEW_CONCURRENCY)
+        sessions = await asyncio.gather(*(
+            self._session_overview(token, session, semaphore)
+            for token, session in list(storage.active_sessions.items())
+        ))
+        self.stats["builds"] += 1
+        
+        counts = {}
+        for overview in sessions:
+            counts[overview["status"]] = counts.get(overview["status"], 0) + 1
+        stats = [overview["stats"] for overview in sessions if overview["stats"]]
+        return {
+            "generatedAt": datetime.now().isoformat(),
+            "buildSeconds": round(time.monotonic() - started, 3),
+            "shard": shard_membership.shard_id,
+            "partial": any(overview["status"] in ("timeout", "error") for overview in sessions),
+            "totals": {
+                "sessions": len(sessions),
+                "byStatus": counts,
+                "connected": sum(1 for overview in sessions if overview["health"]["connected"]),
+                "totalChats": sum(s["totalChats"] for s in stats),
+                "unreadMessages": sum(s["unreadMessages"] for s in stats),
+                "activitiesLastHour": sum(overview["activity"]["lastHour"] for overview in sessions),
+                "messagesPerMinute": round(sum(overview["activity"]["messagesPerMinute"] for overview in sessions), 2)
+            },
+            "sessions": sessions
+        }
+
+fleet_overview = FleetOverview()
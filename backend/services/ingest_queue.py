@@ -0,0 +1,170 @@
+"""Per-session queue of replies, generated off the Telethon update path"""
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Set
+import asyncio
+import time
+
+from config import settings
+from metrics import registry
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
+
+INGEST_WAIT_SECONDS = registry.histogram(
+    "ingest_queue_wait_seconds",
+    "Time queued replies wait before generation starts"
+)
+INGEST_OVERFLOWS = registry.counter(
+    "ingest_overflows_total",
+    "Queued replies discarded because a session's queue was full",
+    ("policy",)
+)
+
+Job = Callable[[], Awaitable[None]]
+
+class _Item:
+    """A queued reply"""
+    
+    def __init__(self, job: Job):
+        self.job = job
+        self.enqueued_at = time.monotonic()
+
+class _SessionQueue:
+    """Pending replies of one session, by chat"""
+    
+    def __init__(self):
+        self.chats: "OrderedDict[str, Deque[_Item]]" = OrderedDict()
+        self.ready: Deque[str] = deque()
+        self.busy: Set[str] = set()
+        self.size = 0
+        self.workers: Set[asyncio.Task] = set()
+
+class IngestQueue:
+    """
+    Decouples reply generation from update ingestion, per session
+    
+    Telethon callbacks record each update's activity and history, then
+    only enqueue the reply and return, so a slow Chatbase round-trip never
+    delays recording the next update. Each session has up to
+    INGEST_WORKERS workers: replies of one chat run in arrival order, one
+    at a time, while different chats run in parallel. A session holds at
+    most INGEST_QUEUE_MAX pending replies; when full, INGEST_OVERFLOW_POLICY
+    either drops the oldest reply of the busiest chat ("drop_oldest") or
+    rejects the new one ("reject_newest"). Dropped replies never lose
+    activities, which are already recorded.
+    """
+    
+    def __init__(self):
+        self._sessions: Dict[str, _SessionQueue] = {}
+        self.stats = {
+            "queued": 0,
+            "processed": 0,
+            "dropped": 0,
+            "rejected": 0,
+            "errors": 0
+        }
+    
+    def submit(self, session_token: str, chat_id: str, job: Job) -> bool:
+        """
+        Queue a reply without waiting for it
+        Returns False if the reply was rejected because the queue is full.
+        """
+        session = self._sessions.get(session_token)
+        if session is None:
+            session = self._sessions[session_token] = _SessionQueue()
+        
+        if session.size >= settings.INGEST_QUEUE_MAX and not self._shed(session_token, session):
+            return False
+        
+        queue = session.chats.get(chat_id)
+        if queue is None:
+            queue = session.chats[chat_id] = deque()
+        queue.append(_Item(job))
+        session.size += 1
+        self.stats["queued"] += 1
+        
+        if chat_id not in session.busy and len(queue) == 1:
+            session.ready.append(chat_id)
+        # One worker per chat with work, up to the pool size
+        if len(session.workers) < min(settings.INGEST_WORKERS, len(session.ready) + len(session.busy)):
+            worker = asyncio.create_task(self._work(session_token, session))
+            session.workers.add(worker)
+            worker.add_done_callback(session.workers.discard)
+        return True
+    
+    def _shed(self, session_token: str, session: _SessionQueue) -> bool:
+        """Apply the overflow policy to a full session; False if the new reply is rejected"""
+        policy = settings.INGEST_OVERFLOW_POLICY
+        INGEST_OVERFLOWS.inc(policy)
+        if policy == "reject_newest":
+            self.stats["rejected"] += 1
+            log.warning("Ingest queue full, reply rejected", extra=log_context(session_token))
+            return False
+        
+        chat_id = max(session.chats, key=lambda chat: len(session.chats[chat]))
+        queue = session.chats[chat_id]
+        queue.popleft()
+        session.size -= 1
+        self.stats["dropped"] += 1
+        if not queue:
+            del session.chats[chat_id]
+            if chat_id in session.ready:
+                session.ready.remove(chat_id)
+        log.warning("Ingest queue full, oldest reply dropped", extra=log_context(session_token, chat_id))
+        return True
+    
+    async def _work(self, session_token: str, session: _SessionQueue):
+        """Process ready chats, one reply at a time per chat, until none are left"""
+        while session.ready:
+            chat_id = session.ready.popleft()
+            item = session.chats[chat_id].popleft()
+            session.size -= 1
+            session.busy.add(chat_id)
+            
+            INGEST_WAIT_SECONDS.observe(time.monotonic() - item.enqueued_at)
+            try:
+                await item.job()
+                self.stats["processed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["errors"] += 1
+                log.exception("Error processing reply: %s", e, extra=log_context(session_token, chat_id))
+            finally:
+                session.busy.discard(chat_id)
+                # Look the chat up again, overflow may have replaced its queue meanwhile
+                pending = session.chats.get(chat_id)
+                if pending:
+                    session.ready.append(chat_id)
+                elif pending is not None:
+                    del session.chats[chat_id]
+        
+        if not session.size and not session.busy and self._sessions.get(session_token) is session:
+            del self._sessions[session_token]
+    
+    def pending_count(self, session_token: Optional[str] = None) -> int:
+        """Replies waiting or being generated, across sessions or for one session"""
+        sessions = [self._sessions.get(session_token)] if session_token else self._sessions.values()
+        return sum(session.size + len(session.busy) for session in sessions if session is not None)
+    
+    def drop_session(self, session_token: str):
+        """Stop processing a session, discarding its pending replies"""
+        session = self._sessions.pop(session_token, None)
+        if session is None:
+            return
+        for worker in list(session.workers):
+            worker.cancel()
+        session.chats.clear()
+        session.ready.clear()
+        session.size = 0
+    
+    def get_stats(self) -> dict:
+        """Get counters and the current backlog"""
+        return {
+            **self.stats,
+            "pending": self.pending_count(),
+            "sessions": len(self._sessions),
+            "workersPerSession": settings.INGEST_WORKERS
+        }
+
+ingest_queue = IngestQueue()
@@ -0,0 +1,297 @@
+"""Paced, flood-wait-aware delivery of replies to Telegram"""
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+import asyncio
+import time
+
+from telethon.errors import FloodWaitError
+
+from config import settings
+from metrics import registry
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+SENDS = registry.counter(
+    "telegram_sends_total",
+    "Outbound Telegram messages by outcome",
+    ("outcome",)
+)
+SEND_DELAYS = registry.counter(
+    "telegram_send_delays_total",
+    "Outbound messages held back, by reason",
+    ("reason",)
+)
+SEND_WAIT_SECONDS = registry.histogram(
+    "telegram_send_wait_seconds",
+    "Time outbound messages wait in the send queue"
+)
+
+Respond = Callable[[str], Awaitable[object]]
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Split text into parts Telegram accepts, preferring line then word breaks"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n ") if cut < limit else text[cut:]
+    if text:
+        parts.append(text)
+    return parts
+
+class TokenBucket:
+    """Allows `rate` events per second with bursts of up to `burst`"""
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+    
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+    
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+    
+    def is_full(self, now: float) -> bool:
+        """True once the bucket has refilled, so it can be recreated on demand"""
+        self._refill(now)
+        return self.tokens >= self.burst
+
+class _Send:
+    """One message part waiting to be sent"""
+    
+    def __init__(self, respond: Respond, text: str):
+        self.respond = respond
+        self.text = text
+        self.enqueued_at = time.monotonic()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.cancelled = False
+    
+    def resolve(self, message: Optional[object]):
+        """Report the sent message, or None if it was not sent"""
+        if not self.future.done():
+            self.future.set_result(message)
+
+class _AccountQueue:
+    """Pending sends of one account, by chat in round-robin order"""
+    
+    def __init__(self):
+        self.bucket = TokenBucket(settings.SEND_RATE, settings.SEND_BURST)
+        self.chat_buckets: Dict[str, TokenBucket] = {}
+        self.chats: "OrderedDict[str, Deque[_Send]]" = OrderedDict()
+        self.size = 0
+        self.paused_until = 0.0
+        self.wakeup = asyncio.Event()
+        self.worker: Optional[asyncio.Task] = None
+
+class OutboundSender:
+    """
+    Per-account send queue that keeps replies within Telegram's limits
+    
+    Each account sends at most SEND_RATE messages per second, and each chat
+    at most SEND_CHAT_RATE, both with token-bucket bursts. Chats are served
+    round-robin so one busy chat does not hold back the others, while
+    messages within a chat keep their order. A FloodWaitError pauses the
+    account for the requested time and the message is retried, unless the
+    wait exceeds SEND_MAX_FLOOD_WAIT. Replies longer than Telegram's limit
+    are split into several messages.
+    """
+    
+    def __init__(self):
+        self._accounts: Dict[str, _AccountQueue] = {}
+        self.stats = {
+            "queued": 0,
+            "sent": 0,
+            "delayed": 0,
+            "floodWaits": 0,
+            "dropped": 0,
+            "failed": 0
+        }
+    
+    async def send(self, session_token: str, chat_id: str, respond: Respond, text: str) -> Optional[list]:
+        """
+        Queue a reply and wait until every part of it is sent
+        
+        Args:
+            session_token: Account sending the reply
+            chat_id: Chat the reply goes to, for per-chat pacing
+            respond: Coroutine function sending one message, e.g. event.respond
+            text: Reply text, split if longer than Telegram allows
+        
+        Returns:
+            The sent messages, or None if any part was dropped or failed
+        """
+        account = self._accounts.get(session_token)
+        if account is None:
+            account = self._accounts[session_token] = _AccountQueue()
+        
+        parts = split_message(text)
+        if account.size + len(parts) > settings.SEND_QUEUE_MAX:
+            self.stats["dropped"] += len(parts)
+            SENDS.inc("dropped", amount=len(parts))
+            log.warning("Send queue full, reply dropped", extra=log_context(session_token, chat_id))
+            return None
+        
+        jobs = [_Send(respond, part) for part in parts]
+        queue = account.chats.setdefault(str(chat_id), deque())
+        queue.extend(jobs)
+        account.size += len(jobs)
+        self.stats["queued"] += len(jobs)
+        account.wakeup.set()
+        if account.worker is None:
+            account.worker = asyncio.create_task(self._work(session_token, account))
+        
+        try:
+            results = await asyncio.gather(*(job.future for job in jobs))
+        except asyncio.CancelledError:
+            # Superseded reply, skip whatever is still queued
+            for job in jobs:
+                job.cancelled = True
+            raise
+        return None if any(result is None for result in results) else results
+    
+    def _next_chat(self, account: _AccountQueue, now: float):
+        """Pick the chat that can send soonest; earlier chats win ties"""
+        best, best_delay = None, None
+        for chat_id, queue in account.chats.items():
+            bucket = account.chat_buckets.get(chat_id)
+            delay = bucket.delay(now) if bucket is not None else 0.0
+            if best_delay is None or delay < best_delay:
+                best, best_delay = chat_id, delay
+                if delay == 0.0:
+                    break
+        return best, best_delay
+    
+    async def _work(self, session_token: str, account: _AccountQueue):
+        """Send queued messages for one account until its queue is empty"""
+        try:
+            while account.size:
+                now = time.monotonic()
+                chat_id, chat_delay = self._next_chat(account, now)
+                delay = max(chat_delay, account.bucket.delay(now), account.paused_until - now)
+                if delay > 0:
+                    # Sleep, but let a newly queued chat that may send sooner interrupt
+                    account.wakeup.clear()
+                    try:
+                        await asyncio.wait_for(account.wakeup.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                
+                queue = account.chats[chat_id]
+                job = queue.popleft()
+                if not queue:
+                    del account.chats[chat_id]
+                else:
+                    account.chats.move_to_end(chat_id)
+                account.size -= 1
+                
+                if job.cancelled:
+                    job.resolve(None)
+                    continue
+                
+                now = time.monotonic()
+                account.bucket.take(now)
+                chat_bucket = account.chat_buckets.get(chat_id)
+                if chat_bucket is None:
+                    chat_bucket = account.chat_buckets[chat_id] = TokenBucket(
+                        settings.SEND_CHAT_RATE, settings.SEND_CHAT_BURST
+                    )
+                chat_bucket.take(now)
+                
+                await self._deliver(session_token, chat_id, account, job)
+                
+                # Forget idle chat buckets once they are full again
+                if len(account.chat_buckets) > 1000:
+                    account.chat_buckets = {
+                        chat: bucket for chat, bucket in account.chat_buckets.items()
+                        if chat in account.chats or not bucket.is_full(now)
+                    }
+        finally:
+            account.worker = None
+    
+    async def _deliver(self, session_token: str, chat_id: str, account: _AccountQueue, job: _Send):
+        """Send one message, retrying after flood waits"""
+        waited = time.monotonic() - job.enqueued_at
+        SEND_WAIT_SECONDS.observe(waited)
+        if waited > 0.05:
+            self.stats["delayed"] += 1
+            SEND_DELAYS.inc("pacing")
+        
+        while True:
+            try:
+                message = await job.respond(job.text)
+            except FloodWaitError as e:
+                self.stats["floodWaits"] += 1
+                SEND_DELAYS.inc("flood_wait")
+                if e.seconds > settings.SEND_MAX_FLOOD_WAIT:
+                    self.stats["failed"] += 1
+                    SENDS.inc("failed")
+                    log.error(
+                        "Flood wait of %ds exceeds SEND_MAX_FLOOD_WAIT, reply dropped", e.seconds,
+                        extra=log_context(session_token, chat_id)
+                    )
+                    job.resolve(None)
+                    return
+                log.warning("Flood wait of %ds, pausing sends", e.seconds, extra=log_context(session_token, chat_id))
+                account.paused_until = time.monotonic() + e.seconds
+                await asyncio.sleep(e.seconds)
+                if job.cancelled:
+                    job.resolve(None)
+                    return
+                continue
+            except Exception as e:
+                self.stats["failed"] += 1
+                SENDS.inc("failed")
+                log.error("Error sending reply: %s", e, extra=log_context(session_token, chat_id))
+                job.resolve(None)
+                return
+            
+            self.stats["sent"] += 1
+            SENDS.inc("sent")
+            job.resolve(message)
+            return
+    
+    def queued_count(self) -> int:
+        """Messages waiting to be sent across accounts"""
+        return sum(account.size for account in self._accounts.values())
+    
+    def drop_session(self, session_token: str):
+        """Stop sending for a session, abandoning its queued messages"""
+        account = self._accounts.pop(session_token, None)
+        if account is None:
+            return
+        if account.worker is not None:
+            account.worker.cancel()
+        for queue in account.chats.values():
+            for job in queue:
+                job.resolve(None)
+        account.chats.clear()
+        account.size = 0
+    
+    def get_stats(self) -> dict:
+        """Get send counters and the current backlog"""
+        return {
+            **self.stats,
+            "pending": self.queued_count(),
+            "accounts": len(self._accounts)
+        }
+
+outbound_sender = OutboundSender()
@@ -0,0 +1,131 @@
+"""Per-session cache of the signed-in account's own profile and connection state"""
+from telethon import TelegramClient
+from typing import Dict, Optional, Tuple
+import asyncio
+import time
+
+from config import settings
+
+def _profile_of(user) -> dict:
+    """Profile fields of the signed-in user, as returned by the API"""
+    return {
+        "id": user.id,
+        "firstName": user.first_name,
+        "lastName": user.last_name,
+        "username": user.username,
+        "phone": user.phone
+    }
+
+class ProfileCache:
+    """
+    Caches each session's own Telegram profile
+    
+    The profile is captured from the sign-in result, or fetched once with
+    get_me for restored sessions, and then served from memory. It is
+    patched by name and phone updates about the account itself, refetched
+    after UpdateUser or once PROFILE_CACHE_TTL runs out. The time of the
+    last update received is kept per session, so status checks can report
+    connection health without a Telegram round-trip.
+    """
+    
+    def __init__(self):
+        self._profiles: Dict[str, Tuple[float, dict]] = {}
+        self._fetching: Dict[str, asyncio.Task] = {}
+        self._last_update: Dict[str, float] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0
+        }
+    
+    def store(self, session_token: str, user) -> dict:
+        """Cache the profile of a signed-in user"""
+        profile = _profile_of(user)
+        self._profiles[session_token] = (time.monotonic() + settings.PROFILE_CACHE_TTL, profile)
+        return profile
+    
+    def peek(self, session_token: str) -> Optional[dict]:
+        """Get the account's profile if it is cached and fresh, without fetching it"""
+        entry = self._profiles.get(session_token)
+        return entry[1] if entry is not None and entry[0] > time.monotonic() else None
+    
+    async def get(self, session_token: str, client: TelegramClient) -> dict:
+        """
+        Get the account's profile, calling get_me only when it is missing or expired
+        Concurrent misses for the same session share a single fetch.
+        """
+        entry = self._profiles.get(session_token)
+        if entry is not None and entry[0] > time.monotonic():
+            self.stats["hits"] += 1
+            return entry[1]
+        
+        self.stats["misses"] += 1
+        task = self._fetching.get(session_token)
+        if task is None:
+            task = asyncio.create_task(self._fetch(session_token, client))
+            self._fetching[session_token] = task
+            task.add_done_callback(lambda _: self._fetching.pop(session_token, None))
+        return await asyncio.shield(task)
+    
+    async def _fetch(self, session_token: str, client: TelegramClient) -> dict:
+        me = await client.get_me()
+        if me is None:
+            raise ValueError("Session not authorized")
+        return self.store(session_token, me)
+    
+    def user_id(self, session_token: str) -> Optional[int]:
+        """ID of the account's own user, if its profile is cached"""
+        entry = self._profiles.get(session_token)
+        return entry[1]["id"] if entry is not None else None
+    
+    def on_user_name(self, session_token: str, update):
+        """Apply an UpdateUserName about the account itself"""
+        entry = self._profiles.get(session_token)
+        if entry is None or entry[1]["id"] != update.user_id:
+            return
+        usernames = [username.username for username in update.usernames if username.active]
+        entry[1].update({
+            "firstName": update.first_name or None,
+            "lastName": update.last_name or None,
+            "username": usernames[0] if usernames else None
+        })
+    
+    def on_user_phone(self, session_token: str, update):
+        """Apply an UpdateUserPhone about the account itself"""
+        entry = self._profiles.get(session_token)
+        if entry is not None and entry[1]["id"] == update.user_id:
+            entry[1]["phone"] = update.phone or None
+    
+    def on_user(self, session_token: str, update):
+        """Refetch the profile on the next read after an UpdateUser about the account itself"""
+        if self.user_id(session_token) == update.user_id:
+            self._profiles.pop(session_token, None)
+    
+    def mark_update(self, session_token: str):
+        """Record that an update was just received for a session"""
+        self._last_update[session_token] = time.time()
+    
+    def connection_state(self, session_token: str, client: TelegramClient, hibernated: bool) -> dict:
+        """In-memory connection health of a session"""
+        last_update = self._last_update.get(session_token)
+        return {
+            "connected": client.is_connected() and not hibernated,
+            "hibernated": hibernated,
+            "lastUpdateAgo": round(time.time() - last_update, 1) if last_update is not None else None
+        }
+    
+    def remove(self, session_token: str):
+        """Drop everything cached for a session"""
+        self._profiles.pop(session_token, None)
+        self._last_update.pop(session_token, None)
+        task = self._fetching.pop(session_token, None)
+        if task is not None:
+            task.cancel()
+    
+    def get_stats(self) -> dict:
+        """Get hit/miss counters and the number of cached profiles"""
+        return {
+            **self.stats,
+            "profiles": len(self._profiles)
+        }
+
+profile_cache = ProfileCache()
@@ -0,0 +1,86 @@
+"""Per-chat coalescing of message bursts into a single Chatbase reply"""
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import time
+
+from config import settings
+
+ChatKey = Tuple[str, str]
+
+class _Burst:
+    """Pending reply state for a single chat"""
+    
+    def __init__(self):
+        self.first_at: float = time.monotonic()
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.callback: Optional[Callable[[], Awaitable[None]]] = None
+
+class ReplyCoalescer:
+    """
+    Debounces replies per chat
+    
+    Every submit restarts a quiet window of CHATBASE_COALESCE_WINDOW seconds;
+    the reply fires once the chat has been quiet for that long, or at the
+    latest CHATBASE_COALESCE_MAX_WAIT seconds after the first message of the
+    burst. Only the most recently submitted callback runs, and a reply still
+    in flight when a new message arrives is cancelled as superseded.
+    """
+    
+    def __init__(self):
+        self._bursts: Dict[ChatKey, _Burst] = {}
+        self._in_flight: Dict[ChatKey, asyncio.Task] = {}
+    
+    @property
+    def enabled(self) -> bool:
+        """Coalescing is disabled when the quiet window is zero"""
+        return settings.CHATBASE_COALESCE_WINDOW > 0
+    
+    def submit(self, session_token: str, chat_id: str, callback: Callable[[], Awaitable[None]]):
+        """Schedule a reply for a chat, replacing any reply pending for it"""
+        key = (session_token, chat_id)
+        
+        in_flight = self._in_flight.pop(key, None)
+        if in_flight is not None and not in_flight.done():
+            in_flight.cancel()
+        
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = _Burst()
+            self._bursts[key] = burst
+        elif burst.timer is not None:
+            burst.timer.cancel()
+        
+        burst.callback = callback
+        remaining = settings.CHATBASE_COALESCE_MAX_WAIT - (time.monotonic() - burst.first_at)
+        delay = max(0.0, min(settings.CHATBASE_COALESCE_WINDOW, remaining))
+        burst.timer = asyncio.get_running_loop().call_later(delay, self._fire, key)
+    
+    def _fire(self, key: ChatKey):
+        """Start the reply for a burst whose quiet window elapsed"""
+        burst = self._bursts.pop(key, None)
+        if burst is None or burst.callback is None:
+            return
+        
+        task = asyncio.create_task(burst.callback())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda done: self._forget(key, done))
+    
+    def _forget(self, key: ChatKey, task: asyncio.Task):
+        """Drop a finished reply task"""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+    
+    def pending_count(self) -> int:
+        """Number of chats with a pending or in-flight reply"""
+        return len(self._bursts) + len(self._in_flight)
+    
+    def cancel_session(self, session_token: str):
+        """Cancel every pending and in-flight reply of a session"""
+        for key in [key for key in self._bursts if key[0] == session_token]:
+            burst = self._bursts.pop(key)
+            if burst.timer is not None:
+                burst.timer.cancel()
+        for key in [key for key in self._in_flight if key[0] == session_token]:
+            self._in_flight.pop(key).cancel()
+
+reply_coalescer = ReplyCoalescer()
@@ -0,0 +1,80 @@
+"""Per-session JSON response bodies, encoded once per version of the data behind them"""
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Tuple
+import json
+
+from fastapi import Response
+
+from config import settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def encode_json(content) -> bytes:
+    """Encode a response body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    # Same output as FastAPI's JSONResponse
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def json_response(body: bytes, headers: Optional[dict] = None) -> Response:
+    """Send an already encoded JSON body"""
+    return Response(content=body, media_type="application/json", headers=headers)
+
+Snapshot = Tuple[bytes, dict]
+
+class ResponseSnapshots:
+    """
+    Caches encoded response bodies by session, endpoint and parameters
+    
+    Each entry is stored with the version of the data it was built from,
+    e.g. an activity buffer's epoch and version, and served as-is to every
+    request made while that version is current. Polling clients then share
+    one encoding instead of re-serializing the same dicts on each request.
+    Each session keeps at most RESPONSE_SNAPSHOTS_PER_SESSION entries in LRU
+    order.
+    """
+    
+    def __init__(self):
+        self._sessions: Dict[str, "OrderedDict[tuple, Tuple[Hashable, Snapshot]]"] = {}
+        self.stats = {
+            "hits": 0,
+            "misses": 0
+        }
+    
+    def get(self, session_token: str, key: tuple, version: Hashable) -> Optional[Snapshot]:
+        """Get the encoded body and headers for `key`, if built from `version`"""
+        entries = self._sessions.get(session_token)
+        entry = entries.get(key) if entries is not None else None
+        if entry is None or entry[0] != version:
+            self.stats["misses"] += 1
+            return None
+        entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry[1]
+    
+    def put(self, session_token: str, key: tuple, version: Hashable, content, headers: Optional[dict] = None) -> Snapshot:
+        """Encode content and keep it for requests made while `version` is current"""
+        snapshot = (encode_json(content), headers or {})
+        entries = self._sessions.setdefault(session_token, OrderedDict())
+        entries[key] = (version, snapshot)
+        entries.move_to_end(key)
+        while len(entries) > settings.RESPONSE_SNAPSHOTS_PER_SESSION:
+            entries.popitem(last=False)
+        return snapshot
+    
+    def remove_session(self, session_token: str):
+        """Drop all snapshots of a session"""
+        self._sessions.pop(session_token, None)
+    
+    def get_stats(self) -> dict:
+        """Get hit/miss counters and the encoder in use"""
+        return {
+            **self.stats,
+            "sessions": len(self._sessions),
+            "encoder": "orjson" if orjson is not None else "json"
+        }
+
+response_snapshots = ResponseSnapshots()
@@ -0,0 +1,147 @@
+"""Background expiry of pending sign-ins and hibernation of idle sessions"""
+from typing import Dict, Optional
+import asyncio
+import time
+
+from config import settings
+from storage import storage
+from services.dialog_cache import dialog_cache
+from services.entity_cache import entity_cache
+from services.event_bus import event_bus
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
+
+class SessionReaper:
+    """
+    Periodically frees connections nobody is using
+    
+    Clients created by send-code are disconnected once they have waited
+    AUTH_CLIENT_TTL seconds for a sign-in. With SESSION_HIBERNATE_AFTER set,
+    signed-in sessions without API requests, handler activity or stream
+    subscribers for that long are disconnected, and their dialog and name
+    caches dropped. Activity buffers and conversation history are kept, and
+    the next request reconnects the session through `wake`.
+    """
+    
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._waking: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            "expiredClients": 0,
+            "hibernated": 0,
+            "woken": 0
+        }
+    
+    @property
+    def hibernation_enabled(self) -> bool:
+        return settings.SESSION_HIBERNATE_AFTER > 0
+    
+    def start(self):
+        """Start the periodic sweep"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the periodic sweep"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.REAPER_INTERVAL)
+            try:
+                await self.expire_pending_clients()
+                if self.hibernation_enabled:
+                    await self.hibernate_idle_sessions()
+            except Exception as e:
+                log.exception("Session reaper error: %s", e)
+    
+    async def expire_pending_clients(self):
+        """Disconnect clients whose sign-in was abandoned"""
+        deadline = time.monotonic() - settings.AUTH_CLIENT_TTL
+        for phone, created_at in list(storage.client_created_at.items()):
+            if created_at > deadline:
+                continue
+            client = storage.get_client(phone)
+            storage.remove_client(phone)
+            if client is not None:
+                await client.disconnect()
+            self.stats["expiredClients"] += 1
+    
+    async def hibernate_idle_sessions(self):
+        """Disconnect sessions idle for longer than SESSION_HIBERNATE_AFTER"""
+        deadline = time.monotonic() - settings.SESSION_HIBERNATE_AFTER
+        for token, last_access in list(storage.session_last_access.items()):
+            if last_access > deadline or token in storage.hibernated_sessions:
+                continue
+            if event_bus.subscriber_count(token) or token in self._waking:
+                # A dashboard is listening live, or a request is reconnecting it
+                continue
+            await self.hibernate(token)
+    
+    async def hibernate(self, token: str):
+        """Disconnect a session, keeping it ready to be woken"""
+        session = storage.get_session(token)
+        if session is None:
+            return
+        storage.hibernated_sessions.add(token)
+        dialog_cache.remove(token)
+        entity_cache.remove_session(token)
+        await session["client"].disconnect()
+        self.stats["hibernated"] += 1
+        log.info("Session hibernated", extra=log_context(token))
+    
+    async def wake(self, token: str) -> bool:
+        """
+        Record access to a session and reconnect it if it was hibernated
+        Concurrent calls for the same token share a single reconnection.
+        Returns False if the session could not be reconnected.
+        """
+        storage.touch_session(token)
+        if token not in storage.hibernated_sessions:
+            return True
+        
+        task = self._waking.get(token)
+        if task is None:
+            task = asyncio.create_task(self._wake(token))
+            self._waking[token] = task
+            task.add_done_callback(lambda _: self._waking.pop(token, None))
+        return await asyncio.shield(task)
+    
+    async def _wake(self, token: str) -> bool:
+        """Reconnect a hibernated session's client"""
+        session = storage.get_session(token)
+        if session is None:
+            return False
+        
+        client = session["client"]
+        try:
+            await client.connect()
+            if not await client.is_user_authorized():
+                # Revoked while asleep, the session cannot be reused
+                await storage.cleanup_session(token)
+                return False
+        except Exception as e:
+            log.warning("Error waking session: %s", e, extra=log_context(token))
+            return False
+        
+        storage.hibernated_sessions.discard(token)
+        self.stats["woken"] += 1
+        return True
+    
+    def get_stats(self) -> dict:
+        """Get sweep counters and current state"""
+        return {
+            **self.stats,
+            "pendingClients": len(storage.active_clients),
+            "hibernatedSessions": len(storage.hibernated_sessions),
+            "hibernateAfter": settings.SESSION_HIBERNATE_AFTER
+        }
+
+session_reaper = SessionReaper()
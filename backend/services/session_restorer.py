@@ -0,0 +1,203 @@
+"""Warm-start reconnection of persisted sessions"""
+from telethon import TelegramClient
+from telethon.sessions import StringSession
+from typing import Dict, Optional
+import asyncio
+import random
+import time
+
+from config import settings
+from storage import storage
+from session_store import session_store
+from events import register_all_handlers
+from sharding.membership import shard_membership
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
+
+class SessionRestorer:
+    """
+    Reconnects every persisted session on startup
+    
+    Sessions are restored concurrently, at most SESSION_RESTORE_CONCURRENCY
+    at a time and SESSION_RESTORE_RATE new connections per second, each
+    after a random jitter, so a restart does not hit Telegram with every
+    account at once. Progress is exposed for the health check. Sessions
+    that move to this shard after a ring change are restored the same way.
+    """
+    
+    def __init__(self):
+        self.progress = {
+            "state": "idle",
+            "total": 0,
+            "restored": 0,
+            "failed": 0,
+            "expired": 0
+        }
+        self._next_start = 0.0
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._adopting: Optional[asyncio.Task] = None
+    
+    @property
+    def ready(self) -> bool:
+        """True once every persisted session has been handled"""
+        return self.progress["state"] == "done"
+    
+    async def _wait_for_turn(self):
+        """Space out connection attempts to the configured rate, plus jitter"""
+        now = time.monotonic()
+        start = max(now, self._next_start)
+        self._next_start = start + 1.0 / settings.SESSION_RESTORE_RATE
+        await asyncio.sleep(start - now + random.uniform(0, settings.SESSION_RESTORE_JITTER))
+    
+    async def _connect(self, record: dict) -> str:
+        """
+        Reconnect a persisted session and register its handlers
+        Returns: "restored", "expired" or "failed"
+        """
+        token = record["token"]
+        client = TelegramClient(
+            StringSession(record["session_string"]),
+            settings.TELEGRAM_API_ID,
+            settings.TELEGRAM_API_HASH
+        )
+        try:
+            await client.connect()
+            if not await client.is_user_authorized():
+                # Logged out elsewhere or revoked, the session cannot be reused
+                await client.disconnect()
+                await session_store.delete(token)
+                return "expired"
+            
+            storage.store_session(token, record["phone"], client, record["session_string"])
+            # Chart and recent activities survive restarts through the activity log
+            await storage.load_activity_history(token)
+            await register_all_handlers(client, token)
+            return "restored"
+        except Exception as e:
+            log.warning("Error restoring session: %s", e, extra=log_context(token))
+            await client.disconnect()
+            return "failed"
+    
+    async def _restore(self, record: dict, semaphore: asyncio.Semaphore):
+        """Reconnect a single persisted session at the configured pace"""
+        async with semaphore:
+            await self._wait_for_turn()
+            self.progress[await self._connect(record)] += 1
+    
+    async def restore_token(self, token: str) -> bool:
+        """
+        Reconnect one persisted session on demand, e.g. after it moved to this shard
+        Concurrent calls for the same token share a single reconnection.
+        """
+        if storage.get_session(token):
+            return True
+        
+        task = self._pending.get(token)
+        if task is None:
+            task = asyncio.create_task(self._restore_token(token))
+            self._pending[token] = task
+            task.add_done_callback(lambda _: self._pending.pop(token, None))
+        return await asyncio.shield(task)
+    
+    async def _restore_token(self, token: str) -> bool:
+        """Load and reconnect a single persisted session"""
+        record = await session_store.load(token)
+        if record is None:
+            return False
+        return await self._connect(record) == "restored"
+    
+    async def _adopt(self, record: dict, semaphore: asyncio.Semaphore) -> bool:
+        """Reconnect a session that moved to this shard, at the configured pace"""
+        async with semaphore:
+            await self._wait_for_turn()
+            if storage.get_session(record["token"]):
+                return True
+            if not shard_membership.owns(record["token"]):
+                # Moved on again while waiting for its turn
+                return False
+            return await self._connect(record) == "restored"
+    
+    async def _adopt_owned(self):
+        """Reconnect every persisted session this shard owns but has not connected"""
+        if self._task is not None:
+            # Let the startup restore finish first so no session is connected twice
+            await asyncio.shield(self._task)
+        
+        semaphore = asyncio.Semaphore(settings.SESSION_RESTORE_CONCURRENCY)
+        tasks = []
+        for record in await session_store.load_all():
+            token = record["token"]
+            if not shard_membership.owns(token) or storage.get_session(token) or token in self._pending:
+                continue
+            # Registered as pending, so a request for the token waits for this reconnection
+            task = asyncio.create_task(self._adopt(record, semaphore))
+            self._pending[token] = task
+            task.add_done_callback(lambda _, token=token: self._pending.pop(token, None))
+            tasks.append(task)
+        
+        restored = sum(await asyncio.gather(*tasks))
+        log.info("Restored %d of %d sessions moved to this shard", restored, len(tasks))
+    
+    def adopt_owned(self):
+        """Restore the sessions this shard owns after a ring change, in the background"""
+        if self._adopting is not None and not self._adopting.done():
+            # The running pass was planned for the previous ring, run another one after it
+            previous = self._adopting
+            
+            async def after_previous():
+                await asyncio.gather(previous, return_exceptions=True)
+                await self._adopt_owned()
+            
+            self._adopting = asyncio.create_task(after_previous())
+        else:
+            self._adopting = asyncio.create_task(self._adopt_owned())
+        self._adopting.add_done_callback(self._on_restore_done)
+    
+    def start(self):
+        """Restore every persisted session in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.restore_all())
+            self._task.add_done_callback(self._on_restore_done)
+    
+    def _on_restore_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Session restore task failed", exc_info=task.exception())
+    
+    async def stop(self):
+        """Cancel a restore still in progress"""
+        for task in (self._adopting, self._task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._adopting = None
+    
+    async def restore_all(self):
+        """Reconnect every persisted session"""
+        self.progress["state"] = "running"
+        try:
+            # In sharded mode each shard only restores the sessions it owns
+            records = [
+                record for record in await session_store.load_all()
+                if shard_membership.owns(record["token"])
+            ]
+            self.progress["total"] = len(records)
+            log.info("Restoring %d persisted sessions", len(records))
+            
+            semaphore = asyncio.Semaphore(settings.SESSION_RESTORE_CONCURRENCY)
+            self._next_start = time.monotonic()
+            await asyncio.gather(*(self._restore(record, semaphore) for record in records))
+            
+            self.progress["state"] = "done"
+            log.info("Session restore finished", extra=log_context(**self.progress))
+        except Exception as e:
+            log.exception("Session restore error: %s", e)
+        finally:
+            self.progress["state"] = "done"
+
+session_restorer = SessionRestorer()
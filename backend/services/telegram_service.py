@@ -3,17 +3,35 @@ from telethon import TelegramClient
 from telethon.sessions import StringSession
 from telethon.errors import SessionPasswordNeededError, PhoneCodeInvalidError
 from typing import Tuple, Optional
-import secrets
+import asyncio
+import time
 
 from config import settings
 from storage import storage
+from session_store import session_store
+from services.dialog_cache import dialog_cache
+from services.profile_cache import profile_cache
+from sharding.membership import shard_membership
+from structured_log import get_logger, log_context
+
+log = get_logger(__name__)
 
 class TelegramService:
     """Service for managing Telegram client operations"""
     
+    # Dialogs read by the stats and dashboard views
+    STATS_DIALOG_LIMIT = 100
+    DASHBOARD_DIALOG_LIMIT = 20
+    
     @staticmethod
     async def send_verification_code(phone: str) -> str:
         """Send verification code to phone number"""
+        previous = storage.get_client(phone)
+        if previous is not None:
+            # A new code request supersedes the pending one
+            storage.remove_client(phone)
+            await previous.disconnect()
+        
         client = TelegramClient(StringSession(), settings.TELEGRAM_API_ID, settings.TELEGRAM_API_HASH)
         await client.connect()
         
@@ -35,13 +53,16 @@ class TelegramService:
             raise ValueError("Session expired. Please request code again.")
         
         try:
-            await client.sign_in(phone, code, phone_code_hash=phone_code_hash)
+            user = await client.sign_in(phone, code, phone_code_hash=phone_code_hash)
             
             session_string = client.session.save()
             
-            # Generate session token
-            session_token = secrets.token_urlsafe(32)
+            # Generate session token (owned by this shard when sharded)
+            session_token = shard_membership.new_token()
             storage.store_session(session_token, phone, client, session_string)
+            storage.remove_client(phone)
+            profile_cache.store(session_token, user)
+            await session_store.save(session_token, phone, session_string)
             
             return session_token, False
             
@@ -58,10 +79,26 @@ class TelegramService:
             raise ValueError("Session not found")
         
         client = session["client"]
-        await client.sign_in(password=password)
+        user = await client.sign_in(password=password)
+        profile_cache.store(session_token, user)
+        
+        # Persist the session only now that it is authorized, nothing is saved before the 2FA step
+        session_string = client.session.save()
+        storage.string_sessions[session_token] = session_string
+        await session_store.save(session_token, session["phone"], session_string)
+    
+    @staticmethod
+    def account_stats_version(session_token: str) -> Optional[tuple]:
+        """Version of the data behind get_account_stats, or None if it must be fetched"""
+        # None when the stats read bypasses the dialog cache, e.g. DIALOG_CACHE_MAX_DIALOGS < 100
+        dialogs = dialog_cache.version(session_token, TelegramService.STATS_DIALOG_LIMIT)
+        if dialogs is None:
+            return None
+        activities = storage.get_activity_buffer(session_token)
+        return (dialogs, activities.epoch, activities.version) if activities is not None else (dialogs,)
     
     @staticmethod
-    async def get_account_stats(session_token: str) -> dict:
+    async def get_account_stats(session_token: str, refresh: bool = False) -> dict:
         """Get account statistics"""
         session = storage.get_session(session_token)
         if not session:
@@ -70,21 +107,130 @@ class TelegramService:
         client = session["client"]
         
         # Get dialogs (chats)
-        dialogs = await client.get_dialogs(limit=100)
+        dialogs = await dialog_cache.get_dialogs(session_token, client, limit=TelegramService.STATS_DIALOG_LIMIT, refresh=refresh)
         
         # Count unread messages
         unread_count = sum(dialog.unread_count for dialog in dialogs)
         
         # Count messages from recent activities
-        activities = storage.get_activities(session_token)
-        recent_messages = len([a for a in activities if a["type"] == "message"])
+        activities = storage.get_activity_buffer(session_token)
+        total_activities = len(activities) if activities is not None else 0
+        recent_messages = activities.type_counts.get("message", 0) if activities is not None else 0
         
         return {
-            "totalMessages": len(activities),
+            "totalMessages": total_activities,
             "totalChats": len(dialogs),
             "unreadMessages": unread_count,
             "messagesChange": recent_messages,
             "activeNow": True
         }
+    
+    @staticmethod
+    def _get_chat_type(entity) -> str:
+        """Determine chat type from a dialog entity"""
+        if hasattr(entity, 'broadcast'):
+            return "channel" if entity.broadcast else "group"
+        elif hasattr(entity, 'megagroup'):
+            return "group"
+        return "user"
+    
+    @staticmethod
+    async def _fetch_dialog_activity(client: TelegramClient, dialog, semaphore: asyncio.Semaphore) -> Tuple[Optional[dict], dict]:
+        """
+        Fetch recent messages for a single dialog
+        Returns: (chat activity or None, fetch timing)
+        """
+        timing = {"chatId": str(dialog.id), "chatName": dialog.name or "Unknown"}
+        
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                messages = await asyncio.wait_for(
+                    client.get_messages(dialog.entity, limit=5),
+                    timeout=settings.DASHBOARD_FETCH_TIMEOUT
+                )
+                timing["status"] = "ok"
+            except asyncio.TimeoutError:
+                messages = []
+                timing["status"] = "timeout"
+            except Exception as e:
+                log.warning("Error fetching messages: %s", e, extra=log_context(chat_id=timing["chatId"]))
+                messages = []
+                timing["status"] = "error"
+            timing["durationMs"] = round((time.perf_counter() - started) * 1000, 1)
+        
+        # Format messages
+        formatted_messages = []
+        for msg in messages:
+            if msg.text:  # Only include text messages
+                formatted_messages.append({
+                    "id": msg.id,
+                    "text": msg.text,
+                    "date": int(msg.date.timestamp()),
+                    "out": msg.out,
+                    "fromId": str(msg.from_id) if msg.from_id else None
+                })
+        
+        if not formatted_messages:  # Only include chats with messages
+            return None, timing
+        
+        return {
+            "chatId": timing["chatId"],
+            "chatName": timing["chatName"],
+            "chatType": TelegramService._get_chat_type(dialog.entity),
+            "unreadCount": dialog.unread_count,
+            "messages": formatted_messages
+        }, timing
+    
+    @staticmethod
+    def dashboard_version(session_token: str) -> Optional[tuple]:
+        """
+        Version of the data behind get_dashboard_data, or None if it must be fetched
+        New messages, reads and renames bump the dialog cache version; other
+        changes to recent messages are picked up once the dialogs expire.
+        """
+        dialogs = dialog_cache.version(session_token, TelegramService.DASHBOARD_DIALOG_LIMIT)
+        profile = profile_cache.peek(session_token)
+        if dialogs is None or profile is None:
+            return None
+        return (dialogs, tuple(profile.values()))
+    
+    @staticmethod
+    async def get_dashboard_data(session_token: str, refresh: bool = False) -> dict:
+        """
+        Get dashboard data with user info and recent activity
+        
+        Messages are fetched concurrently for all dialogs, bounded by
+        DASHBOARD_FETCH_CONCURRENCY. Chats that exceed DASHBOARD_FETCH_TIMEOUT
+        are left out and the response is flagged as partial.
+        """
+        session = storage.get_session(session_token)
+        if not session:
+            raise ValueError("Session not found")
+        
+        client = session["client"]
+        
+        # Current user info, from the profile cached at sign-in
+        profile = await profile_cache.get(session_token, client)
+        user_info = {**profile, "id": str(profile["id"])}
+        
+        # Get recent dialogs (chats)
+        dialogs = await dialog_cache.get_dialogs(session_token, client, limit=TelegramService.DASHBOARD_DIALOG_LIMIT, refresh=refresh)
+        
+        semaphore = asyncio.Semaphore(settings.DASHBOARD_FETCH_CONCURRENCY)
+        results = await asyncio.gather(*(
+            TelegramService._fetch_dialog_activity(client, dialog, semaphore)
+            for dialog in dialogs
+        ))
+        
+        activity = [chat for chat, _ in results if chat]
+        timings = [timing for _, timing in results]
+        
+        return {
+            "user": user_info,
+            "activity": activity,
+            "partial": any(t["status"] != "ok" for t in timings),
+            "fetchTimings": timings
+        }
 
 telegram_service = TelegramService()
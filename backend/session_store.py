@@ -0,0 +1,167 @@
+"""Durable storage of Telegram session strings"""
+from abc import ABC, abstractmethod
+from typing import List, Optional
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+from config import settings
+
+class SessionBackend(ABC):
+    """Interface for persisting session strings across restarts"""
+    
+    @abstractmethod
+    def save(self, token: str, phone: str, session_string: str):
+        """Persist a session"""
+    
+    @abstractmethod
+    def delete(self, token: str):
+        """Forget a session"""
+    
+    @abstractmethod
+    def load(self, token: str) -> Optional[dict]:
+        """Load a single persisted session"""
+    
+    @abstractmethod
+    def load_all(self) -> List[dict]:
+        """Load every persisted session"""
+    
+    def close(self):
+        """Release backend resources"""
+
+class MemorySessionBackend(SessionBackend):
+    """Keeps nothing across restarts (previous behavior)"""
+    
+    def save(self, token: str, phone: str, session_string: str):
+        pass
+    
+    def delete(self, token: str):
+        pass
+    
+    def load(self, token: str) -> Optional[dict]:
+        return None
+    
+    def load_all(self) -> List[dict]:
+        return []
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Stores sessions in a local SQLite database
+    
+    Session strings grant full account access, so the database file is
+    created readable by the owner only.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if not os.path.exists(path):
+            # Create the file with restrictive permissions before SQLite opens it
+            os.close(os.open(path, os.O_CREAT | os.O_WRONLY, 0o600))
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                token TEXT PRIMARY KEY,
+                phone TEXT NOT NULL,
+                session_string TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+    
+    def save(self, token: str, phone: str, session_string: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO sessions (token, phone, session_string, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(token) DO UPDATE SET
+                    phone = excluded.phone,
+                    session_string = excluded.session_string,
+                    updated_at = excluded.updated_at
+                """,
+                (token, phone, session_string, now, now)
+            )
+            self._conn.commit()
+    
+    def delete(self, token: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE token = ?", (token,))
+            self._conn.commit()
+    
+    COLUMNS = "token, phone, session_string, created_at, updated_at"
+    
+    @staticmethod
+    def _to_record(row: tuple) -> dict:
+        """Convert a sessions row to a record dict"""
+        token, phone, session_string, created_at, updated_at = row
+        return {
+            "token": token,
+            "phone": phone,
+            "session_string": session_string,
+            "created_at": created_at,
+            "updated_at": updated_at
+        }
+    
+    def load(self, token: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.COLUMNS} FROM sessions WHERE token = ?", (token,)
+            ).fetchone()
+        return self._to_record(row) if row else None
+    
+    def load_all(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {self.COLUMNS} FROM sessions").fetchall()
+        return [self._to_record(row) for row in rows]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class SessionStore:
+    """Async facade running backend calls off the event loop"""
+    
+    def __init__(self, backend: Optional[SessionBackend] = None):
+        self._backend = backend
+    
+    @property
+    def backend(self) -> SessionBackend:
+        """Create the configured backend on first use"""
+        if self._backend is None:
+            if settings.SESSION_BACKEND == "sqlite":
+                self._backend = SQLiteSessionBackend(settings.SESSION_DB_PATH)
+            else:
+                self._backend = MemorySessionBackend()
+        return self._backend
+    
+    async def save(self, token: str, phone: str, session_string: str):
+        """Persist a session"""
+        await asyncio.to_thread(self.backend.save, token, phone, session_string)
+    
+    async def delete(self, token: str):
+        """Forget a session"""
+        await asyncio.to_thread(self.backend.delete, token)
+    
+    async def load(self, token: str) -> Optional[dict]:
+        """Load a single persisted session"""
+        return await asyncio.to_thread(self.backend.load, token)
+    
+    async def load_all(self) -> List[dict]:
+        """Load every persisted session"""
+        return await asyncio.to_thread(self.backend.load_all)
+    
+    def close(self):
+        """Release backend resources"""
+        if self._backend is not None:
+            self._backend.close()
+            self._backend = None
+
+session_store = SessionStore()
@@ -0,0 +1 @@
+"""Session sharding across worker processes"""
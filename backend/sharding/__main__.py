@@ -0,0 +1,74 @@
+"""
+Run a sharded fleet on one machine
+
+    python -m sharding --shards 4 --port 8080
+
+Starts one uvicorn process per shard on consecutive ports after
+--base-port, plus the front router on --port. All shards share the
+SQLite session store, so sessions can move between shards.
+"""
+import argparse
+import os
+import secrets
+import signal
+import subprocess
+import sys
+import time
+
+from structured_log import get_logger
+
+# Named explicitly, __name__ is "__main__" when run with -m
+log = get_logger("sharding")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API as several session shards behind a router")
+    parser.add_argument("--shards", type=int, default=2, help="Number of shard processes")
+    parser.add_argument("--host", default="127.0.0.1", help="Router bind address")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", 8080)), help="Router port")
+    parser.add_argument("--base-port", type=int, default=9000, help="First shard port")
+    args = parser.parse_args()
+    
+    nodes = [f"shard-{index}" for index in range(args.shards)]
+    urls = {node: f"http://127.0.0.1:{args.base_port + index}" for index, node in enumerate(nodes)}
+    secret = os.getenv("SHARD_SECRET") or secrets.token_urlsafe(32)
+    
+    processes = []
+    for index, node in enumerate(nodes):
+        env = dict(os.environ, SHARD_ID=node, SHARD_NODES=",".join(nodes), SHARD_SECRET=secret)
+        processes.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.base_port + index)],
+            cwd=BACKEND_DIR,
+            env=env
+        ))
+    
+    router_env = dict(
+        os.environ,
+        SHARD_URLS=",".join(f"{node}={url}" for node, url in urls.items()),
+        SHARD_SECRET=secret
+    )
+    processes.append(subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "sharding.router:app", "--host", args.host, "--port", str(args.port)],
+        cwd=BACKEND_DIR,
+        env=router_env
+    ))
+    log.info("Router on %s:%d, shards: %s", args.host, args.port, urls)
+    
+    def stop(*_):
+        for process in processes:
+            process.terminate()
+    
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop()
+        for process in processes:
+            process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Consistent hash ring mapping session tokens to shards"""
+from bisect import bisect_right
+from typing import Iterable, List, Tuple
+import hashlib
+
+class HashRing:
+    """
+    Consistent hashing with virtual nodes
+    
+    Each node is placed on the ring many times so keys spread evenly, and
+    adding or removing a node only moves the keys adjacent to its points.
+    """
+    
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 100):
+        self.vnodes = vnodes
+        self._points: List[Tuple[int, str]] = []
+        self._hashes: List[int] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+    
+    @staticmethod
+    def _hash(value: str) -> int:
+        """Stable 64-bit hash (Python's hash() is randomized per process)"""
+        return int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+    
+    def _rebuild(self):
+        """Recompute the sorted ring points"""
+        self._points = sorted(
+            (self._hash(f"{node}#{index}"), node)
+            for node in self.nodes
+            for index in range(self.vnodes)
+        )
+        self._hashes = [point for point, _ in self._points]
+    
+    def add(self, node: str):
+        """Add a node to the ring"""
+        if node not in self.nodes:
+            self.nodes.append(node)
+            self._rebuild()
+    
+    def remove(self, node: str):
+        """Remove a node from the ring"""
+        if node in self.nodes:
+            self.nodes.remove(node)
+            self._rebuild()
+    
+    def get(self, key: str) -> str:
+        """Get the node owning a key"""
+        if not self._points:
+            raise ValueError("Hash ring has no nodes")
+        index = bisect_right(self._hashes, self._hash(key)) % len(self._points)
+        return self._points[index][1]
@@ -0,0 +1,37 @@
+"""This process's membership in the shard ring"""
+from typing import Iterable
+import secrets
+
+from config import settings
+from sharding.hash_ring import HashRing
+
+class ShardMembership:
+    """This process's view of the shard ring"""
+    
+    def __init__(self):
+        self.shard_id = settings.SHARD_ID
+        self.ring = HashRing(settings.SHARD_NODES or ([self.shard_id] if self.shard_id else []))
+    
+    @property
+    def enabled(self) -> bool:
+        """Sharding is enabled when this process has a shard ID"""
+        return self.shard_id is not None
+    
+    def owns(self, token: str) -> bool:
+        """Check whether a session token belongs to this shard"""
+        return not self.enabled or self.ring.get(token) == self.shard_id
+    
+    def new_token(self) -> str:
+        """Generate a session token that hashes to this shard"""
+        if self.shard_id not in self.ring.nodes:
+            raise RuntimeError("Shard was removed from the ring")
+        while True:
+            token = secrets.token_urlsafe(32)
+            if self.owns(token):
+                return token
+    
+    def update_nodes(self, nodes: Iterable[str]):
+        """Replace the ring membership"""
+        self.ring = HashRing(nodes)
+
+shard_membership = ShardMembership()
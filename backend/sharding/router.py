@@ -0,0 +1,193 @@
+"""
+Front router forwarding API requests to the shard owning the session
+
+Run with: SHARD_URLS="shard-0=http://127.0.0.1:9000,..." uvicorn sharding.router:app
+"""
+from fastapi import FastAPI, HTTPException, Header, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, Optional
+import aiohttp
+import asyncio
+import json
+import os
+import secrets
+
+from sharding.hash_ring import HashRing
+
+# Hop-by-hop headers must not be forwarded by proxies
+HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host", "content-length"
+}
+
+class ShardNode(BaseModel):
+    """Request model for adding a shard to the ring"""
+    id: str
+    url: str
+
+class ShardRouter:
+    """Tracks shard addresses and the ring used to pick them"""
+    
+    def __init__(self, shard_urls: Dict[str, str], secret: Optional[str]):
+        self.shard_urls = dict(shard_urls)
+        self.ring = HashRing(self.shard_urls)
+        self.secret = secret
+        self.session: Optional[aiohttp.ClientSession] = None
+    
+    @staticmethod
+    def parse_urls(value: str) -> Dict[str, str]:
+        """Parse "id=url,id=url" into a mapping"""
+        urls = {}
+        for item in value.split(","):
+            if "=" in item:
+                node, url = item.split("=", 1)
+                urls[node.strip()] = url.strip().rstrip("/")
+        return urls
+    
+    def pick(self, key: str) -> str:
+        """Get the base URL of the shard owning a key"""
+        return self.shard_urls[self.ring.get(key)]
+    
+    async def push_ring(self, node: str, url: str) -> dict:
+        """Send the current membership to one shard"""
+        try:
+            async with self.session.post(
+                f"{url}/internal/ring",
+                json={"nodes": list(self.shard_urls)},
+                headers={"X-Shard-Secret": self.secret or ""}
+            ) as response:
+                return await response.json()
+        except Exception as e:
+            return {"error": str(e)}
+    
+    async def broadcast_ring(self) -> Dict[str, dict]:
+        """Push the current membership to every shard so they release and restore moved sessions"""
+        nodes = list(self.shard_urls)
+        results = await asyncio.gather(*(self.push_ring(node, url) for node, url in self.shard_urls.items()))
+        return dict(zip(nodes, results))
+
+shard_router = ShardRouter(
+    ShardRouter.parse_urls(os.getenv("SHARD_URLS", "")),
+    os.getenv("SHARD_SECRET") or None
+)
+
+app = FastAPI(
+    title="Telegram Activity Monitor Shard Router",
+    description="Routes API requests to the shard owning each session",
+    version="2.0.0"
+)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.on_event("startup")
+async def startup():
+    """Open the connection pool to the shards"""
+    shard_router.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=5))
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close the connection pool to the shards"""
+    await shard_router.session.close()
+
+def _routing_key(request: Request, body: bytes) -> str:
+    """Route by session token, or by phone number before sign-in completes"""
+    token = request.headers.get("x-session-token")
+    if token:
+        return token
+    authorization = request.headers.get("authorization")
+    if authorization and authorization.startswith("Bearer "):
+        return authorization.replace("Bearer ", "")
+    try:
+        phone = json.loads(body).get("phone") if body else None
+    except (ValueError, AttributeError):
+        phone = None
+    return f"phone:{phone or ''}"
+
+@app.api_route("/api/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def forward(path: str, request: Request):
+    """Forward an API request to the owning shard, streaming the response back"""
+    if not shard_router.shard_urls:
+        raise HTTPException(status_code=503, detail="No shards configured")
+    
+    body = await request.body()
+    url = f"{shard_router.pick(_routing_key(request, body))}/api/{path}"
+    headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+    
+    try:
+        response = await shard_router.session.request(
+            request.method,
+            url,
+            params=request.query_params,
+            data=body,
+            headers=headers
+        )
+    except aiohttp.ClientError as e:
+        raise HTTPException(status_code=502, detail=f"Shard unavailable: {e}")
+    
+    async def relay():
+        try:
+            async for chunk in response.content.iter_any():
+                yield chunk
+        finally:
+            response.release()
+    
+    return StreamingResponse(
+        relay(),
+        status_code=response.status,
+        headers={k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+    )
+
+def _check_secret(secret: Optional[str]):
+    """Reject admin calls that do not carry the shared shard secret"""
+    if not shard_router.secret or not secret or not secrets.compare_digest(secret, shard_router.secret):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.post("/internal/shards")
+async def add_shard(node: ShardNode, x_shard_secret: Optional[str] = Header(None, alias="X-Shard-Secret")):
+    """Add a shard and rebalance sessions onto it"""
+    _check_secret(x_shard_secret)
+    shard_router.shard_urls[node.id] = node.url.rstrip("/")
+    shard_router.ring.add(node.id)
+    return {"nodes": list(shard_router.shard_urls), "shards": await shard_router.broadcast_ring()}
+
+@app.delete("/internal/shards/{node_id}")
+async def remove_shard(node_id: str, x_shard_secret: Optional[str] = Header(None, alias="X-Shard-Secret")):
+    """Remove a shard; it releases its sessions before their new owners restore them"""
+    _check_secret(x_shard_secret)
+    if node_id not in shard_router.shard_urls:
+        raise HTTPException(status_code=404, detail="Unknown shard")
+    if len(shard_router.shard_urls) == 1:
+        raise HTTPException(status_code=400, detail="Cannot remove the last shard")
+    url = shard_router.shard_urls.pop(node_id)
+    shard_router.ring.remove(node_id)
+    
+    # The removed shard must disconnect first, or two processes would answer for the same accounts
+    removed = await shard_router.push_ring(node_id, url)
+    shards = await shard_router.broadcast_ring()
+    return {"nodes": list(shard_router.shard_urls), "shards": {**shards, node_id: removed}}
+
+@app.get("/health")
+async def health_check():
+    """Aggregate health of every shard"""
+    async def probe(node: str, url: str):
+        try:
+            async with shard_router.session.get(f"{url}/health", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                return node, await response.json()
+        except Exception as e:
+            return node, {"status": "unreachable", "error": str(e)}
+    
+    shards = dict(await asyncio.gather(*(probe(node, url) for node, url in shard_router.shard_urls.items())))
+    return {
+        "status": "healthy" if all(s.get("status") == "healthy" for s in shards.values()) else "degraded",
+        "ready": all(s.get("ready") for s in shards.values()),
+        "active_sessions": sum(s.get("active_sessions", 0) for s in shards.values()),
+        "shards": shards
+    }
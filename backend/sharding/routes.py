@@ -0,0 +1,51 @@
+"""Internal routes called by the shard router"""
+from fastapi import APIRouter, HTTPException, Header
+from typing import Optional
+import secrets
+
+from config import settings
+from models import ShardRingUpdate
+from storage import storage
+from services.session_restorer import session_restorer
+from sharding.membership import shard_membership
+from structured_log import get_logger
+
+router = APIRouter(prefix="/internal", tags=["sharding"])
+
+log = get_logger(__name__)
+
+def _check_secret(secret: Optional[str]):
+    """Reject calls that do not carry the shared shard secret"""
+    if not settings.SHARD_SECRET or not secret or not secrets.compare_digest(secret, settings.SHARD_SECRET):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@router.post("/ring")
+async def update_ring(
+    request: ShardRingUpdate,
+    x_shard_secret: Optional[str] = Header(None, alias="X-Shard-Secret")
+):
+    """
+    Replace the ring membership, release sessions now owned by another shard
+    and restore the ones that moved here
+    A ring without this shard means it was removed, so it releases every session.
+    """
+    _check_secret(x_shard_secret)
+    if not request.nodes:
+        raise HTTPException(status_code=400, detail="Ring must include at least one shard")
+    
+    shard_membership.update_nodes(request.nodes)
+    
+    released = [token for token in list(storage.active_sessions) if not shard_membership.owns(token)]
+    for token in released:
+        await storage.release_session(token)
+    
+    # Sessions that moved here are reconnected in the background, at the restore pace
+    if shard_membership.shard_id in request.nodes:
+        session_restorer.adopt_owned()
+    
+    log.info("Shard ring updated to %s, released %d sessions", request.nodes, len(released))
+    return {
+        "shard": shard_membership.shard_id,
+        "nodes": request.nodes,
+        "released": len(released)
+    }
@@ -1,20 +1,44 @@
 """In-memory storage management (use Redis/Database in production)"""
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
+from datetime import datetime
+import time
 from telethon import TelegramClient
 
+from config import settings
+from activity_buffer import ActivityRingBuffer
+from activity_histogram import ActivityHistogram
+from conversation_history import ConversationStore
+from session_store import session_store
+from activity_log import activity_log
+from services.dialog_cache import dialog_cache
+from services.entity_cache import entity_cache
+from services.profile_cache import profile_cache
+from services.response_snapshots import response_snapshots
+from services.event_bus import event_bus
+from services.reply_coalescer import reply_coalescer
+from services.chatbase_scheduler import chatbase_scheduler
+from services.chatbase_service import chatbase_service
+from services.outbound_sender import outbound_sender
+from services.ingest_queue import ingest_queue
+
 class Storage:
     """Manages in-memory storage for active sessions and activities"""
     
     def __init__(self):
         self.active_clients: Dict[str, TelegramClient] = {}
         self.active_sessions: Dict[str, dict] = {}
-        self.activities_store: Dict[str, List[dict]] = {}
+        self.activities_store: Dict[str, ActivityRingBuffer] = {}
+        self.activity_histograms: Dict[str, ActivityHistogram] = {}
         self.string_sessions: Dict[str, str] = {}
-        self.conversation_history: Dict[str, Dict[str, List[dict]]] = {}
+        self.conversation_history: Dict[str, ConversationStore] = {}
+        self.client_created_at: Dict[str, float] = {}
+        self.session_last_access: Dict[str, float] = {}
+        self.hibernated_sessions: Set[str] = set()
     
     def store_client(self, phone: str, client: TelegramClient):
         """Store a temporary client during authentication"""
         self.active_clients[phone] = client
+        self.client_created_at[phone] = time.monotonic()
     
     def get_client(self, phone: str) -> Optional[TelegramClient]:
         """Retrieve a temporary client"""
@@ -24,6 +48,7 @@ class Storage:
         """Remove a temporary client"""
         if phone in self.active_clients:
             del self.active_clients[phone]
+        self.client_created_at.pop(phone, None)
     
     def store_session(self, token: str, phone: str, client: TelegramClient, session_string: str):
         """Store an active session"""
@@ -32,46 +57,92 @@ class Storage:
             "client": client
         }
         self.string_sessions[token] = session_string
-        self.activities_store[token] = []
+        self.session_last_access[token] = time.monotonic()
+        self.activities_store[token] = ActivityRingBuffer(settings.ACTIVITY_BUFFER_SIZE)
+        self.activity_histograms[token] = ActivityHistogram(
+            settings.ACTIVITY_HISTOGRAM_MINUTES,
+            settings.ACTIVITY_HISTOGRAM_HOURS
+        )
+        chatbase_scheduler.set_weight(token, settings.CHATBASE_WEIGHTS.get(phone, settings.CHATBASE_DEFAULT_WEIGHT))
     
     def get_session(self, token: str) -> Optional[dict]:
         """Retrieve an active session"""
         return self.active_sessions.get(token)
     
-    def add_activity(self, token: str, activity: dict):
-        """Add an activity to the store"""
-        if token in self.activities_store:
-            self.activities_store[token].insert(0, activity)
-            # Keep only last 100 activities
-            self.activities_store[token] = self.activities_store[token][:100]
+    def touch_session(self, token: str):
+        """Record API or handler activity, postponing hibernation"""
+        if token in self.active_sessions:
+            self.session_last_access[token] = time.monotonic()
     
-    def get_activities(self, token: str) -> List[dict]:
-        """Get activities for a session"""
-        return self.activities_store.get(token, [])
+    def add_activity(self, token: str, activity: dict):
+        """Add an activity to the store and update the chart counters"""
+        buffer = self.activities_store.get(token)
+        if buffer is not None:
+            timestamp = datetime.fromisoformat(activity["timestamp"]).timestamp()
+            self.session_last_access[token] = time.monotonic()
+            total_before = len(buffer)
+            messages_before = buffer.type_counts.get("message", 0)
+            buffer.append(activity, timestamp)
+            self.activity_histograms[token].record(timestamp, activity["type"])
+            activity_log.append(token, activity, timestamp)
+            
+            # Push to stream subscribers, with the matching /api/stats counter deltas;
+            # once the buffer is full an append evicts an entry, so totals stop growing
+            event_bus.publish(token, "activity", activity)
+            event_bus.publish(token, "stats", {
+                "totalMessages": len(buffer) - total_before,
+                "messagesChange": buffer.type_counts.get("message", 0) - messages_before
+            })
     
-    def add_message_to_history(self, token: str, chat_id: str, role: str, content: str):
-        """Add a message to conversation history"""
-        if token not in self.conversation_history:
-            self.conversation_history[token] = {}
-        if chat_id not in self.conversation_history[token]:
-            self.conversation_history[token][chat_id] = []
+    async def load_activity_history(self, token: str):
+        """
+        Refill a session's activity buffer and chart counters from the activity log
+        Call before the session's handlers are registered, so logged activities
+        come before new ones.
+        """
+        buffer = self.activities_store.get(token)
+        histogram = self.activity_histograms.get(token)
+        if buffer is None or not activity_log.enabled:
+            return
         
-        self.conversation_history[token][chat_id].append({
-            "role": role,
-            "content": content
-        })
+        now = time.time()
+        recent = await activity_log.query(token, 0.0, now, limit=settings.ACTIVITY_BUFFER_SIZE)
+        for activity in reversed(recent):
+            buffer.append(activity, datetime.fromisoformat(activity["timestamp"]).timestamp())
         
-        # Keep only last 50 messages per chat
-        self.conversation_history[token][chat_id] = self.conversation_history[token][chat_id][-50:]
+        for resolution, width in ActivityHistogram.RESOLUTIONS.items():
+            # Start on a bucket boundary so the oldest retained bucket is complete
+            start = (int(now // width) - histogram.max_window(resolution) + 1) * width
+            for bucket_start, activity_type, count in await activity_log.count(token, start, now, width):
+                histogram.add_bucket(resolution, bucket_start, activity_type, count)
+    
+    def get_activity_histogram(self, token: str) -> Optional[ActivityHistogram]:
+        """Get the rolling activity counters for a session"""
+        return self.activity_histograms.get(token)
+    
+    def get_activity_buffer(self, token: str) -> Optional[ActivityRingBuffer]:
+        """Get the activity buffer for a session"""
+        return self.activities_store.get(token)
+    
+    def add_message_to_history(self, token: str, chat_id: str, role: str, content: str, merge: bool = False):
+        """Add a message to conversation history, optionally merging it into a previous turn by the same role"""
+        store = self.conversation_history.get(token)
+        if store is None:
+            store = ConversationStore(
+                settings.HISTORY_MAX_MESSAGES,
+                settings.HISTORY_MAX_TOKENS,
+                settings.HISTORY_IDLE_TTL
+            )
+            self.conversation_history[token] = store
+        store.add(chat_id, role, content, merge=merge)
     
     def get_conversation_history(self, token: str, chat_id: str) -> List[dict]:
-        """Get conversation history for a specific chat"""
-        if token in self.conversation_history and chat_id in self.conversation_history[token]:
-            return self.conversation_history[token][chat_id]
-        return []
+        """Get a snapshot of the conversation history for a specific chat"""
+        store = self.conversation_history.get(token)
+        return store.get(chat_id) if store is not None else []
     
-    async def cleanup_session(self, token: str):
-        """Cleanup a session and disconnect client"""
+    async def release_session(self, token: str):
+        """Disconnect a session and drop its in-memory state, keeping the persisted session"""
         session = self.active_sessions.get(token)
         if session:
             client = session["client"]
@@ -79,10 +150,30 @@ class Storage:
             del self.active_sessions[token]
             if token in self.activities_store:
                 del self.activities_store[token]
+            if token in self.activity_histograms:
+                del self.activity_histograms[token]
             if token in self.string_sessions:
                 del self.string_sessions[token]
             if token in self.conversation_history:
                 del self.conversation_history[token]
+            self.session_last_access.pop(token, None)
+            self.hibernated_sessions.discard(token)
+            dialog_cache.remove(token)
+            entity_cache.remove_session(token)
+            profile_cache.remove(token)
+            response_snapshots.remove_session(token)
+            event_bus.remove_session(token)
+            reply_coalescer.cancel_session(token)
+            chatbase_scheduler.drop_session(token)
+            chatbase_service.forget_session(token)
+            outbound_sender.drop_session(token)
+            ingest_queue.drop_session(token)
+    
+    async def cleanup_session(self, token: str):
+        """Cleanup a session, disconnect client and forget the persisted session"""
+        await session_store.delete(token)
+        await activity_log.delete_session(token)
+        await self.release_session(token)
 
 # Global storage instance
 storage = Storage()
@@ -0,0 +1,201 @@
+"""Non-blocking structured logging"""
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+import atexit
+import copy
+import json
+import logging
+import queue
+import sys
+import threading
+import time
+
+from config import settings
+
+# Every backend logger lives under this namespace
+ROOT_LOGGER = "app"
+
+def log_context(session_token: Optional[str] = None, chat_id: Optional[str] = None, **fields) -> dict:
+    """
+    Build the `extra` argument carrying session/chat context for a record
+    
+    Session tokens are shortened so logs never hold a usable credential.
+    """
+    context = {key: value for key, value in fields.items() if value is not None}
+    if session_token:
+        context["session"] = session_token[:8]
+    if chat_id is not None:
+        context["chat"] = str(chat_id)
+    return {"context": context}
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let at most `limit` records per message template through each interval
+    
+    Records are keyed on the unformatted message, so a repeated log line with
+    varying arguments counts as one template. The next record let through
+    after a suppressed burst carries the number of records dropped.
+    """
+    
+    def __init__(self, limit: int, interval: float):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self._windows: Dict[Tuple[str, str], list] = {}
+        self.suppressed = 0
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0:
+            return True
+        
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            skipped = window[2] if window is not None else 0
+            self._windows[key] = [now, 1, 0]
+            if skipped:
+                record.suppressed = skipped
+            if len(self._windows) > 10000:
+                # Forget templates that have gone quiet
+                self._windows = {k: w for k, w in self._windows.items() if now - w[0] < self.interval}
+            return True
+        
+        if window[1] < self.limit:
+            window[1] += 1
+            return True
+        
+        window[2] += 1
+        self.suppressed += 1
+        return False
+
+class DroppingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking when the queue is full"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge the arguments into the message, leaving formatting to the writer thread
+        
+        Unlike QueueHandler.prepare the exception is not rendered here, so
+        formatting tracebacks never runs on the event loop.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        entry.update(getattr(record, "context", {}))
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines with context appended as key=value pairs"""
+    
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = dict(getattr(record, "context", {}))
+        if getattr(record, "suppressed", 0):
+            fields["suppressed"] = record.suppressed
+        if fields:
+            extra = " ".join(f"{key}={value}" for key, value in fields.items())
+            first, newline, rest = line.partition("\n")
+            line = f"{first} [{extra}]{newline}{rest}"
+        return line
+
+class _DrainingQueueListener(QueueListener):
+    """Queue listener whose stop waits for room instead of failing on a full queue"""
+    
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+class LogPipeline:
+    """
+    Route backend logs through a bounded queue to a writer thread
+    
+    Loggers only filter and enqueue on the caller's thread; formatting and
+    writing to stdout happen on the listener thread, so a slow log
+    collector cannot stall the event loop. Records are dropped, and
+    counted, once LOG_QUEUE_MAX are waiting.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listener: Optional[QueueListener] = None
+        self._handler: Optional[DroppingQueueHandler] = None
+        self._queue: Optional[queue.Queue] = None
+        self._rate_limit: Optional[RateLimitFilter] = None
+    
+    def start(self):
+        """Attach the queue handler and start the writer thread"""
+        with self._lock:
+            if self._listener is not None:
+                return
+            
+            self._queue = queue.Queue(maxsize=settings.LOG_QUEUE_MAX)
+            output = logging.StreamHandler(sys.stdout)
+            output.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+            
+            self._rate_limit = RateLimitFilter(settings.LOG_RATE_LIMIT, settings.LOG_RATE_INTERVAL)
+            self._handler = DroppingQueueHandler(self._queue)
+            self._handler.addFilter(self._rate_limit)
+            
+            root = logging.getLogger(ROOT_LOGGER)
+            root.setLevel(settings.LOG_LEVEL)
+            root.addHandler(self._handler)
+            root.propagate = False
+            
+            self._listener = _DrainingQueueListener(self._queue, output)
+            self._listener.start()
+            atexit.register(self.stop)
+    
+    def stop(self):
+        """Write out queued records and stop the writer thread"""
+        with self._lock:
+            if self._listener is None:
+                return
+            logging.getLogger(ROOT_LOGGER).removeHandler(self._handler)
+            self._listener.stop()
+            self._listener = None
+    
+    def get_stats(self) -> dict:
+        """Get queue depth and drop counters"""
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "dropped": self._handler.dropped if self._handler is not None else 0,
+            "suppressed": self._rate_limit.suppressed if self._rate_limit is not None else 0
+        }
+
+# Global log pipeline instance
+log_pipeline = LogPipeline()
+
+def get_logger(name: str) -> logging.Logger:
+    """Get a backend logger, starting the pipeline on first use"""
+    log_pipeline.start()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
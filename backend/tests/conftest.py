@@ -0,0 +1,11 @@
+"""Shared test setup: import the backend without real credentials or databases"""
+import os
+import sys
+
+os.environ.setdefault("TELEGRAM_API_ID", "1")
+os.environ.setdefault("TELEGRAM_API_HASH", "test")
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("ACTIVITY_LOG_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
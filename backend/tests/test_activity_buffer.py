@@ -0,0 +1,48 @@
+"""Tests for the activity ring buffer"""
+import pytest
+
+from activity_buffer import ActivityRingBuffer
+
+def _activity(n: int, activity_type: str = "message") -> dict:
+    return {"id": f"a{n}", "type": activity_type}
+
+def _filled(capacity: int, count: int) -> ActivityRingBuffer:
+    buffer = ActivityRingBuffer(capacity)
+    for n in range(count):
+        buffer.append(_activity(n, "message" if n % 2 == 0 else "member_joined"), float(n))
+    return buffer
+
+def test_rejects_empty_capacity():
+    with pytest.raises(ValueError):
+        ActivityRingBuffer(0)
+
+def test_evicts_oldest_and_keeps_type_counts():
+    buffer = _filled(3, 5)
+    assert len(buffer) == 3
+    assert [activity["id"] for activity in buffer] == ["a4", "a3", "a2"]
+    assert buffer.type_counts == {"message": 2, "member_joined": 1}
+    assert buffer.version == 5
+
+def test_index_of_forgets_evicted_ids():
+    buffer = _filled(3, 5)
+    assert buffer.index_of("a1") is None
+    assert buffer.index_of("a2") == 0
+    assert buffer.index_of("a4") == 2
+
+def test_page_between_cursors_with_type_filter():
+    buffer = _filled(10, 10)
+    activities, has_more = buffer.page(2, before=buffer.index_of("a8"))
+    assert [activity["id"] for activity in activities] == ["a7", "a6"]
+    assert has_more
+    
+    activities, has_more = buffer.page(10, since=buffer.index_of("a5"), activity_type="message")
+    assert [activity["id"] for activity in activities] == ["a8", "a6"]
+    assert not has_more
+
+def test_since_uses_clamped_timestamps():
+    buffer = ActivityRingBuffer(5)
+    buffer.append(_activity(0), 10.0)
+    buffer.append(_activity(1), 5.0)  # Out of order, clamped to 10
+    buffer.append(_activity(2), 20.0)
+    assert [activity["id"] for activity in buffer.since(10.0)] == ["a2"]
+    assert [activity["id"] for activity in buffer.since(9.0)] == ["a2", "a1", "a0"]
@@ -0,0 +1,29 @@
+"""Tests for the rolling activity counters"""
+from activity_histogram import ActivityHistogram, RollingCounter
+
+def test_counts_per_bucket_and_type():
+    counter = RollingCounter(60, 5)
+    counter.add(0.0, "message")
+    counter.add(30.0, "message")
+    counter.add(61.0, "member_joined")
+    assert counter.window(119.0, 2) == [(0.0, {"message": 2}), (60.0, {"member_joined": 1})]
+
+def test_buckets_from_a_previous_lap_are_reset():
+    counter = RollingCounter(60, 3)
+    counter.add(0.0, "message")
+    counter.add(180.0, "message")  # Same slot, one lap later
+    assert counter.window(180.0, 1) == [(180.0, {"message": 1})]
+    assert counter.window(0.0, 1) == [(0.0, {})]
+
+def test_window_skips_stale_slots():
+    counter = RollingCounter(60, 3)
+    counter.add(0.0, "message")
+    assert counter.window(300.0, 3) == [(180.0, {}), (240.0, {}), (300.0, {})]
+
+def test_histogram_records_every_resolution_and_reloads_buckets():
+    histogram = ActivityHistogram(minute_buckets=60, hour_buckets=24)
+    histogram.record(3600.0, "message")
+    histogram.add_bucket("hour", 3600.0, "message", 4)
+    assert histogram.window("minute", 3600.0, 1) == [(3600.0, {"message": 1})]
+    assert histogram.window("hour", 3600.0, 1) == [(3600.0, {"message": 5})]
+    assert histogram.max_window("minute") == 60
@@ -0,0 +1,75 @@
+"""Tests for weighted fair admission of Chatbase requests"""
+import asyncio
+
+import pytest
+
+from config import settings
+from services.chatbase_scheduler import ChatbaseScheduler, SchedulerOverloaded
+
+async def _admission_order(scheduler: ChatbaseScheduler, sessions: list) -> list:
+    """Queue requests behind a held slot and record the order they are admitted in"""
+    order = []
+    
+    async def request(session_token: str):
+        async with scheduler.slot(session_token):
+            order.append(session_token)
+            await asyncio.sleep(0)
+    
+    async with scheduler.slot("holder"):
+        tasks = [asyncio.create_task(request(session)) for session in sessions]
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+def test_sessions_alternate_at_equal_weight(monkeypatch):
+    monkeypatch.setattr(settings, "CHATBASE_MAX_CONCURRENCY", 1)
+    order = asyncio.run(_admission_order(ChatbaseScheduler(), ["a"] * 4 + ["b"] * 4))
+    assert order == ["a", "b"] * 4
+
+def test_weights_set_the_share_of_admissions(monkeypatch):
+    monkeypatch.setattr(settings, "CHATBASE_MAX_CONCURRENCY", 1)
+    scheduler = ChatbaseScheduler()
+    scheduler.set_weight("a", 3)
+    order = asyncio.run(_admission_order(scheduler, ["a"] * 6 + ["b"] * 6))
+    assert order[:8].count("a") == 6
+
+def test_reject_newest_when_session_queue_is_full(monkeypatch):
+    monkeypatch.setattr(settings, "CHATBASE_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "CHATBASE_QUEUE_MAX_PER_SESSION", 2)
+    monkeypatch.setattr(settings, "CHATBASE_SHED_POLICY", "reject_newest")
+    
+    async def run():
+        scheduler = ChatbaseScheduler()
+        async with scheduler.slot("holder"):
+            waiting = [asyncio.create_task(scheduler._acquire("a")) for _ in range(2)]
+            await asyncio.sleep(0)
+            with pytest.raises(SchedulerOverloaded):
+                await scheduler._acquire("a")
+            for task in waiting:
+                task.cancel()
+            await asyncio.gather(*waiting, return_exceptions=True)
+        return scheduler.get_stats()
+    
+    stats = asyncio.run(run())
+    assert stats["rejected"] == 1
+    assert stats["waiting"] == 0
+
+def test_drop_oldest_fails_the_oldest_waiter(monkeypatch):
+    monkeypatch.setattr(settings, "CHATBASE_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "CHATBASE_QUEUE_MAX_PER_SESSION", 1)
+    monkeypatch.setattr(settings, "CHATBASE_SHED_POLICY", "drop_oldest")
+    
+    async def run():
+        scheduler = ChatbaseScheduler()
+        async with scheduler.slot("holder"):
+            oldest = asyncio.create_task(scheduler._acquire("a"))
+            await asyncio.sleep(0)
+            newest = asyncio.create_task(scheduler._acquire("a"))
+            await asyncio.sleep(0)
+            with pytest.raises(SchedulerOverloaded):
+                await oldest
+        await newest
+        scheduler._release()
+        return scheduler.get_stats()
+    
+    assert asyncio.run(run())["shed"] == 1
@@ -0,0 +1,103 @@
+"""Tests for per-session update queuing and per-chat ordering"""
+import asyncio
+
+from config import settings
+from services.ingest_queue import IngestQueue
+
+async def _drain(queue: IngestQueue):
+    while queue.pending_count():
+        await asyncio.sleep(0.001)
+
+def test_updates_of_one_chat_run_in_order_one_at_a_time():
+    async def run():
+        queue = IngestQueue()
+        events = []
+        
+        def job(n: int):
+            async def process():
+                events.append(("start", n))
+                await asyncio.sleep(0.01 if n == 0 else 0)
+                events.append(("end", n))
+            return process
+        
+        for n in range(3):
+            queue.submit("s", "chat", job(n))
+        await _drain(queue)
+        return events
+    
+    assert asyncio.run(run()) == [("start", 0), ("end", 0), ("start", 1), ("end", 1), ("start", 2), ("end", 2)]
+
+def test_a_slow_chat_does_not_block_other_chats():
+    async def run():
+        queue = IngestQueue()
+        finished = []
+        
+        async def slow():
+            await asyncio.sleep(0.05)
+            finished.append("slow")
+        
+        async def fast():
+            finished.append("fast")
+        
+        queue.submit("s", "a", slow)
+        queue.submit("s", "b", fast)
+        await _drain(queue)
+        return finished
+    
+    assert asyncio.run(run()) == ["fast", "slow"]
+
+def test_errors_are_counted_and_do_not_stop_the_chat():
+    async def run():
+        queue = IngestQueue()
+        done = []
+        
+        async def failing():
+            raise RuntimeError("boom")
+        
+        async def ok():
+            done.append(True)
+        
+        queue.submit("s", "a", failing)
+        queue.submit("s", "a", ok)
+        await _drain(queue)
+        return queue.get_stats(), done
+    
+    stats, done = asyncio.run(run())
+    assert done == [True]
+    assert stats["errors"] == 1 and stats["processed"] == 1
+
+def test_overflow_policies(monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_QUEUE_MAX", 2)
+    
+    async def noop():
+        pass
+    
+    async def run(policy: str):
+        monkeypatch.setattr(settings, "INGEST_OVERFLOW_POLICY", policy)
+        queue = IngestQueue()
+        accepted = [queue.submit("s", "a", noop) for _ in range(4)]
+        await _drain(queue)
+        return accepted, queue.get_stats()
+    
+    accepted, stats = asyncio.run(run("reject_newest"))
+    assert accepted == [True, True, False, False]
+    assert stats["rejected"] == 2 and stats["processed"] == 2
+    
+    accepted, stats = asyncio.run(run("drop_oldest"))
+    assert accepted == [True] * 4
+    assert stats["dropped"] == 2 and stats["processed"] == 2
+
+def test_drop_session_discards_pending_updates():
+    async def run():
+        queue = IngestQueue()
+        ran = []
+        
+        async def job():
+            ran.append(True)
+        
+        queue.submit("s", "a", job)
+        queue.drop_session("s")
+        await asyncio.sleep(0.01)
+        return ran, queue.pending_count()
+    
+    assert asyncio.run(run()) == ([], 0)
@@ -0,0 +1,64 @@
+"""Tests for recording incoming messages apart from replying to them"""
+import asyncio
+
+from events.message_handler import MessageHandler
+from services.ingest_queue import ingest_queue
+from storage import storage
+
+class _Client:
+    def __init__(self):
+        self.handlers = []
+    
+    def on(self, event):
+        def register(handler):
+            self.handlers.append(handler)
+            return handler
+        return register
+    
+    async def disconnect(self):
+        pass
+
+class _Event:
+    def __init__(self, message_id: int, text: str):
+        self.id = message_id
+        self.text = text
+        self.chat_id = 42
+        self.sender_id = 7
+    
+    async def get_sender(self):
+        return None
+    
+    async def get_chat(self):
+        return None
+
+def test_messages_are_recorded_while_an_earlier_reply_is_pending(monkeypatch):
+    replies = []
+    
+    async def slow_reply(event, session_token, chat_id, chat_name):
+        replies.append(event.text)
+        await asyncio.sleep(0.05)
+    
+    monkeypatch.setattr(MessageHandler, "_reply", staticmethod(slow_reply))
+    
+    async def run():
+        client = _Client()
+        storage.store_session("handler-test", "+100", client, "")
+        MessageHandler.register(client, "handler-test")
+        handle_new_message = client.handlers[0]
+        
+        await handle_new_message(_Event(1, "first question"))
+        await asyncio.sleep(0.01)
+        await handle_new_message(_Event(2, "second question"))
+        # The second message is recorded even though the first reply is still running
+        recorded = len(storage.get_activity_buffer("handler-test"))
+        history = [message["content"] for message in storage.get_conversation_history("handler-test", "42")]
+        
+        while ingest_queue.pending_count("handler-test"):
+            await asyncio.sleep(0.01)
+        await storage.release_session("handler-test")
+        return recorded, history
+    
+    recorded, history = asyncio.run(run())
+    assert recorded == 2
+    assert history == ["first question", "second question"]
+    assert replies == ["first question", "second question"]
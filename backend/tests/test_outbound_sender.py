@@ -0,0 +1,39 @@
+"""Tests for reply splitting and token bucket pacing"""
+import pytest
+
+from services.outbound_sender import MAX_MESSAGE_LENGTH, TokenBucket, split_message
+
+def test_split_message_keeps_short_text_whole():
+    assert split_message("hello") == ["hello"]
+    assert split_message("") == []
+
+def test_split_message_prefers_line_then_word_breaks():
+    assert split_message("aaaa\nbbbb", limit=6) == ["aaaa", "bbbb"]
+    assert split_message("aaa bbb ccc", limit=8) == ["aaa bbb", "ccc"]
+
+def test_split_message_cuts_words_longer_than_the_limit():
+    assert split_message("x" * 10, limit=4) == ["xxxx", "xxxx", "xx"]
+
+def test_split_message_respects_telegram_limit():
+    text = ("word " * 3000).strip()
+    parts = split_message(text)
+    assert all(len(part) <= MAX_MESSAGE_LENGTH for part in parts)
+    assert " ".join(parts) == text
+
+def test_token_bucket_allows_burst_then_paces():
+    bucket = TokenBucket(rate=2.0, burst=3)
+    now = bucket.updated
+    for _ in range(3):
+        assert bucket.delay(now) == 0.0
+        bucket.take(now)
+    assert bucket.delay(now) == pytest.approx(0.5)
+    assert bucket.delay(now + 0.5) == 0.0
+
+def test_token_bucket_refills_up_to_burst_only():
+    bucket = TokenBucket(rate=1.0, burst=2)
+    now = bucket.updated
+    bucket.take(now)
+    bucket.take(now)
+    assert not bucket.is_full(now + 1)
+    assert bucket.is_full(now + 1000)
+    assert bucket.tokens == 2
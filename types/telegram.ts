@@ -22,9 +22,19 @@ export interface ChatActivity {
   messages: TelegramMessage[]
 }
 
+export interface DialogFetchTiming {
+  chatId: string
+  chatName: string
+  status: "ok" | "timeout" | "error"
+  durationMs: number
+}
+
 export interface ActivityResponse {
   user: TelegramUser
   activity: ChatActivity[]
+  partial?: boolean
+  fetchTimings?: DialogFetchTiming[]
+  cached?: boolean
 }
 
 export interface AuthResponse {